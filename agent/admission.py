@@ -0,0 +1,218 @@
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from agent.metrics import ADMISSION_WAIT_SECONDS, add_collector, request_span_count, set_request_source
+
+# Most agent runs executing at once in this worker; the adaptive limit stays at or below it
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "16"))
+# Lowest the adaptive limit goes
+CHAT_MIN_CONCURRENCY = int(os.getenv("CHAT_MIN_CONCURRENCY", "2"))
+# Adapt the limit to the latency of agent runs; 0 keeps it at CHAT_MAX_CONCURRENCY
+CHAT_ADAPTIVE_LIMIT = os.getenv("CHAT_ADAPTIVE_LIMIT", "1") == "1"
+# Agent runs that may wait for a slot; more are turned away with a 503 (0 = unbounded)
+CHAT_QUEUE_SIZE = int(os.getenv("CHAT_QUEUE_SIZE", "32"))
+# Seconds an agent run may wait for a slot before it is turned away (0 = no deadline)
+CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "5"))
+
+# Priorities of waiting agent runs, the lowest value is admitted first
+INTERACTIVE = 0
+BATCH = 1
+
+class Overloaded(Exception):
+    """An agent run turned away by admission control; retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Chat agent overloaded ({reason})")
+        self.reason = reason
+        self.retry_after = retry_after
+
+class GradientLimit:
+    """
+    Concurrency limit that follows the latency of agent runs, sampled per
+    model call so that runs with more tool steps do not look slower. The
+    gradient between the long-term and the recent sample shrinks the limit
+    once runs slow down (Gemini queueing or rate limiting, a busy DB pool) and
+    lets it grow by about sqrt(limit) while they take as long as usual. A
+    failed run cuts the limit by a tenth. It starts low so the long-term
+    latency is learnt before the limit can overload Gemini.
+    """
+
+    def __init__(self, initial=max(CHAT_MIN_CONCURRENCY, CHAT_MAX_CONCURRENCY // 4), min_limit=CHAT_MIN_CONCURRENCY,
+                 max_limit=CHAT_MAX_CONCURRENCY, tolerance=1.0, smoothing=0.2, long_window=500, short_window=10):
+        self.value = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance  # recent samples may be this much slower before the limit shrinks
+        self.smoothing = smoothing
+        self._long_alpha = 2 / (long_window + 1)
+        self._short_alpha = 2 / (short_window + 1)
+        self.long_rtt = None
+        self.short_rtt = None
+
+    def sample(self, rtt: float, inflight: int, ok: bool):
+        if not ok:
+            self.value = max(self.min_limit, self.value * 0.9)
+            return
+        if self.long_rtt is None:
+            self.long_rtt = self.short_rtt = rtt
+        self.short_rtt += (rtt - self.short_rtt) * self._short_alpha
+        self.long_rtt += (rtt - self.long_rtt) * self._long_alpha
+        if self.long_rtt > 2 * self.short_rtt:
+            # Runs got faster for good; let the baseline catch up
+            self.long_rtt *= 0.95
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        if gradient == 1.0 and inflight < self.value / 2:
+            return  # not using the limit; the sample says nothing about a higher one
+        target = self.value * gradient + math.sqrt(self.value)
+        self.value = max(self.min_limit, min(self.max_limit,
+                                             self.value * (1 - self.smoothing) + target * self.smoothing))
+
+class FixedLimit:
+    """Concurrency limit that does not adapt."""
+
+    def __init__(self, value=CHAT_MAX_CONCURRENCY):
+        self.value = float(value)
+
+    def sample(self, rtt: float, inflight: int, ok: bool):
+        pass
+
+class AdmissionController:
+    """
+    Admits agent runs up to a concurrency limit. Runs over the limit wait in
+    a bounded priority queue; a run is turned away (Overloaded) at once when
+    the queue is full of runs of its priority or better, or its expected wait
+    is past the deadline, and later when its deadline passes. Fast paths (FAQ,
+    order templates, cached answers) answer before admission and never wait.
+    """
+
+    def __init__(self, limit=None, queue_size=CHAT_QUEUE_SIZE, queue_timeout=CHAT_QUEUE_TIMEOUT):
+        self.limit = limit or (GradientLimit() if CHAT_ADAPTIVE_LIMIT else FixedLimit())
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.queued = 0
+        self._waiters = []  # heap of [priority, seq, future]; done futures are skipped
+        self._seq = itertools.count()
+        self._rtt = None  # moving average of run time, to estimate waits
+        self.admitted = 0
+        self.failed = 0
+        self.shed = {"queue_full": 0, "wait": 0, "timeout": 0}
+
+    @asynccontextmanager
+    async def slot(self, priority=INTERACTIVE):
+        """Hold one concurrency slot for the body; raises Overloaded when the run is turned away."""
+        start = time.monotonic()
+        try:
+            await self._acquire(priority)
+        except Overloaded as e:
+            self.shed[e.reason] += 1
+            ADMISSION_WAIT_SECONDS.observe(time.monotonic() - start, outcome="shed")
+            set_request_source("shed")
+            raise
+        self.admitted += 1
+        started = time.monotonic()
+        ADMISSION_WAIT_SECONDS.observe(started - start, outcome="admitted")
+        calls = request_span_count("llm")
+        try:
+            yield
+        except Exception:
+            self.failed += 1
+            self._finish(started, calls, ok=False)
+            raise
+        except BaseException:
+            # Cancelled or closed by a disconnected client: no latency sample
+            self._release()
+            raise
+        self._finish(started, calls, ok=True)
+
+    async def _acquire(self, priority):
+        if self.inflight < self.limit.value and not self.queued:
+            self.inflight += 1
+            return
+        if self.queue_size and self.queued >= self.queue_size:
+            worst = max((w for w in self._waiters if not w[2].done()), default=None)
+            if worst is None or worst[0] <= priority:
+                raise Overloaded("queue_full", self.retry_after())
+            # Make room: a lower priority waiter is turned away instead
+            worst[2].set_exception(Overloaded("queue_full", self.retry_after()))
+        ahead = sum(1 for w in self._waiters if w[0] <= priority and not w[2].done())
+        if self.queue_timeout and self._expected_wait(ahead) > self.queue_timeout:
+            raise Overloaded("wait", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._seq), future])
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, self.queue_timeout or None)
+        except asyncio.TimeoutError:
+            raise Overloaded("timeout", self.retry_after()) from None
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release()  # the slot was handed over as the request went away
+            raise
+        finally:
+            self.queued -= 1
+
+    def _expected_wait(self, ahead: int) -> float:
+        """Seconds until `ahead` queued runs and then this one get a slot."""
+        if self._rtt is None:
+            return 0.0
+        return (ahead + 1) * self._rtt / max(self.limit.value, 1.0)
+
+    def retry_after(self) -> int:
+        """Whole seconds for a turned-away client to wait: about the time to drain the queue."""
+        return min(30, max(1, math.ceil(self._expected_wait(self.queued))))
+
+    def _finish(self, started, calls_before, ok):
+        rtt = time.monotonic() - started
+        if ok:
+            self._rtt = rtt if self._rtt is None else self._rtt + (rtt - self._rtt) * 0.1
+        steps = max(1, request_span_count("llm") - calls_before)
+        self.limit.sample(rtt / steps, self.inflight, ok)
+        self._release()
+
+    def _release(self):
+        self.inflight -= 1
+        while self._waiters and self.inflight < self.limit.value:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                self.inflight += 1
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit.value, 1),
+            "adaptive": isinstance(self.limit, GradientLimit),
+            "inflight": self.inflight,
+            "queued": self.queued,
+            "queue_size": self.queue_size,
+            "queue_timeout": self.queue_timeout,
+            "run_seconds": round(self._rtt, 3) if self._rtt is not None else None,
+            "admitted": self.admitted,
+            "failed": self.failed,
+            "shed": dict(self.shed),
+        }
+
+    def gauges(self) -> list:
+        lines = [
+            "# HELP chatbot_agent_concurrency_limit Current concurrency limit of agent runs",
+            "# TYPE chatbot_agent_concurrency_limit gauge",
+            f"chatbot_agent_concurrency_limit {self.limit.value:g}",
+            "# HELP chatbot_agent_inflight Agent runs executing",
+            "# TYPE chatbot_agent_inflight gauge",
+            f"chatbot_agent_inflight {self.inflight}",
+            "# HELP chatbot_agent_queued Agent runs waiting for a slot",
+            "# TYPE chatbot_agent_queued gauge",
+            f"chatbot_agent_queued {self.queued}",
+            "# HELP chatbot_agent_shed_total Agent runs turned away by admission control",
+            "# TYPE chatbot_agent_shed_total counter",
+        ]
+        lines += [f'chatbot_agent_shed_total{{reason="{reason}"}} {count}' for reason, count in self.shed.items()]
+        return lines
+
+chat_admission = AdmissionController()
+add_collector(chat_admission.gauges)
@@ -0,0 +1,81 @@
+import asyncio
+import os
+import uuid
+from agent.admission import BATCH, Overloaded
+from agent.metrics import request_span
+from agent.runner import run_chat_turn
+from agent.tools import share_tool_calls
+
+# Most items one batch request may carry
+CHAT_BATCH_MAX_ITEMS = int(os.getenv("CHAT_BATCH_MAX_ITEMS", "100"))
+# Threads of one batch that run at once; agent runs also wait for admission, after interactive ones
+CHAT_BATCH_CONCURRENCY = int(os.getenv("CHAT_BATCH_CONCURRENCY", "4"))
+
+def _shed_result(index: int, thread_id: str, error: Overloaded) -> dict:
+    return {"index": index, "thread_id": thread_id, "success": False,
+            "error": "The assistant is busy. Please try again shortly.", "retry_after": error.retry_after}
+
+def _item_error(item) -> str:
+    if not isinstance(item, dict):
+        return "Item must be an object with thread_id and message."
+    thread_id = item.get("thread_id")
+    if thread_id is not None and (isinstance(thread_id, bool) or not isinstance(thread_id, (str, int))):
+        return "thread_id must be a string or an integer."
+    if not item.get("message") or not isinstance(item["message"], str):
+        return "Message is required."
+    return None
+
+async def run_chat_batch(items: list, concurrency: int = CHAT_BATCH_CONCURRENCY) -> dict:
+    """
+    Answer every {thread_id, message} item. Threads run concurrently on at most
+    `concurrency` workers; the turns of one thread run one after another, in the
+    order they appear. Identical tool calls across the batch run once. Returns
+    per-item results in input order, failed items carrying an "error".
+    Items turned away by admission control carry "retry_after" as well, and
+    so do the later turns of their thread, which would lack the context.
+    """
+    results = [None] * len(items)
+    threads = {}  # thread_id -> [(index, message)], in input order
+    for index, item in enumerate(items):
+        if (error := _item_error(item)) is not None:
+            thread_id = item.get("thread_id") if isinstance(item, dict) else None
+            if not isinstance(thread_id, (str, int)) or isinstance(thread_id, bool):
+                thread_id = None
+            results[index] = {"index": index, "thread_id": thread_id, "success": False, "error": error}
+            continue
+        thread_id = item.get("thread_id")
+        thread_id = str(thread_id) if thread_id not in (None, "") else str(uuid.uuid4())
+        threads.setdefault(thread_id, []).append((index, item["message"]))
+
+    queue = asyncio.Queue()
+    for thread in threads.items():
+        queue.put_nowait(thread)
+
+    async def worker():
+        while not queue.empty():
+            thread_id, turns = queue.get_nowait()
+            shed = None
+            for index, message in turns:
+                if shed is not None:
+                    results[index] = _shed_result(index, thread_id, shed)
+                    continue
+                try:
+                    with request_span("/api/chat/batch"):
+                        response = await run_chat_turn(message, thread_id, priority=BATCH)
+                    results[index] = {"index": index, "thread_id": thread_id, "response": response, "success": True}
+                except Overloaded as e:
+                    shed = e
+                    results[index] = _shed_result(index, thread_id, e)
+                except Exception as e:
+                    print("Error in /api/chat/batch item:", str(e))
+                    results[index] = {"index": index, "thread_id": thread_id, "success": False,
+                                      "error": "Internal Server Error"}
+
+    with share_tool_calls() as shared:
+        await asyncio.gather(*(worker() for _ in range(max(1, min(concurrency, len(threads))))))
+
+    return {
+        "results": results,
+        "success": all(r["success"] for r in results),
+        "stats": {"items": len(items), "threads": len(threads), **shared.stats()},
+    }
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+_MISSING = object()
+
+# name -> cache, for stats and bulk invalidation
+_caches = {}
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with per-entry TTL and single-flight loading.
+
+    Concurrent misses for the same key are coalesced: one caller runs the
+    loader, the others wait for its result instead of hitting the database too.
+    `ttl` may be a number of seconds or a callable that picks the TTL from the
+    loaded value; a TTL of 0 or less means "do not cache".
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=60.0):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._inflight = {}  # key -> Future of the running load
+        self._lock = threading.Lock()
+        # Bumped by invalidate() so a load that started earlier is not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        _caches[name] = self
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._get_locked(key, default)
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._set_locked(key, value, ttl)
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Return the cached value for `key`, or load it once for all concurrent callers."""
+        with self._lock:
+            value = self._get_locked(key, _MISSING)
+            if value is not _MISSING:
+                return value
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                self.misses -= 1  # counted by _get_locked, but this caller did not load
+                leader = False
+            else:
+                future = Future()
+                self._inflight[key] = future
+                generation = self._generation
+                leader = True
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._inflight.pop(key, None)
+            if generation == self._generation:
+                self._set_locked(key, value, ttl)
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key=None, predicate=None):
+        """Drop one key, the keys matching `predicate`, or everything."""
+        with self._lock:
+            self._generation += 1
+            if key is not None:
+                self._data.pop(key, None)
+            elif predicate is not None:
+                for k in [k for k in self._data if predicate(k)]:
+                    del self._data[k]
+            else:
+                self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def _get_locked(self, key, default):
+        entry = self._data.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def _set_locked(self, key, value, ttl):
+        ttl = self.ttl if ttl is None else ttl
+        if callable(ttl):
+            ttl = ttl(value)
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+def cache_stats() -> dict:
+    """Stats of every named cache"""
+    return {name: cache.stats() for name, cache in _caches.items()}
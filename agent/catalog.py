@@ -0,0 +1,332 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from sqlalchemy import func, select
+from agent.shared_cache import TieredCache
+from agent.tool_format import format_catalog, format_product
+from config.replicas import read_scope
+from models.Product import Product
+from models.Thumbnail import Thumbnail
+from models.Variant import Variant
+
+# How often to run the cheap change-detection query, and the hard refresh age
+CATALOG_CHECK_INTERVAL = float(os.getenv("CATALOG_CHECK_INTERVAL", "30"))
+CATALOG_MAX_AGE = float(os.getenv("CATALOG_MAX_AGE", "600"))
+
+def _row_checksum(dialect, key, *columns):
+    """
+    Per-row checksum of a row's text columns, summed into the watermark: CRC32
+    on MySQL; elsewhere (SQLite) the text's length weighted by the row key,
+    which misses an edit that keeps the length.
+    """
+    if dialect == "mysql":
+        return func.crc32(func.concat_ws("|", key, *columns))
+    return key * sum(func.length(func.coalesce(column, "")) + 1 for column in columns)
+
+def _catalog_watermark(db):
+    """
+    One-row fingerprint of the catalog. Adding, deleting or re-pricing products
+    or variants, stock movements, and edits of names, categories, sizes,
+    colors and thumbnails all change it.
+    """
+    dialect = db.get_bind().dialect.name
+    return tuple(db.execute(select(
+        select(func.count(Product.id)).scalar_subquery(),
+        select(func.max(Product.id)).scalar_subquery(),
+        select(func.count(Product.id)).where(Product.status == "Available").scalar_subquery(),
+        select(func.count(Variant.id)).scalar_subquery(),
+        select(func.max(Variant.id)).scalar_subquery(),
+        select(func.sum(Variant.stock)).scalar_subquery(),
+        select(func.sum(Variant.price)).scalar_subquery(),
+        select(func.count(Thumbnail.product_id)).scalar_subquery(),
+        select(func.sum(_row_checksum(dialect, Product.id, Product.product_name, Product.category))).scalar_subquery(),
+        select(func.sum(_row_checksum(dialect, Variant.id, Variant.product_id, Variant.size, Variant.color))).scalar_subquery(),
+        select(func.sum(_row_checksum(dialect, Thumbnail.product_id, Thumbnail.thumbnailUrl,
+                                      Thumbnail.thumbnailPublicId))).scalar_subquery(),
+    )).one())
+
+# Rows are streamed from the driver in batches of this size
+CATALOG_YIELD_PER = 2000
+# Product IDs per IN (...) when re-reading changed products
+_CHUNK = 500
+# Snapshot versions whose changed products are remembered, for incremental re-rendering and indexing
+_CHANGE_LOG_SIZE = 256
+
+def _load_products(db, product_ids=None):
+    """
+    Available products with their variants and thumbnail, as plain dicts keyed
+    by product ID in ID order; all of them, or just `product_ids`.
+    Column-only selects: no ORM entities, identity map or relationship loading.
+    """
+    if product_ids is not None:
+        ids = sorted(product_ids)
+        products = {}
+        for start in range(0, len(ids), _CHUNK):
+            products.update(_select_products(db, Product.id.in_(ids[start:start + _CHUNK])))
+        return dict(sorted(products.items()))
+    return _select_products(db)
+
+def _select_products(db, *where):
+    products = {}
+    rows = db.execute(
+        select(Product.id, Product.product_name, Product.category, Thumbnail.thumbnailUrl, Thumbnail.thumbnailPublicId)
+        .outerjoin(Thumbnail, Thumbnail.product_id == Product.id)
+        .where(Product.status == "Available", *where)
+        .order_by(Product.id)
+        .execution_options(yield_per=CATALOG_YIELD_PER)
+    )
+    for product_id, name, category, thumbnail_url, thumbnail_public_id in rows:
+        products[product_id] = {
+            "product_name": name,
+            "category": category,
+            "variants": [],
+            "thumbnail": {
+                "thumbnailUrl": thumbnail_url,
+                "thumbnailPublicId": thumbnail_public_id
+            } if thumbnail_url is not None else None
+        }
+
+    rows = db.execute(
+        select(Variant.product_id, Variant.price, Variant.stock, Variant.size, Variant.color)
+        .join(Product, Product.id == Variant.product_id)
+        .where(Product.status == "Available", *where)
+        .order_by(Variant.product_id, Variant.id)
+        .execution_options(yield_per=CATALOG_YIELD_PER)
+    )
+    for product_id, price, stock, size, color in rows:
+        if (product := products.get(product_id)) is not None:
+            product["variants"].append({"price": price, "stock": stock, "size": size, "color": color})
+    return products
+
+# Loaded catalogs by watermark, shared by the workers so a change is loaded from
+# the database once, not once per process
+catalog_snapshots = TieredCache("catalog_snapshots", maxsize=2, ttl=CATALOG_MAX_AGE, version=2)
+
+class CatalogCache:
+    """
+    In-process snapshot of the available catalog, served pre-serialized.
+
+    The full reload only runs when the watermark query reports a change, when the
+    snapshot is older than `max_age`, or after `invalidate()`. Between checks the
+    snapshot is served without touching the database; the periodic check (and
+    any reload it leads to) runs in the background while the current snapshot
+    keeps being served. The change feed (agent/catalog_feed.py) patches single
+    products in through apply_changes(), so stock moves show up without a
+    reload and the watermark stays in step with them.
+    """
+
+    def __init__(self, check_interval=CATALOG_CHECK_INTERVAL, max_age=CATALOG_MAX_AGE, session_factory=read_scope):
+        self.session_factory = session_factory
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._products = None
+        self._positions = {}  # product ID -> index in _products
+        self._snapshot = (0, None)
+        self._lookup = ([], {})  # (products, positions) of the current snapshot, swapped together
+        # format name -> (snapshot version, rendered text, per-product parts), rendered on first use
+        self._rendered = {}
+        # (version, positions of the products it changed, or None after a reload or an added/removed product)
+        self._changes = deque(maxlen=_CHANGE_LOG_SIZE)
+        self._watermark = None
+        self._loaded_at = 0.0
+        self._checked_at = float("-inf")
+        self._stale = False
+        # Wall-clock time of the last watermark read: the snapshot shows every change committed before it
+        self.as_of = None
+        self.version = 0
+        self.reloads = 0
+        self.checks = 0
+        self.patches = 0
+        self.patched_products = 0
+        # Set by a running change feed: whether it has recorded changes it has not applied yet
+        self.changes_pending = None
+
+    def get_products(self):
+        """Current snapshot as a list of product dicts; treat it as read-only."""
+        self._refresh_if_needed()
+        return self._products
+
+    def get_snapshot(self):
+        """Current (version, products) pair, read atomically."""
+        self._refresh_if_needed()
+        return self._snapshot
+
+    def get_product(self, product_id):
+        """One product of the current snapshot, or None if it is not available."""
+        self._refresh_if_needed()
+        products, positions = self._lookup
+        position = positions.get(product_id)
+        return products[position] if position is not None else None
+
+    def get_json(self) -> str:
+        """Current snapshot serialized for the LLM."""
+        return self._render("json", lambda products: json.dumps(products, indent=2))
+
+    def get_compact(self) -> str:
+        """Current snapshot in the compact table format."""
+        return self._render("compact", format_catalog, lambda p: format_product(p, p["variants"]), "\n\n")
+
+    def _render(self, name, render, render_one=None, separator=""):
+        # Each format is rendered once per snapshot version, and only if asked for.
+        # Formats made of per-product parts re-render only the products that changed.
+        self._refresh_if_needed()
+        version, products = self._snapshot
+        rendered = self._rendered.get(name)
+        if rendered is not None and rendered[0] == version:
+            return rendered[1]
+        changed = self.changes_since(rendered[0], version) if rendered is not None and render_one else None
+        if changed is not None and rendered[2] is not None and products:
+            parts = list(rendered[2])
+            for position in changed:
+                parts[position] = render_one(products[position])
+            rendered = (version, separator.join(parts), parts)
+        elif render_one and products:
+            parts = [render_one(p) for p in products]
+            rendered = (version, separator.join(parts), parts)
+        else:
+            rendered = (version, render(products), None)
+        self._rendered[name] = rendered
+        return rendered[1]
+
+    def changes_since(self, version, until=None):
+        """
+        Positions of the products that changed after snapshot `version` up to
+        `until` (default: the current one), or None when that is not known
+        (a reload, an added or removed product, or too long ago).
+        """
+        until = self.version if until is None else until
+        changed = set()
+        expected = version + 1
+        for change_version, positions in list(self._changes):
+            if change_version <= version or change_version > until:
+                continue
+            if change_version != expected or positions is None:
+                return None
+            changed |= positions
+            expected += 1
+        return changed if expected == until + 1 else None
+
+    def invalidate(self):
+        """Force the next read to reload the catalog."""
+        with self._lock:
+            self._stale = True
+            self._checked_at = float("-inf")
+
+    def apply_changes(self, product_ids, db) -> int:
+        """
+        Re-read just these products and swap them into a new snapshot version,
+        instead of reloading the catalog. Returns how many products were
+        re-read (0 when no snapshot is loaded yet: the first load sees them).
+        """
+        with self._lock:
+            if self._products is None or not product_ids:
+                return 0
+            # Read before the rows, so a change racing with them shows up as a watermark mismatch
+            as_of = time.time()
+            watermark = _catalog_watermark(db)
+            fresh = _load_products(db, product_ids)
+            products = list(self._products)
+            positions = set()
+            for product_id in product_ids:
+                position = self._positions.get(product_id)
+                if (position is None) != (product_id not in fresh):
+                    positions = None  # added or removed: the order of the list changes
+                    break
+                if position is not None:
+                    products[position] = fresh[product_id]
+                    positions.add(position)
+            if positions is None:
+                current = dict(zip(self._positions, self._products))
+                current.update(fresh)
+                for product_id in product_ids:
+                    if product_id not in fresh:
+                        current.pop(product_id, None)
+                ids = sorted(current)
+                products = [current[i] for i in ids]
+                self._positions = {product_id: i for i, product_id in enumerate(ids)}
+            self._watermark = watermark
+            self.as_of = as_of
+            self._publish(products, positions)
+            self.patches += 1
+            self.patched_products += len(product_ids)
+            return len(product_ids)
+
+    def _refresh_if_needed(self):
+        now = time.monotonic()
+        if self._products is not None and now - self._checked_at < self.check_interval:
+            return
+
+        if self._products is None or self._stale:
+            # Nothing to serve yet, or known to be out of date: wait for the reload
+            with self._lock:
+                self._refresh()
+        elif self._lock.acquire(blocking=False):
+            # Only one thread refreshes; everyone keeps serving the old snapshot
+            threading.Thread(target=self._refresh_in_background, name="catalog-refresh", daemon=True).start()
+
+    def _refresh_in_background(self):
+        try:
+            self._refresh()
+        except Exception as e:
+            print("Catalog refresh failed:", str(e))
+        finally:
+            self._lock.release()
+
+    def _refresh(self):
+        """Check the watermark and reload on a change; the caller holds the lock."""
+        now = time.monotonic()
+        if self._products is not None and now - self._checked_at < self.check_interval:
+            return
+        with self.session_factory() as db:
+            as_of = time.time()
+            watermark = _catalog_watermark(db)
+            self.checks += 1
+            changed = watermark != self._watermark
+            if changed and self.changes_pending is not None and self.changes_pending(db):
+                # The change feed is about to patch these in; no need for a reload
+                changed = False
+            expired = now - self._loaded_at >= self.max_age
+            if self._products is None or self._stale or changed or expired:
+                if self._stale:
+                    catalog_snapshots.invalidate()
+                elif expired and not changed and self._products is not None:
+                    # The safety net must read the database, not a shared snapshot of the same watermark
+                    catalog_snapshots.invalidate(watermark)
+                self._set_snapshot(catalog_snapshots.get_or_load(watermark, lambda: _load_products(db)), watermark)
+                self.as_of = as_of
+        self._checked_at = now
+
+    def _set_snapshot(self, products, watermark):
+        self._positions = {product_id: i for i, product_id in enumerate(products)}
+        self._watermark = watermark
+        self._loaded_at = time.monotonic()
+        self._stale = False
+        self._publish(list(products.values()), None)
+        self.reloads += 1
+
+    def _publish(self, products, changed_positions):
+        self._products = products
+        self.version += 1
+        self._changes.append((self.version, frozenset(changed_positions) if changed_positions is not None else None))
+        self._snapshot = (self.version, products)
+        self._lookup = (products, self._positions)
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "products": len(self._products) if self._products is not None else 0,
+            "reloads": self.reloads,
+            "checks": self.checks,
+            "patches": self.patches,
+            "patched_products": self.patched_products,
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+        }
+
+catalog_cache = CatalogCache()
+
+def invalidate_catalog():
+    """Drop the cached catalog snapshot; the next products lookup reloads it."""
+    catalog_cache.invalidate()
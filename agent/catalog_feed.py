@@ -0,0 +1,251 @@
+import os
+import threading
+import time
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.exc import DatabaseError
+from agent.catalog import catalog_cache
+from agent.metrics import CATALOG_CHANGE_SECONDS, add_collector
+from config.db import Base, session_scope
+from models.CatalogChange import CatalogChange
+
+# Tail the catalog change table and patch changed products into the snapshot
+CATALOG_FEED = os.getenv("CATALOG_FEED", "1") == "1"
+# Seconds between polls of the change table (a webhook call wakes the poller at once)
+CATALOG_FEED_INTERVAL = float(os.getenv("CATALOG_FEED_INTERVAL", "1"))
+# Install triggers on products, variants and thumbnails that record every change.
+# Off by default: without them the store backend reports changes to /api/catalog/changes.
+CATALOG_FEED_TRIGGERS = os.getenv("CATALOG_FEED_TRIGGERS", "0") == "1"
+# Change rows older than this are deleted
+CATALOG_FEED_RETENTION = float(os.getenv("CATALOG_FEED_RETENTION", "3600"))
+
+# Changes recorded this long before a snapshot was read are replayed on top of it,
+# covering clock skew between the database and the workers. Replaying is harmless:
+# a change only says which products to re-read.
+_REPLAY_SECONDS = 30
+_BATCH = 500
+_PRUNE_INTERVAL = 60
+# Change IDs skipped over are looked for again this long: concurrent transactions
+# can commit their auto-increment IDs out of order. Later ones are left to the
+# catalog's watermark check.
+_GAP_SECONDS = 10
+
+TRACKED_TABLES = ("products", "variants", "thumbnails")
+
+def _trigger_statements(dialect: str) -> list:
+    """
+    CREATE TRIGGER statements recording every insert, update and delete of the
+    tracked tables (MySQL needs 8.0.29+ for IF NOT EXISTS).
+    """
+    now = {
+        "sqlite": "(julianday('now') - 2440587.5) * 86400.0",
+        "mysql": "UNIX_TIMESTAMP(NOW(6))",
+    }[dialect]
+    product_id = {"products": "id", "variants": "product_id", "thumbnails": "product_id"}
+    record = f"INSERT INTO {CatalogChange.__tablename__} (table_name, product_id, changed_at)"
+    statements = []
+    for table in TRACKED_TABLES:
+        column = product_id[table]
+
+        def values(row):
+            return f"'{table}', {row}.{column}, {now}"
+
+        for event, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            body = f"{record} VALUES ({values(row)});"
+            if event == "UPDATE":
+                # A variant or thumbnail moved to another product changes both
+                if dialect == "sqlite":
+                    body += f" {record} SELECT {values('OLD')} WHERE OLD.{column} <> NEW.{column};"
+                else:
+                    body += f" IF OLD.{column} <> NEW.{column} THEN {record} VALUES ({values('OLD')}); END IF;"
+            statements.append(f"CREATE TRIGGER IF NOT EXISTS chatbot_catalog_{table}_{event.lower()} "
+                              f"AFTER {event} ON {table} FOR EACH ROW BEGIN {body} END")
+    return statements
+
+class CatalogFeed:
+    """
+    Applies catalog changes as they happen instead of waiting for the next
+    watermark check. Changed rows are recorded in CatalogChange, by database
+    triggers or by the store backend through record(); every worker tails
+    the table and re-reads only the products named there.
+    """
+
+    def __init__(self, catalog=catalog_cache, interval=CATALOG_FEED_INTERVAL, triggers=CATALOG_FEED_TRIGGERS,
+                 retention=CATALOG_FEED_RETENTION, session_factory=session_scope):
+        self.catalog = catalog
+        self.interval = interval
+        self.triggers = triggers
+        self.retention = retention
+        self.session_factory = session_factory
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._tables_ready = set()
+        self._position = None  # highest applied change ID
+        self._gaps = {}  # skipped change ID -> when it was first skipped (monotonic)
+        self._pruned_at = 0.0
+        self._polled_at = None
+        self.lag = 0.0
+        self.applied = 0
+        self.batches = 0
+        self.errors = 0
+
+    def start(self):
+        """Start tailing the change table in a background thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="catalog-feed", daemon=True)
+            self._thread.start()
+            self.catalog.changes_pending = self.changes_pending
+
+    def stop(self):
+        self.catalog.changes_pending = None
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll()
+            except Exception as e:
+                self.errors += 1
+                print("Catalog feed poll failed:", str(e))
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def changes_pending(self, db) -> bool:
+        """
+        Whether changes are recorded that the feed has not applied yet, and it
+        is keeping up (polled lately), so it will apply them shortly.
+        """
+        live = self._polled_at is not None and time.monotonic() - self._polled_at < max(5 * self.interval, 10)
+        if not live or self._position is None:
+            return False
+        return (db.execute(select(func.max(CatalogChange.id))).scalar() or 0) > self._position
+
+    def _ensure_tables(self, db):
+        bind = db.get_bind()
+        if bind in self._tables_ready:
+            return
+        try:
+            Base.metadata.create_all(bind, tables=[CatalogChange.__table__])
+        except DatabaseError:
+            # Another worker created it between the existence check and CREATE
+            Base.metadata.create_all(bind, tables=[CatalogChange.__table__])
+        if self.triggers:
+            dialect = bind.dialect.name
+            if dialect in ("sqlite", "mysql"):
+                for statement in _trigger_statements(dialect):
+                    db.execute(text(statement))
+                db.commit()
+            else:
+                print(f"Catalog change triggers are not supported on {dialect}; use /api/catalog/changes")
+        self._tables_ready.add(bind)
+
+    def poll(self) -> int:
+        """Apply the changes recorded since the last poll; returns how many were read."""
+        if self.catalog.as_of is None:
+            return 0  # no snapshot yet; the first load reads everything
+        read = 0
+        with self.session_factory() as db:
+            self._ensure_tables(db)
+            if self._position is None:
+                self._position = db.execute(
+                    select(func.coalesce(func.max(CatalogChange.id), 0))
+                    .where(CatalogChange.changed_at < self.catalog.as_of - _REPLAY_SECONDS)
+                ).scalar()
+            while True:
+                rows = db.execute(
+                    select(CatalogChange.id, CatalogChange.product_id, CatalogChange.changed_at)
+                    .where(CatalogChange.id > self._position)
+                    .order_by(CatalogChange.id)
+                    .limit(_BATCH)
+                ).all()
+                if self._gaps:
+                    late = db.execute(
+                        select(CatalogChange.id, CatalogChange.product_id, CatalogChange.changed_at)
+                        .where(CatalogChange.id.in_(list(self._gaps)))
+                    ).all()
+                    for row in late:
+                        del self._gaps[row[0]]
+                    rows = late + rows
+                db.rollback()  # end the read transaction so the next batch sees new commits
+                if not rows:
+                    break
+                self._apply(rows, db)
+                db.rollback()
+                read += len(rows)
+                if len(rows) < _BATCH:
+                    break
+            if not read:
+                self.lag = 0.0
+            now = time.monotonic()
+            self._gaps = {i: at for i, at in self._gaps.items() if now - at < _GAP_SECONDS}
+            if time.monotonic() - self._pruned_at >= _PRUNE_INTERVAL:
+                db.execute(delete(CatalogChange).where(CatalogChange.changed_at < time.time() - self.retention))
+                db.commit()
+                self._pruned_at = time.monotonic()
+        self._polled_at = time.monotonic()
+        return read
+
+    def _apply(self, rows, db):
+        self.catalog.apply_changes({product_id for _, product_id, _ in rows}, db)
+        applied_at = time.time()
+        for _, _, changed_at in rows:
+            CATALOG_CHANGE_SECONDS.observe(max(applied_at - changed_at, 0.0))
+        self.lag = max(applied_at - min(changed_at for _, _, changed_at in rows), 0.0)
+        skipped_at = time.monotonic()
+        for change_id, _, _ in rows:
+            if change_id > self._position:
+                if change_id - self._position <= _BATCH:  # larger jumps are pruned or pre-snapshot rows
+                    self._gaps.update((i, skipped_at) for i in range(self._position + 1, change_id))
+                self._position = change_id
+        self.applied += len(rows)
+        self.batches += 1
+
+    def record(self, changes) -> int:
+        """
+        Add changes reported by the store backend: (table name, product ID)
+        pairs. Every worker applies them on its next poll; this one right away.
+        """
+        now = time.time()
+        rows = [{"table_name": table, "product_id": product_id, "changed_at": now} for table, product_id in changes]
+        if rows:
+            with self.session_factory() as db:
+                self._ensure_tables(db)
+                db.execute(insert(CatalogChange), rows)
+                db.commit()
+            self._wake.set()
+        return len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._thread is not None,
+            "position": self._position,
+            "pending_gaps": len(self._gaps),
+            "catalog_version": self.catalog.version,
+            "lag_seconds": round(self.lag, 3),
+            "last_poll_seconds_ago": round(time.monotonic() - self._polled_at, 1) if self._polled_at else None,
+            "applied": self.applied,
+            "batches": self.batches,
+            "errors": self.errors,
+            "triggers": self.triggers,
+        }
+
+    def gauges(self) -> list:
+        return [
+            "# HELP chatbot_catalog_version Version of the in-memory catalog snapshot",
+            "# TYPE chatbot_catalog_version gauge",
+            f"chatbot_catalog_version {self.catalog.version}",
+            "# HELP chatbot_catalog_feed_lag_seconds Age of the oldest change in the last applied batch (0 when caught up)",
+            "# TYPE chatbot_catalog_feed_lag_seconds gauge",
+            f"chatbot_catalog_feed_lag_seconds {self.lag:g}",
+            "# HELP chatbot_catalog_feed_position ID of the last applied catalog change",
+            "# TYPE chatbot_catalog_feed_position gauge",
+            f"chatbot_catalog_feed_position {self._position or 0}",
+        ]
+
+catalog_feed = CatalogFeed()
+add_collector(catalog_feed.gauges)
@@ -0,0 +1,174 @@
+import math
+import re
+import threading
+from collections import defaultdict
+from agent.catalog import catalog_cache
+from agent.tool_format import format_product
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Words that carry no signal in shopper queries
+_STOPWORDS = {"a", "an", "the", "and", "or", "for", "of", "in", "with", "do", "you", "have", "any",
+              "show", "me", "i", "want", "need", "some", "is", "are", "what", "your", "size", "color"}
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in _STOPWORDS]
+
+def _trigrams(token: str) -> set:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def _product_tokens(product) -> dict:
+    """Searchable tokens of a product with their best field weight."""
+    fields = [(product["product_name"], 3.0), (product["category"], 2.0)]
+    for variant in product["variants"]:
+        fields.append((variant["color"], 1.0))
+    tokens = {}
+    for text, weight in fields:
+        for token in tokenize(text):
+            tokens[token] = max(tokens.get(token, 0.0), weight)
+    return tokens
+
+def _norm(value) -> str:
+    return (value or "").strip().lower()
+
+class CatalogIndex:
+    """
+    Inverted index over one catalog snapshot.
+
+    Product names, categories and variant colors are tokenized into an
+    inverted index. Query tokens that are not in the vocabulary are matched
+    fuzzily through a character-trigram index, so typos like "hoodei" still hit.
+    """
+
+    def __init__(self, products, version):
+        self.products = products
+        self.version = version
+        self._postings = defaultdict(dict)  # token -> {product index: field weight}
+        self._trigram_index = defaultdict(set)  # trigram -> tokens
+        self._product_tokens = []  # product index -> {token: field weight}
+        # apply() updates the index in place; searches wait for it
+        self._lock = threading.Lock()
+
+        for i, product in enumerate(products):
+            tokens = _product_tokens(product)
+            self._product_tokens.append(tokens)
+            for token, weight in tokens.items():
+                self._postings[token][i] = weight
+
+        for token in self._postings:
+            for gram in _trigrams(token):
+                self._trigram_index[gram].add(token)
+
+    def apply(self, products, version, positions):
+        """
+        Move the index to a newer snapshot in which only the products at
+        `positions` changed (same list order), re-indexing just those.
+        """
+        with self._lock:
+            for i in positions:
+                old, new = self._product_tokens[i], _product_tokens(products[i])
+                if old == new:
+                    continue  # stock or price moved; nothing searchable did
+                for token in old.keys() - new.keys():
+                    postings = self._postings[token]
+                    postings.pop(i, None)
+                    if not postings:
+                        del self._postings[token]
+                        for gram in _trigrams(token):
+                            self._trigram_index[gram].discard(token)
+                for token, weight in new.items():
+                    if token not in self._postings:
+                        for gram in _trigrams(token):
+                            self._trigram_index[gram].add(token)
+                    self._postings[token][i] = weight
+                self._product_tokens[i] = new
+            self.products = products
+            self.version = version
+
+    def _expand(self, token):
+        """Vocabulary tokens matching a query token, with a similarity in (0, 1]."""
+        if token in self._postings:
+            return {token: 1.0}
+
+        grams = _trigrams(token)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for candidate in self._trigram_index.get(gram, ()):
+                overlap[candidate] += 1
+
+        matches = {}
+        for candidate, shared in overlap.items():
+            similarity = shared / len(grams | _trigrams(candidate))
+            if candidate.startswith(token) and len(token) >= 3:
+                similarity = max(similarity, 0.8)
+            if similarity >= 0.4:
+                matches[candidate] = similarity
+        return matches
+
+    def search(self, query="", category="", size="", color="", min_price=None, max_price=None,
+               in_stock_only=False, limit=5):
+        """Return up to `limit` (product, matching variants) pairs, best first."""
+        with self._lock:
+            return self._search(query, category, size, color, min_price, max_price, in_stock_only, limit)
+
+    def _search(self, query, category, size, color, min_price, max_price, in_stock_only, limit):
+        query_tokens = tokenize(query)
+        total = max(len(self.products), 1)
+        scores = defaultdict(float)
+        for token in query_tokens:
+            for vocab_token, similarity in self._expand(token).items():
+                postings = self._postings[vocab_token]
+                idf = math.log(1 + total / len(postings))
+                for i, weight in postings.items():
+                    scores[i] += similarity * weight * idf
+
+        candidates = scores.keys() if query_tokens else range(len(self.products))
+        category, size, color = _norm(category), _norm(size), _norm(color)
+
+        results = []
+        for i in candidates:
+            product = self.products[i]
+            if category and category not in _norm(product["category"]):
+                continue
+            variants = [
+                v for v in product["variants"]
+                if (not size or _norm(v["size"]) == size)
+                and (not color or color in _norm(v["color"]))
+                and (min_price is None or v["price"] >= min_price)
+                and (max_price is None or v["price"] <= max_price)
+                and (not in_stock_only or v["stock"] > 0)
+            ]
+            if not variants:
+                continue
+            results.append((scores.get(i, 0.0), i, product, variants))
+
+        results.sort(key=lambda r: (-r[0], r[1]))
+        return [(product, variants) for _, _, product, variants in results[:limit]]
+
+def format_results(results) -> str:
+    """Compact one-block-per-product rendering for the LLM."""
+    if not results:
+        return "No matching products found."
+    return "\n\n".join(format_product(product, variants) for product, variants in results)
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_catalog_index() -> CatalogIndex:
+    """
+    Index for the current catalog snapshot. When the catalog only patched some
+    products since the index was built, just those are re-indexed; otherwise
+    it is rebuilt.
+    """
+    global _index
+    version, products = catalog_cache.get_snapshot()
+    if _index is None or _index.version != version:
+        with _index_lock:
+            if _index is None or _index.version != version:
+                changed = catalog_cache.changes_since(_index.version, version) if _index is not None else None
+                if changed is not None and _index.version < version:
+                    _index.apply(products, version, changed)
+                else:
+                    _index = CatalogIndex(products, version)
+    return _index
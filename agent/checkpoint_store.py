@@ -0,0 +1,310 @@
+import asyncio
+import itertools
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from sqlalchemy import (
+    Column, DateTime, LargeBinary, MetaData, String, Table, create_engine, event, select,
+)
+from sqlalchemy.dialects import mysql, sqlite
+
+# Durable checkpoint store settings
+CHAT_MEMORY_SQLITE_PATH = os.getenv("CHAT_MEMORY_SQLITE_PATH", "chat_memory.sqlite3")
+CHAT_MEMORY_FLUSH_INTERVAL = float(os.getenv("CHAT_MEMORY_FLUSH_INTERVAL", "0.5"))
+
+_Blob = LargeBinary().with_variant(mysql.LONGBLOB(), "mysql")
+
+metadata_obj = MetaData()
+
+# One row per conversation: only the latest checkpoint is kept
+chat_checkpoints = Table(
+    "chatbot_checkpoints",
+    metadata_obj,
+    Column("thread_id", String(255), primary_key=True),
+    Column("checkpoint_ns", String(255), primary_key=True, default=""),
+    Column("checkpoint_id", String(64), nullable=False),
+    Column("parent_checkpoint_id", String(64), nullable=True),
+    Column("checkpoint_type", String(32), nullable=False),
+    Column("checkpoint", _Blob, nullable=False),
+    Column("metadata_type", String(32), nullable=False),
+    Column("metadata", _Blob, nullable=False),
+    Column("writes_type", String(32), nullable=False),
+    Column("writes", _Blob, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+class SQLCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpointer backed by a SQL table, shared by every worker and replica.
+
+    Only the latest checkpoint of each thread is stored. Checkpoints and pending
+    writes produced during a turn are buffered in memory and written in one
+    batched upsert, either at the end of the turn (`flush`) or by the background
+    flusher, so a turn costs one read and one write instead of one per graph step.
+    """
+
+    def __init__(self, engine, flush_interval=CHAT_MEMORY_FLUSH_INTERVAL, **kwargs):
+        super().__init__(**kwargs)
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # Serializes flushes so an older snapshot never overwrites a newer one
+        self._flush_lock = threading.Lock()
+        # (thread_id, checkpoint_ns) -> buffered row not yet written
+        self._pending = {}
+        # Bumped on every change so a flush only drops rows it actually wrote
+        self._seq = itertools.count()
+        self.reads = 0
+        self.flushes = 0
+        self.rows_written = 0
+        metadata_obj.create_all(engine, tables=[chat_checkpoints])
+
+        self._flusher = None
+        if flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name="checkpoint-flusher", daemon=True)
+            self._flusher.start()
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            row = self._pending.get((thread_id, checkpoint_ns))
+            if row is not None:
+                row = {**row, "writes": dict(row["writes"])}
+        if row is None:
+            row = self._load(thread_id, checkpoint_ns)
+        if row is None:
+            return None
+
+        checkpoint_id = get_checkpoint_id(config)
+        if checkpoint_id and checkpoint_id != row["checkpoint_id"]:
+            # Older checkpoints are not kept
+            return None
+        return self._to_tuple(row)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        if config is None:
+            raise ValueError("Listing checkpoints requires a thread_id.")
+        checkpoint = self.get_tuple(config)
+        if checkpoint is None:
+            return
+        if before and get_checkpoint_id(before) and checkpoint.config["configurable"]["checkpoint_id"] >= get_checkpoint_id(before):
+            return
+        if filter and any(checkpoint.metadata.get(k) != v for k, v in filter.items()):
+            return
+        if limit is not None and limit <= 0:
+            return
+        yield checkpoint
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_type, checkpoint_bytes = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_bytes = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock:
+            self._pending[(thread_id, checkpoint_ns)] = {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+                "parent_checkpoint_id": config["configurable"].get("checkpoint_id"),
+                "checkpoint_type": checkpoint_type,
+                "checkpoint": checkpoint_bytes,
+                "metadata_type": metadata_type,
+                "metadata": metadata_bytes,
+                "writes": {},
+                "updated_at": datetime.now(timezone.utc).replace(tzinfo=None),
+                "seq": next(self._seq),
+            }
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        key = (thread_id, checkpoint_ns)
+        with self._lock:
+            row = self._pending.get(key)
+        if row is None:
+            # Writes against a checkpoint stored by an earlier flush
+            row = self._load(thread_id, checkpoint_ns)
+            if row is None:
+                return
+        if row["checkpoint_id"] != config["configurable"]["checkpoint_id"]:
+            return
+
+        with self._lock:
+            row = self._pending.setdefault(key, row)
+            for idx, (channel, value) in enumerate(writes):
+                inner_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                if inner_key[1] >= 0 and inner_key in row["writes"]:
+                    continue
+                row["writes"][inner_key] = (task_id, channel, self.serde.dumps_typed(value), task_path)
+            row["seq"] = next(self._seq)
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            for key in [k for k in self._pending if k[0] == thread_id]:
+                del self._pending[key]
+        with self.engine.begin() as conn:
+            conn.execute(chat_checkpoints.delete().where(chat_checkpoints.c.thread_id == thread_id))
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        for item in await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit))):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        # put_writes may need a DB read when the checkpoint was already flushed
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def flush(self, thread_id=None):
+        """Write buffered checkpoints (all, or one thread's) in a single batched upsert."""
+        with self._flush_lock:
+            with self._lock:
+                rows = [
+                    (key, row["seq"], self._row_params(row))
+                    for key, row in self._pending.items()
+                    if thread_id is None or key[0] == thread_id
+                ]
+            if not rows:
+                return
+
+            with self.engine.begin() as conn:
+                conn.execute(self._upsert(), [params for _, _, params in rows])
+
+            # Rows stay readable from the buffer until written; drop them unless they changed meanwhile
+            with self._lock:
+                for key, seq, _ in rows:
+                    if (row := self._pending.get(key)) is not None and row["seq"] == seq:
+                        del self._pending[key]
+            self.flushes += 1
+            self.rows_written += len(rows)
+
+    async def aflush(self, thread_id=None):
+        await asyncio.to_thread(self.flush, thread_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "backend": self.engine.dialect.name,
+            "pending": pending,
+            "reads": self.reads,
+            "flushes": self.flushes,
+            "rows_written": self.rows_written,
+        }
+
+    def _upsert(self):
+        values = {c.name: c for c in chat_checkpoints.c if not c.primary_key}
+        if self.engine.dialect.name == "mysql":
+            stmt = mysql.insert(chat_checkpoints)
+            return stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in values})
+        if self.engine.dialect.name == "sqlite":
+            stmt = sqlite.insert(chat_checkpoints)
+            return stmt.on_conflict_do_update(
+                index_elements=[chat_checkpoints.c.thread_id, chat_checkpoints.c.checkpoint_ns],
+                set_={name: stmt.excluded[name] for name in values},
+            )
+        raise ValueError(f"Unsupported checkpoint store dialect: {self.engine.dialect.name}")
+
+    def _load(self, thread_id, checkpoint_ns):
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(chat_checkpoints).where(
+                    chat_checkpoints.c.thread_id == thread_id,
+                    chat_checkpoints.c.checkpoint_ns == checkpoint_ns,
+                )
+            ).mappings().first()
+        self.reads += 1
+        if row is None:
+            return None
+        writes = self.serde.loads_typed((row["writes_type"], row["writes"]))
+        return {
+            **row,
+            "writes": {
+                (key_task, key_idx): (task_id, channel, (value_type, value), task_path)
+                for key_task, key_idx, task_id, channel, value_type, value, task_path in writes
+            },
+            "seq": next(self._seq),
+        }
+
+    def _row_params(self, row):
+        writes = [
+            (key[0], key[1], task_id, channel, value[0], value[1], task_path)
+            for key, (task_id, channel, value, task_path) in row["writes"].items()
+        ]
+        writes_type, writes_bytes = self.serde.dumps_typed(writes)
+        params = {k: v for k, v in row.items() if k != "seq"}
+        return {**params, "writes_type": writes_type, "writes": writes_bytes}
+
+    def _to_tuple(self, row):
+        thread_id, checkpoint_ns = row["thread_id"], row["checkpoint_ns"]
+        parent_id = row["parent_checkpoint_id"]
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": row["checkpoint_id"],
+                }
+            },
+            checkpoint=self.serde.loads_typed((row["checkpoint_type"], row["checkpoint"])),
+            metadata=self.serde.loads_typed((row["metadata_type"], row["metadata"])),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed(value))
+                for task_id, channel, value, _ in row["writes"].values()
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_id,
+                    }
+                }
+                if parent_id
+                else None
+            ),
+        )
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print("Error flushing chat checkpoints:", str(e))
+
+def sqlite_engine(path=CHAT_MEMORY_SQLITE_PATH):
+    """SQLite engine for the checkpoint store, tuned for several worker processes."""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"timeout": 30, "check_same_thread": False})
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
@@ -1,6 +1,7 @@
 import os
 from dotenv import load_dotenv
 from langchain.chat_models import init_chat_model
+from agent.resilience import MODEL_TIMEOUT
 
 # Load environment variables from .env if running locally
 load_dotenv()
@@ -14,5 +15,21 @@ if gemini_key:
 else:
     print("GEMINI_API_KEY not found! Make sure it's set in Render environment variables.")
 
+# Chat model answering the shoppers
+CHAT_MODEL = os.getenv("CHAT_MODEL", "gemini-2.0-flash")
+# Model that takes over while CHAT_MODEL keeps failing, e.g. gemini-2.0-flash-lite ("" = none)
+CHAT_FALLBACK_MODEL = os.getenv("CHAT_FALLBACK_MODEL", "")
+
+def _gemini(model):
+    # Deadlines and retries are handled by agent/resilience.py; the client's own
+    # retries (six, with backoff up to a minute) would hide a stalled call, so
+    # max_retries=1 makes a single attempt. The client still has a blocking
+    # time.sleep(e.retry_after) for 429s; it only runs for errors that carry a
+    # retry_after attribute, which google.api_core's ResourceExhausted does not.
+    return init_chat_model(model, model_provider="google_genai", timeout=MODEL_TIMEOUT, max_retries=1)
+
 def get_model():
-    return init_chat_model("gemini-2.0-flash", model_provider="google_genai")
+    return _gemini(CHAT_MODEL)
+
+def get_fallback_model():
+    return _gemini(CHAT_FALLBACK_MODEL) if CHAT_FALLBACK_MODEL else None
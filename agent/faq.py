@@ -0,0 +1,136 @@
+import html
+import math
+import os
+import re
+from collections import Counter
+from typing import NamedTuple, Optional
+from agent.knowledge import REFERENCE_KNOWLEDGE
+
+# Minimum similarity for answering from the FAQ without the agent
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.55"))
+# Terms a message must share with the entry (fewer only if the message has fewer);
+# one shared common word such as "where" or "payment" is not enough
+FAQ_MIN_SHARED_TERMS = int(os.getenv("FAQ_MIN_SHARED_TERMS", "2"))
+# Longer messages usually carry more than one question; leave them to the agent
+FAQ_MAX_MESSAGE_TOKENS = int(os.getenv("FAQ_MAX_MESSAGE_TOKENS", "14"))
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_QUESTION_RE = re.compile(r"^(?:Q:\s*|\d+\.\s+)(.+\?)\s*$")
+_ANSWER_RE = re.compile(r"^A:\s*(.+)$")
+
+_STOPWORDS = {
+    "a", "an", "the", "is", "are", "am", "do", "does", "did", "i", "you", "your", "my", "me", "we", "our",
+    "it", "to", "of", "in", "on", "for", "and", "or", "can", "will", "be", "if", "when", "what", "how",
+    "there", "this", "that", "with", "by", "at", "as", "any", "please", "hi", "hello", "po", "ba",
+    "s", "t", "policy", "policies",
+}
+
+# Shopper wording -> the wording used in the reference knowledge
+_SYNONYMS = {
+    "pay": "payment", "paying": "payment", "gcash": "payment", "maya": "payment", "cod": "payment",
+    "ship": "shipping", "ships": "shipping", "shipped": "shipping", "deliver": "shipping",
+    "delivered": "shipping", "deliveries": "shipping", "mindanao": "outside", "visayas": "outside",
+    "cebu": "outside", "davao": "outside", "abroad": "international", "overseas": "international",
+    "refund": "return", "refunds": "return", "exchange": "return", "exchanges": "return",
+    "signup": "account", "sign": "account", "register": "account", "registration": "account",
+    "long": "time", "info": "information", "privacy": "information", "data": "information",
+    "personal": "information",
+}
+
+# Words that mean the shopper wants products or an order looked up, not a policy
+_AGENT_ONLY = {"order", "orders", "track", "tracking", "status", "stock", "price", "size", "sizes",
+               "color", "hoodie", "hoodies", "shirt", "shirts", "jersey", "jerseys", "shorts",
+               "best", "seller", "sellers", "trending", "top", "available", "recommend",
+               "package", "packages", "parcel", "parcels", "arrive", "arrived", "arriving", "received",
+               "failed", "fail", "fails", "rejected", "declined", "error", "charged", "deducted"}
+
+def _stem(token: str) -> str:
+    for suffix in ("ing", "ed", "es", "s"):
+        if len(token) > len(suffix) + 3 and token.endswith(suffix):
+            return token[:-len(suffix)]
+    return token
+
+def message_terms(text: str) -> list:
+    """Normalized search terms of a message: stopwords dropped, synonyms mapped, stemmed."""
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        terms.append(_stem(_SYNONYMS.get(token, token)))
+    return terms
+
+class FaqEntry(NamedTuple):
+    section: str
+    question: str
+    answer: str
+    html: str
+
+class FaqMatch(NamedTuple):
+    entry: FaqEntry
+    score: float
+
+def parse_reference_knowledge(text: str = REFERENCE_KNOWLEDGE) -> list:
+    """Split the reference knowledge into (section, question, answer) entries."""
+    entries = []
+    section = ""
+    question = None
+    for raw in text.splitlines():
+        line = raw.strip()
+        if not line:
+            continue
+        if "Q&A Format" in line or line.startswith("Frequently Asked Questions"):
+            section = line.split("–")[0].split("(")[0].strip()
+            question = None
+        elif match := _QUESTION_RE.match(line):
+            question = match.group(1)
+        elif (match := _ANSWER_RE.match(line)) and question:
+            answer = match.group(1)
+            entries.append(FaqEntry(section, question, answer, f"<p>{html.escape(answer)}</p>"))
+            question = None
+    return entries
+
+class FaqIndex:
+    """
+    TF-IDF index over the reference Q&A. Each entry is indexed on its question,
+    plus its answer at half weight, and matched by cosine similarity.
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+        docs = [Counter(message_terms(e.question)) + Counter({t: 0.5 for t in message_terms(e.answer)}) for e in entries]
+        df = Counter(term for doc in docs for term in doc)
+        self._idf = {term: math.log(1 + len(docs) / n) for term, n in df.items()}
+        self._vectors = [self._weigh(doc) for doc in docs]
+
+    def _weigh(self, counts):
+        vector = {t: c * self._idf.get(t, 0.0) for t, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {t: v / norm for t, v in vector.items()}
+
+    def match(self, message: str, threshold: float = None) -> Optional[FaqMatch]:
+        """Best entry for a message, or None when nothing is confident enough."""
+        threshold = FAQ_MATCH_THRESHOLD if threshold is None else threshold
+        raw_tokens = set(_TOKEN_RE.findall(message.lower()))
+        terms = message_terms(message)
+        if not terms or len(terms) > FAQ_MAX_MESSAGE_TOKENS or raw_tokens & _AGENT_ONLY:
+            return None
+
+        query = self._weigh(Counter(terms))
+        min_shared = min(FAQ_MIN_SHARED_TERMS, len(query))
+        best = None
+        for entry, vector in zip(self.entries, self._vectors):
+            if sum(t in vector for t in query) < min_shared:
+                continue
+            score = sum(w * vector.get(t, 0.0) for t, w in query.items())
+            if best is None or score > best.score:
+                best = FaqMatch(entry, score)
+        return best if best and best.score >= threshold else None
+
+_faq_index = None
+
+def get_faq_index() -> FaqIndex:
+    """Getter for the FAQ index, built on first use"""
+    global _faq_index
+    if _faq_index is None:
+        _faq_index = FaqIndex(parse_reference_knowledge())
+    return _faq_index
@@ -0,0 +1,103 @@
+import os
+import re
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+
+# Token budget for the conversation history sent with each model call
+# (the system prompt is not included). 0 disables trimming.
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "6000"))
+# The newest turns are sent as they are, tool outputs included; the current turn always is
+CHAT_HISTORY_KEEP_TURNS = int(os.getenv("CHAT_HISTORY_KEEP_TURNS", "2"))
+# Note what the omitted turns asked about, not just the order IDs they mentioned
+CHAT_HISTORY_SUMMARY = os.getenv("CHAT_HISTORY_SUMMARY", "1") == "1"
+
+# Order IDs are UUIDs; override if the storefront changes its format
+ORDER_ID_PATTERN = re.compile(os.getenv("ORDER_ID_PATTERN", r"\b[0-9a-fA-F]{8}(?:-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}\b"))
+
+# Longest earlier request quoted in the summary, and how many of the latest are quoted
+_SUMMARY_REQUEST_CHARS = 120
+_SUMMARY_MAX_REQUESTS = 8
+
+def order_ids_in(message) -> list:
+    """Order IDs in a message's text and tool call arguments, in order of appearance."""
+    texts = [message.text if hasattr(message, "text") else str(message)]
+    for call in getattr(message, "tool_calls", None) or ():
+        texts += [str(value) for value in call["args"].values()]
+    return [match for text in texts for match in ORDER_ID_PATTERN.findall(text)]
+
+def _split_turns(messages) -> list:
+    """Messages grouped into turns, each starting at a user message."""
+    turns = []
+    for message in messages:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+def _elide(message):
+    """An old tool output replaced by a short stub; the call and its arguments stay in history."""
+    if not isinstance(message, ToolMessage):
+        return message
+    size = len(str(message.content))
+    return message.model_copy(update={
+        "content": f"[{message.name} output from an earlier turn omitted ({size} chars); call the tool again if it is needed]"
+    })
+
+def _history_note(dropped_turns, summarize) -> SystemMessage:
+    """What the omitted turns contained that later turns may rely on."""
+    order_ids = []
+    requests = []
+    for turn in dropped_turns:
+        for message in turn:
+            order_ids += [i for i in order_ids_in(message) if i not in order_ids]
+            if isinstance(message, HumanMessage):
+                requests.append(" ".join(message.text.split())[:_SUMMARY_REQUEST_CHARS])
+    lines = [f"EARLIER CONVERSATION ({len(dropped_turns)} older turns omitted):"]
+    if order_ids:
+        lines.append(f"- Order IDs the customer already gave: {', '.join(order_ids)}")
+    if summarize and requests:
+        lines.append("- The customer asked: " + "; ".join(f'"{r}"' for r in requests[-_SUMMARY_MAX_REQUESTS:]))
+    return SystemMessage(content="\n".join(lines))
+
+def trim_history(messages, budget=CHAT_HISTORY_TOKEN_BUDGET, keep_turns=CHAT_HISTORY_KEEP_TURNS,
+                 summarize=CHAT_HISTORY_SUMMARY) -> list:
+    """
+    The messages to send to the model, within about `budget` tokens.
+
+    Tool outputs older than the newest `keep_turns` turns are replaced by stubs
+    first; if that is not enough, the oldest turns are dropped whole and a note
+    keeps the order IDs they mentioned (and, with `summarize`, what was asked),
+    and then the tool outputs of the other kept turns are stubbed too. The
+    current turn is never cut, so a large tool result in it can still go over
+    the budget.
+    """
+    if budget <= 0 or count_tokens_approximately(messages) <= budget:
+        return list(messages)
+    turns = _split_turns(messages)
+    keep = max(1, keep_turns)
+    older = [[_elide(m) for m in turn] for turn in turns[:-keep]]
+    recent = turns[-keep:]
+
+    def size(note=None):
+        kept = [m for turn in older + recent for m in turn]
+        return count_tokens_approximately(kept + ([note] if note else []))
+
+    dropped = []
+    note = None
+    while older and size(note) > budget:
+        dropped.append(older.pop(0))
+        note = _history_note(dropped, summarize)
+    if size(note) > budget:
+        recent = [[_elide(m) for m in turn] for turn in recent[:-1]] + recent[-1:]
+    return ([note] if note else []) + [m for turn in older + recent for m in turn]
+
+def history_hook(state) -> dict:
+    """pre_model_hook for the agent: trims what the model sees, not the stored history."""
+    return {"llm_input_messages": trim_history(state["messages"])}
+
+def last_order_id(messages):
+    """The most recent order ID the conversation mentioned, or None."""
+    for message in reversed(messages):
+        if isinstance(message, (HumanMessage, AIMessage)) and (ids := order_ids_in(message)):
+            return ids[-1]
+    return None
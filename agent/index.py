@@ -1,154 +1,47 @@
-from agent.config import get_model
+from agent.config import get_fallback_model, get_model
+from agent.history import history_hook
+from agent.memory import build_checkpointer
+from agent.prompt_cache import PromptPrefix
+from agent.resilience import ResilientModel
 from agent.tools import getChatbotTools
+from langchain_core.messages import AIMessage, HumanMessage
 from langgraph.prebuilt import create_react_agent
-from langgraph.checkpoint.memory import MemorySaver
 
 # Globals
 _model = None
 _memory = None
 _chat_bot_agent = None
+_prompt_prefix = None
+_resilient_model = None
 
 def initialize_agent():
     """
     Initialize model and agents. Safe to call multiple times.
     """
-    global _model, _memory, _chat_bot_agent
+    global _model, _memory, _chat_bot_agent, _prompt_prefix, _resilient_model
 
     if _model is None:
         print("Loading model...")
         _model = get_model()
 
     if _memory is None:
-        _memory = MemorySaver()
+        _memory = build_checkpointer()
 
     if _chat_bot_agent is None:
-        chat_bot_prompt = """
-            `You are Ali, a knowledgeable AI assistant for Ballin Wear, a premium clothing and apparel store. Always provide responses in clean, well-formatted HTML.
-            IMPORTANT RULES:
-            - ALWAYS use tools to answer.
-            - Use only information retrieved from tools; never make up data.
-            - If the user asks for product info, top selling products, or order tracking, call the correct tool.
-            - If the user asks about an order, your answer should be based on the tool:
-                1. Always check if the ID already exists.
-                2. Always highlight all the field before the value.    
-                3. Check if the order ID is already provided (In the memory). If yes, **do NOT ask for it again**.
-                4. If user specified what they want, **directly retrieve that information**. Do NOT include any other info.  
-                    (For example, if they asked about Status, do not include other fields or information.)
-
-            HTML GUIDELINES:
-            - Use semantic HTML (h1-h3, p, ul, li, div, img).
-            - No CSS except class attributes (no colors, no styling tags).
-            - All add gaps between the items
-            - Highlight product names using: <h3 className="font-bold">
-            - Use <img> with descriptive alt text.
-            - Wrap product sections in <div className="mt-10">
-            - Clearly show variants, stock, and prices.
-            - Be friendly, professional, and proactively helpful.
-
-REFERENCE KNOWLEDGE:
-Terms and Conditions – Q&A Format
-
-1. Introduction
-Q: What does it mean when I use the BALLIN Wear e-commerce system?
-A: By using our platform, you agree to comply with our Terms and Conditions.
-
-2. Use of the System
-Q: Do I need to provide accurate information when creating an account or ordering?
-A: Yes. All users must provide complete and accurate information during registration or purchase.
-
-Q: Can I use someone else’s account?
-A: No. Unauthorized use of another person’s account is strictly prohibited.
-
-3. Orders and Payments
-Q: Are all items guaranteed to be available when I order?
-A: All orders are still subject to product availability.
-
-Q: What payment methods do you accept?
-A: We accept GCash, Maya, and Cash on Delivery (COD).
-
-Q: When is my order processed?
-A: Once your payment is confirmed, your order will be processed.
-
-4. Shipping and Delivery
-Q: Where do you deliver?
-A: We currently deliver within the Luzon area only.
-
-Q: How long does delivery take?
-A: Delivery time may vary based on your location and the courier's schedule.
-
-Q: Will I be notified when my order is shipped?
-A: Yes, customers will receive a notification once their order has been shipped.
-
-5. Limitation of Liability
-Q: Is BALLIN Wear responsible if I misuse a product?
-A: No. BALLIN Wear is not responsible for damages caused by misuse of products.
-
-Q: What if the system experiences technical issues?
-A: Technical issues or downtime may happen, but we will resolve them as soon as possible.
-
-6. Changes to the Terms
-Q: Can the Terms and Conditions change?
-A: Yes. BALLIN Wear reserves the right to update the Terms and Conditions at any time.
-
-Privacy Policy – Q&A Format
-
-1. Information Collected
-Q: What personal information do you collect?
-A: We collect your name, email, phone number, address, payment details, and browsing/purchase history.
-
-2. Use of Information
-Q: How do you use my information?
-A: We use it to process orders, provide support, enhance our services, and send updates or promotions (with your consent).
-
-3. Data Protection
-Q: How is my data protected?
-A: We use encryption and industry-standard security methods to keep your data safe.
-
-Q: Do you share my data with third parties?
-A: We only share your information with trusted payment processors and delivery services.
-
-4. Customer Rights
-Q: Can I update or delete my personal information?
-A: Yes. You may request access, correction, or deletion of your data.
-
-Q: Can I unsubscribe from promotional emails?
-A: Yes. You can opt out anytime.
-
-About Us – Q&A Format
-
-Q: What is BALLIN Wear?
-A: BALLIN Wear is a local Philippine apparel brand offering stylish, affordable, and quality fashion items.
-
-Q: What system do you use for operations?
-A: We use the "Advancing E-Commerce Operation" system—an online sales platform with chatbot and inventory management.
-
-Q: What is your goal?
-A: To combine fashion and technology for a smooth shopping experience with efficient order tracking and timely delivery.
-
-Frequently Asked Questions (FAQs)
-
-1. How do I create an account?
-A: Click the Sign Up button, fill in your details, and verify your email.
-
-2. What payment methods are accepted?
-A: GCash, Maya, and Cash on Delivery (COD).
-
-3. How long does shipping take?
-A: 3–5 business days within Metro Manila, and 5–7 days for other Luzon areas.
-
-4. Can I return or exchange an item?
-A: Currently, returns or exchanges are not offered unless stated in special cases.
-
-5. Is my payment information safe?
-A: Yes. Payments are securely processed through third-party providers, and card details are not stored.
-
-6. Do you offer shipping outside Luzon (Visayas/Mindanao or international)?
-A: No. Shipping is currently available only within the Luzon area.
-        """
+        tools = getChatbotTools()
+        # The system prompt and tool schemas are prepared once; each call only adds the conversation
+        _prompt_prefix = PromptPrefix(_model, tools)
+        # Deadlines, retries, hedging and failover around every model call
+        fallback = get_fallback_model()
+        _resilient_model = ResilientModel(
+            _prompt_prefix,
+            PromptPrefix(fallback, tools, mode="local") if fallback is not None else None,
+            model_name=getattr(_model, "model", None) or type(_model).__name__
+        )
         _chat_bot_agent = create_react_agent(
-            model=_model,
-            tools=getChatbotTools(),
-            prompt=chat_bot_prompt,
+            model=_resilient_model,
+            tools=tools,
+            pre_model_hook=history_hook,
             checkpointer=_memory
         )
 
@@ -158,4 +51,36 @@ def get_chat_bot_agent():
 
 def get_model_instance():
     """Getter for model"""
-    return _model
\ No newline at end of file
+    return _model
+
+def get_prompt_stats():
+    """How the static prompt prefix is sent, and per-call prompt sizes"""
+    return _prompt_prefix.stats() if _prompt_prefix else {"mode": None}
+
+def get_model_stats():
+    """How model calls were answered: first try, retry, hedge or fallback"""
+    return _resilient_model.stats() if _resilient_model else {"model": None}
+
+def get_memory_stats():
+    """Usage stats of the conversation checkpointer, if it reports any"""
+    stats = getattr(_memory, "stats", None)
+    return stats() if stats else {"backend": type(_memory).__name__}
+
+async def flush_memory(thread_id=None):
+    """Persist buffered checkpoints when the checkpointer batches its writes"""
+    aflush = getattr(_memory, "aflush", None)
+    if aflush:
+        await aflush(thread_id)
+
+async def record_exchange(thread_id, user_message, response):
+    """
+    Append a user message and a reply produced outside the agent to the thread's
+    memory, so later turns see it as if the agent had answered.
+    """
+    config = {"configurable": {"thread_id": thread_id}}
+    await _chat_bot_agent.aupdate_state(
+        config,
+        {"messages": [HumanMessage(content=user_message), AIMessage(content=response)]},
+        as_node="agent",
+    )
+    await flush_memory(thread_id)
@@ -0,0 +1,100 @@
+# Store policies and FAQs. Embedded in the agent prompt and indexed by the FAQ fast path.
+REFERENCE_KNOWLEDGE = """Terms and Conditions – Q&A Format
+
+1. Introduction
+Q: What does it mean when I use the BALLIN Wear e-commerce system?
+A: By using our platform, you agree to comply with our Terms and Conditions.
+
+2. Use of the System
+Q: Do I need to provide accurate information when creating an account or ordering?
+A: Yes. All users must provide complete and accurate information during registration or purchase.
+
+Q: Can I use someone else’s account?
+A: No. Unauthorized use of another person’s account is strictly prohibited.
+
+3. Orders and Payments
+Q: Are all items guaranteed to be available when I order?
+A: All orders are still subject to product availability.
+
+Q: What payment methods do you accept?
+A: We accept GCash, Maya, and Cash on Delivery (COD).
+
+Q: When is my order processed?
+A: Once your payment is confirmed, your order will be processed.
+
+4. Shipping and Delivery
+Q: Where do you deliver?
+A: We currently deliver within the Luzon area only.
+
+Q: How long does delivery take?
+A: Delivery time may vary based on your location and the courier's schedule.
+
+Q: Will I be notified when my order is shipped?
+A: Yes, customers will receive a notification once their order has been shipped.
+
+5. Limitation of Liability
+Q: Is BALLIN Wear responsible if I misuse a product?
+A: No. BALLIN Wear is not responsible for damages caused by misuse of products.
+
+Q: What if the system experiences technical issues?
+A: Technical issues or downtime may happen, but we will resolve them as soon as possible.
+
+6. Changes to the Terms
+Q: Can the Terms and Conditions change?
+A: Yes. BALLIN Wear reserves the right to update the Terms and Conditions at any time.
+
+Privacy Policy – Q&A Format
+
+1. Information Collected
+Q: What personal information do you collect?
+A: We collect your name, email, phone number, address, payment details, and browsing/purchase history.
+
+2. Use of Information
+Q: How do you use my information?
+A: We use it to process orders, provide support, enhance our services, and send updates or promotions (with your consent).
+
+3. Data Protection
+Q: How is my data protected?
+A: We use encryption and industry-standard security methods to keep your data safe.
+
+Q: Do you share my data with third parties?
+A: We only share your information with trusted payment processors and delivery services.
+
+4. Customer Rights
+Q: Can I update or delete my personal information?
+A: Yes. You may request access, correction, or deletion of your data.
+
+Q: Can I unsubscribe from promotional emails?
+A: Yes. You can opt out anytime.
+
+About Us – Q&A Format
+
+Q: What is BALLIN Wear?
+A: BALLIN Wear is a local Philippine apparel brand offering stylish, affordable, and quality fashion items.
+
+Q: What system do you use for operations?
+A: We use the "Advancing E-Commerce Operation" system—an online sales platform with chatbot and inventory management.
+
+Q: What is your goal?
+A: To combine fashion and technology for a smooth shopping experience with efficient order tracking and timely delivery.
+
+Frequently Asked Questions (FAQs)
+
+1. How do I create an account?
+A: Click the Sign Up button, fill in your details, and verify your email.
+
+2. What payment methods are accepted?
+A: GCash, Maya, and Cash on Delivery (COD).
+
+3. How long does shipping take?
+A: 3–5 business days within Metro Manila, and 5–7 days for other Luzon areas.
+
+4. Can I return or exchange an item?
+A: Currently, returns or exchanges are not offered unless stated in special cases.
+
+5. Is my payment information safe?
+A: Yes. Payments are securely processed through third-party providers, and card details are not stored.
+
+6. Do you offer shipping outside Luzon (Visayas/Mindanao or international)?
+A: No. Shipping is currently available only within the Luzon area.
+"""
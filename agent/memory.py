@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from langgraph.checkpoint.memory import InMemorySaver
+
+# Conversation memory settings
+CHAT_MEMORY_BACKEND = os.getenv("CHAT_MEMORY_BACKEND", "bounded")
+CHAT_MEMORY_MAX_THREADS = int(os.getenv("CHAT_MEMORY_MAX_THREADS", "1000"))
+CHAT_MEMORY_IDLE_TTL = float(os.getenv("CHAT_MEMORY_IDLE_TTL", "3600"))
+CHAT_MEMORY_MAX_CHECKPOINTS = int(os.getenv("CHAT_MEMORY_MAX_CHECKPOINTS", "4"))
+
+class BoundedMemorySaver(InMemorySaver):
+    """
+    In-process checkpointer with a hard bound on what it keeps.
+
+    - At most `max_threads` conversations; the least recently used one is evicted first.
+    - Conversations idle for longer than `idle_ttl` seconds are evicted.
+    - Each conversation keeps only its newest `max_checkpoints` checkpoints.
+      The latest checkpoint already carries the full message history, so older
+      ones are only needed for time travel, which the chatbot never does.
+    """
+
+    def __init__(self, max_threads=CHAT_MEMORY_MAX_THREADS, idle_ttl=CHAT_MEMORY_IDLE_TTL,
+                 max_checkpoints=CHAT_MEMORY_MAX_CHECKPOINTS, **kwargs):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.idle_ttl = idle_ttl
+        self.max_checkpoints = max(1, max_checkpoints)
+        self._lock = threading.RLock()
+        # thread_id -> last access time, least recently used first
+        self._last_access = OrderedDict()
+        # Per-thread key indexes so eviction does not scan every blob and write
+        self._blob_keys = defaultdict(set)
+        self._write_keys = defaultdict(set)
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+        self.pruned_checkpoints = 0
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        with self._lock:
+            if thread_id not in self.storage:
+                # Unknown thread: nothing to load, and the lookup must not enter the LRU
+                return None
+            self._touch(thread_id)
+            result = super().get_tuple(config)
+            if result is not None:
+                # The lookup creates an empty writes entry of the checkpoint it read
+                configurable = result.config["configurable"]
+                self._write_keys[thread_id].add(
+                    (thread_id, configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"])
+                )
+            return result
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            result = super().put(config, checkpoint, metadata, new_versions)
+            self._blob_keys[thread_id].update(
+                (thread_id, checkpoint_ns, k, v) for k, v in new_versions.items()
+            )
+            self._touch(thread_id)
+            self._prune_thread(thread_id, checkpoint_ns)
+            self._evict()
+            return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            self._write_keys[thread_id].add(
+                (thread_id, checkpoint_ns, config["configurable"]["checkpoint_id"])
+            )
+            self._touch(thread_id)
+
+    def delete_thread(self, thread_id):
+        with self._lock:
+            self.storage.pop(thread_id, None)
+            for key in self._write_keys.pop(thread_id, ()):
+                self.writes.pop(key, None)
+            for key in self._blob_keys.pop(thread_id, ()):
+                self.blobs.pop(key, None)
+            self._last_access.pop(thread_id, None)
+
+    def _touch(self, thread_id):
+        self._last_access[thread_id] = time.monotonic()
+        self._last_access.move_to_end(thread_id)
+
+    def _prune_thread(self, thread_id, checkpoint_ns):
+        """Drop all but the newest checkpoints of one thread, with their writes and unused blobs."""
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints:
+            return
+
+        # Checkpoint ids are time-ordered, so sorting them sorts by age
+        ordered = sorted(checkpoints)
+        for checkpoint_id in ordered[:-self.max_checkpoints]:
+            del checkpoints[checkpoint_id]
+            write_key = (thread_id, checkpoint_ns, checkpoint_id)
+            self.writes.pop(write_key, None)
+            self._write_keys[thread_id].discard(write_key)
+            self.pruned_checkpoints += 1
+
+        live_versions = set()
+        for saved_checkpoint, _, _ in checkpoints.values():
+            versions = self.serde.loads_typed(saved_checkpoint)["channel_versions"]
+            live_versions.update(versions.items())
+
+        thread_blobs = self._blob_keys[thread_id]
+        for key in [k for k in thread_blobs if k[1] == checkpoint_ns and (k[2], k[3]) not in live_versions]:
+            self.blobs.pop(key, None)
+            thread_blobs.discard(key)
+
+    def _evict(self):
+        if self.idle_ttl > 0:
+            deadline = time.monotonic() - self.idle_ttl
+            while self._last_access:
+                thread_id, last_access = next(iter(self._last_access.items()))
+                if last_access >= deadline:
+                    break
+                self.delete_thread(thread_id)
+                self.evicted_idle += 1
+
+        while len(self._last_access) > self.max_threads:
+            thread_id = next(iter(self._last_access))
+            self.delete_thread(thread_id)
+            self.evicted_lru += 1
+
+    def stats(self) -> dict:
+        """Memory usage of the saver: counts and approximate serialized bytes."""
+        with self._lock:
+            checkpoints = 0
+            size = 0
+            for namespaces in self.storage.values():
+                for saved in namespaces.values():
+                    checkpoints += len(saved)
+                    size += sum(len(c[1]) + len(m[1]) for c, m, _ in saved.values())
+            size += sum(len(b[1]) for b in self.blobs.values())
+            size += sum(len(w[2][1]) for ws in self.writes.values() for w in ws.values())
+            return {
+                "backend": "bounded",
+                "threads": len(self._last_access),
+                "checkpoints": checkpoints,
+                "blobs": len(self.blobs),
+                "writes": sum(len(ws) for ws in self.writes.values()),
+                "approx_bytes": size,
+                "max_threads": self.max_threads,
+                "idle_ttl": self.idle_ttl,
+                "max_checkpoints": self.max_checkpoints,
+                "evicted_lru": self.evicted_lru,
+                "evicted_idle": self.evicted_idle,
+                "pruned_checkpoints": self.pruned_checkpoints,
+            }
+
+def build_checkpointer():
+    """Create the conversation checkpointer selected by CHAT_MEMORY_BACKEND."""
+    if CHAT_MEMORY_BACKEND == "memory":
+        # Unbounded; only for local debugging
+        return InMemorySaver()
+    if CHAT_MEMORY_BACKEND == "bounded":
+        return BoundedMemorySaver()
+    if CHAT_MEMORY_BACKEND == "sqlite":
+        # Shared by all workers on one host
+        from agent.checkpoint_store import SQLCheckpointSaver, sqlite_engine
+        return SQLCheckpointSaver(sqlite_engine())
+    if CHAT_MEMORY_BACKEND == "mysql":
+        # Shared by all replicas through the store database
+        from agent.checkpoint_store import SQLCheckpointSaver
+        from config.db import engine
+        return SQLCheckpointSaver(engine)
+    raise ValueError(f"Unknown CHAT_MEMORY_BACKEND: {CHAT_MEMORY_BACKEND}")
@@ -0,0 +1,318 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+
+# name -> metric, in registration order, for /metrics
+_metrics = {}
+
+class Histogram:
+    """Prometheus-style cumulative histogram with optional labels."""
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS, labelnames=()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _metrics[name] = self
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in sorted(series.items()):
+            labels = [f'{name}="{escape_label(value)}"' for name, value in zip(self.labelnames, key)]
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_labels(labels, bound)} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(labels, '+Inf')} {values[-1]}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {values[-2]:g}")
+            lines.append(f"{self.name}_count{_labels(labels)} {values[-1]}")
+        return lines
+
+def escape_label(value: str) -> str:
+    """A label value as the exposition format needs it: backslash, quote and newline escaped."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels, le=None) -> str:
+    if le is not None:
+        labels = labels + [f'le="{le:g}"' if isinstance(le, float) else f'le="{le}"']
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+REQUEST_SECONDS = Histogram("chatbot_request_seconds", "Chat request latency", labelnames=("route", "source"))
+LLM_SECONDS = Histogram("chatbot_llm_seconds", "LLM call latency", labelnames=("model",))
+MODEL_ATTEMPT_SECONDS = Histogram("chatbot_model_attempt_seconds",
+                                  "Model call attempts (retries, hedges, fallback included) by tier and outcome",
+                                  labelnames=("tier", "outcome"))
+LLM_TOKENS = Histogram("chatbot_llm_tokens", "Tokens per LLM call", TOKEN_BUCKETS, labelnames=("direction",))
+PROMPT_TOKENS = Histogram("chatbot_prompt_tokens", "Approximate input tokens per LLM call by prompt part",
+                          TOKEN_BUCKETS, labelnames=("part",))
+TOOL_SECONDS = Histogram("chatbot_tool_seconds", "Tool invocation latency", labelnames=("tool",))
+SQL_SECONDS = Histogram("chatbot_sql_seconds", "SQL statement latency", labelnames=("statement",))
+CATALOG_CHANGE_SECONDS = Histogram("chatbot_catalog_change_seconds",
+                                   "Time from a catalog change being recorded to it being served")
+ADMISSION_WAIT_SECONDS = Histogram("chatbot_admission_wait_seconds",
+                                   "Time agent runs waited for a concurrency slot", labelnames=("outcome",))
+POOL_WAIT_SECONDS = Histogram("chatbot_pool_wait_seconds", "Time spent waiting for a pooled DB connection")
+
+# Callables returning extra exposition lines (gauges read at scrape time)
+_collectors = []
+
+def add_collector(collect):
+    """Register a callable returning extra exposition lines, read at every scrape."""
+    _collectors.append(collect)
+
+def render_metrics() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _metrics.values():
+        lines += metric.render()
+    for collect in _collectors:
+        lines += collect()
+    return "\n".join(lines) + "\n"
+
+class RequestTimings:
+    """Per-request totals by span kind, for the timing response header."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.source = "agent"
+        self._totals = {}  # kind -> [seconds, count]
+        self._lock = threading.Lock()
+
+    def add(self, kind, seconds):
+        with self._lock:
+            total = self._totals.setdefault(kind, [0.0, 0])
+            total[0] += seconds
+            total[1] += 1
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def count(self, kind) -> int:
+        with self._lock:
+            return self._totals.get(kind, (0.0, 0))[1]
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: one entry per span kind, plus the total."""
+        with self._lock:
+            parts = [f'{kind};dur={seconds * 1000:.1f};desc="{count}"'
+                     for kind, (seconds, count) in self._totals.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            spans = {kind: {"ms": round(seconds * 1000, 1), "count": count}
+                     for kind, (seconds, count) in self._totals.items()}
+        return {"total_ms": round(self.elapsed() * 1000, 1), "source": self.source, "spans": spans}
+
+# Timings of the request being served; copied into tool threads with the context
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+def _record(kind, histogram, seconds, **labels):
+    histogram.observe(seconds, **labels)
+    if (timings := _request_timings.get()) is not None:
+        timings.add(kind, seconds)
+
+@contextmanager
+def request_span(route: str):
+    """Time one chat request; the yielded RequestTimings collects its spans."""
+    timings = RequestTimings()
+    reset = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(reset)
+        REQUEST_SECONDS.observe(timings.elapsed(), route=route, source=timings.source)
+
+def set_request_source(source: str):
+    """Label the current request with how it was answered (agent, faq, cache)."""
+    if (timings := _request_timings.get()) is not None:
+        timings.source = source
+
+def request_span_count(kind: str) -> int:
+    """Spans of `kind` recorded so far in the current request (0 outside one)."""
+    timings = _request_timings.get()
+    return timings.count(kind) if timings is not None else 0
+
+@contextmanager
+def tool_span(tool: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record("tool", TOOL_SECONDS, time.perf_counter() - start, tool=tool)
+
+def _approx_tokens_from_chars(chars: int) -> int:
+    return (chars + 3) // 4
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """
+    Times every chat model call and records its token usage, including the
+    input tokens the provider read from a context cache. Providers that do not
+    report usage get a characters/4 estimate.
+    """
+    run_inline = True
+
+    def __init__(self):
+        self._runs = {}  # run_id -> (start, model, estimated input tokens)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        model = (kwargs.get("invocation_params") or {}).get("model") or (serialized or {}).get("name", "unknown")
+        prompt_chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._runs[run_id] = (time.perf_counter(), model, _approx_tokens_from_chars(prompt_chars))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        start, model, input_estimate = run
+        _record("llm", LLM_SECONDS, time.perf_counter() - start, model=model)
+        usage = None
+        text = ""
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = usage or getattr(message, "usage_metadata", None)
+                text += generation.text
+        LLM_TOKENS.observe(usage["input_tokens"] if usage else input_estimate, direction="in")
+        LLM_TOKENS.observe(usage["output_tokens"] if usage else _approx_tokens_from_chars(len(text)), direction="out")
+        if usage and (cached := (usage.get("input_token_details") or {}).get("cache_read")):
+            LLM_TOKENS.observe(cached, direction="in_cached")
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            _record("llm", LLM_SECONDS, time.perf_counter() - run[0], model=run[1])
+
+llm_metrics_callback = LLMMetricsCallback()
+
+def _statement_kind(statement: str) -> str:
+    verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return verb if verb in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+def _on_transaction_create(session, transaction):
+    # A root transaction starts on the session's first statement, right before it asks the pool for a connection
+    if transaction.parent is None:
+        session.info["chatbot_checkout_start"] = time.perf_counter()
+
+def _on_begin(session, transaction, connection):
+    start = session.info.pop("chatbot_checkout_start", None)
+    wait = getattr(connection.engine, "_chatbot_wait", None)
+    if start is None or wait is None:
+        return
+    waited = time.perf_counter() - start
+    with _wait_lock:
+        wait["checkouts"] += 1
+        wait["seconds"] += waited
+        wait["max_seconds"] = max(wait["max_seconds"], waited)
+    _record("pool_wait", POOL_WAIT_SECONDS, waited)
+
+def _on_transaction_end(session, transaction):
+    # Still set: the transaction never got a connection. A pool timeout shows as
+    # one that ended after waiting at least the pool timeout; a transaction that
+    # ran no statement ends at once.
+    if transaction.parent is not None or (start := session.info.pop("chatbot_checkout_start", None)) is None:
+        return
+    bind = session.bind
+    wait = getattr(bind, "_chatbot_wait", None)
+    timeout = getattr(getattr(bind, "pool", None), "_timeout", None)
+    if wait is not None and timeout is not None and time.perf_counter() - start >= timeout:
+        with _wait_lock:
+            wait["timeouts"] += 1
+
+_wait_lock = threading.Lock()
+
+# pool label -> instrumented engine, for the pool gauges
+_pools = {}
+
+def instrument_engine(engine, pool="primary"):
+    """
+    Time every SQL statement of an engine, and how long its sessions wait for
+    a pooled connection: from a transaction's first statement to the
+    connection being ready (pool wait, plus the idle ping or a new connection
+    when they happen). Core connections (engine.connect()) are not timed.
+    Its pool gauges carry the `pool` label.
+    """
+    if getattr(engine, "_chatbot_metrics", False):
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("chatbot_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("chatbot_query_start")
+        if starts:
+            _record("sql", SQL_SECONDS, time.perf_counter() - starts.pop(), statement=_statement_kind(statement))
+
+    if not event.contains(Session, "after_begin", _on_begin):
+        event.listen(Session, "after_transaction_create", _on_transaction_create)
+        event.listen(Session, "after_begin", _on_begin)
+        event.listen(Session, "after_transaction_end", _on_transaction_end)
+    engine._chatbot_wait = {"checkouts": 0, "seconds": 0.0, "max_seconds": 0.0, "timeouts": 0}
+    engine._chatbot_metrics = True
+    _pools[pool] = engine
+
+def pool_stats(engine) -> dict:
+    """Connections in use, idle and in overflow, plus checkout waits, for one engine."""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        if callable(getattr(pool, name, None)):
+            stats[name] = getattr(pool, name)()
+    if (timeout := getattr(pool, "_timeout", None)) is not None:
+        stats["timeout"] = timeout
+    if (max_overflow := getattr(pool, "_max_overflow", None)) is not None:
+        stats["max_overflow"] = max_overflow
+    wait = getattr(engine, "_chatbot_wait", None)
+    if wait is not None:
+        stats["checkouts"] = wait["checkouts"]
+        stats["wait_timeouts"] = wait["timeouts"]
+        stats["wait_mean_ms"] = round(wait["seconds"] / wait["checkouts"] * 1000, 3) if wait["checkouts"] else 0.0
+        stats["wait_max_ms"] = round(wait["max_seconds"] * 1000, 3)
+    return stats
+
+_POOL_GAUGES = (
+    ("chatbot_db_pool_checkedout", "checkedout", "gauge", "Pooled connections in use"),
+    ("chatbot_db_pool_checkedin", "checkedin", "gauge", "Idle pooled connections"),
+    ("chatbot_db_pool_overflow", "overflow", "gauge", "Connections beyond the pool size (negative: pool not full yet)"),
+    ("chatbot_db_pool_size", "size", "gauge", "Configured pool size"),
+    ("chatbot_db_pool_timeouts_total", "wait_timeouts", "counter", "Checkouts that gave up waiting for a connection"),
+)
+
+def _pool_gauges() -> list:
+    """One family per pool statistic, with a series per instrumented engine."""
+    stats = {pool: pool_stats(engine) for pool, engine in list(_pools.items())}
+    lines = []
+    for name, key, kind, help in _POOL_GAUGES:
+        series = [f'{name}{{pool="{escape_label(pool)}"}} {values[key]}' for pool, values in stats.items() if key in values]
+        if series:
+            lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"] + series
+    return lines
+
+add_collector(_pool_gauges)
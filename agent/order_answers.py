@@ -0,0 +1,155 @@
+import asyncio
+import html
+import re
+from typing import NamedTuple, Optional
+from langchain_core.messages import AIMessage, HumanMessage
+from agent.history import ORDER_ID_PATTERN, last_order_id, order_ids_in
+from agent.orders import get_order
+from agent.tools import run_in_tool_pool
+
+_WORD_RE = re.compile(r"[a-z]+")
+
+# Order field -> words that ask for it
+_FIELD_WORDS = {
+    "status": {"status", "track", "tracking"},
+    "payment_method": {"payment", "pay", "paid"},
+    "total": {"total", "amount", "much"},
+    "subtotal": {"subtotal"},
+    "order_date": {"date", "placed"},
+    "address": {"address"},
+    "items": {"item", "items", "bought", "contain", "contains", "contents"},
+    "cancellation_reason": {"cancellation", "cancelled", "canceled"},
+}
+# Requests to change an order, rather than read it, go to the agent
+_ACTION_WORDS = {"change", "update", "edit", "modify", "cancel", "return", "refund", "exchange"}
+# Longer messages usually ask more than one thing; leave them to the agent
+_MAX_TEMPLATE_WORDS = 16
+# Without an order ID or the word "order", a follow-up like "and the status?"
+# is about the order the previous turns were on only if it has no other words than these
+_FOLLOW_UP_WORDS = {"what", "whats", "s", "is", "are", "was", "were", "the", "my", "its", "it", "this", "that",
+                    "and", "about", "how", "did", "do", "i", "me", "can", "you", "tell", "show", "please",
+                    "again", "now", "then", "of", "in", "on", "for", "use", "used"}
+
+class OrderQuestion(NamedTuple):
+    order_id: str
+    field: Optional[str]  # set when the message asks for exactly one field
+
+def _asked_fields(words) -> set:
+    return {field for field, keys in _FIELD_WORDS.items() if keys & words}
+
+def mentions_order(message: str) -> bool:
+    """Whether a message is about an order at all (worth looking for an ID in memory)."""
+    words = set(_WORD_RE.findall(message.lower()))
+    return bool(ORDER_ID_PATTERN.search(message) or "order" in words or _asked_fields(words))
+
+def _is_follow_up(words) -> bool:
+    """Whether a message without an order ID can only be asking about the order under discussion."""
+    if "order" in words:
+        return True
+    fields = _asked_fields(words)
+    field_words = set().union(*(_FIELD_WORDS[f] for f in fields))
+    return bool(fields) and not words - field_words - _FOLLOW_UP_WORDS
+
+def _current_order_id(history):
+    """
+    The order the latest turns of `history` were about: the last order ID
+    mentioned, if every user message since then was an order follow-up.
+    """
+    for message in reversed(history):
+        if isinstance(message, (HumanMessage, AIMessage)) and (ids := order_ids_in(message)):
+            return ids[-1]
+        if isinstance(message, HumanMessage) and not _is_follow_up(set(_WORD_RE.findall(message.text.lower()))):
+            return None
+    return None
+
+def parse_order_question(message: str, history=()) -> Optional[OrderQuestion]:
+    """
+    The order a message is about and the single field it asks for, if any.
+    The order is the message's own order ID; a message that says "order" may
+    mean the last one in `history`, and a bare follow-up ("and the total?")
+    only the one the previous turns were about. None when the message is not
+    about an order or no order ID is known.
+    """
+    ids = ORDER_ID_PATTERN.findall(message)
+    text = ORDER_ID_PATTERN.sub(" ", message.lower())
+    words = set(_WORD_RE.findall(text))
+    fields = _asked_fields(words)
+    if ids:
+        order_id = ids[-1]
+    elif "order" in words:
+        order_id = last_order_id(history)
+    elif _is_follow_up(words):
+        order_id = _current_order_id(history)
+    else:
+        return None
+    if order_id is None:
+        return None
+    single = (len(fields) == 1 and not words & _ACTION_WORDS
+              and len(_WORD_RE.findall(text)) <= _MAX_TEMPLATE_WORDS)
+    return OrderQuestion(order_id, next(iter(fields)) if single else None)
+
+def _field(label, value) -> str:
+    return f"<p><strong>{label}:</strong> {html.escape(str(value))}</p>"
+
+def render_order_field(order: dict, field: str) -> str:
+    """HTML answer with just the requested field, as the agent is told to answer."""
+    if field == "status":
+        return _field("Status", order["status"])
+    if field == "payment_method":
+        return _field("Payment Method", order["payment_method"])
+    if field == "total":
+        return _field("Total", f"₱{order['total']}")
+    if field == "subtotal":
+        return _field("Subtotal", f"₱{order['subtotal']}")
+    if field == "order_date":
+        return _field("Order Date", order["order_date"])
+    if field == "cancellation_reason":
+        return _field("Cancellation Reason", order["cancellation_reason"])
+    if field == "address":
+        addr = order["address"]
+        if not addr:
+            return "<p><strong>Shipping Address:</strong> No shipping address found.</p>"
+        lines = [addr["fullname"], addr["address_line_1"], addr["address_line_2"],
+                 f"{addr['admin_area_2']}, {addr['admin_area_1']}", addr["postal_code"], f"Phone: {addr['phone']}"]
+        return "<p><strong>Shipping Address:</strong></p>\n<p>" + "<br>".join(html.escape(str(line)) for line in lines if line) + "</p>"
+    if field == "items":
+        if not order["items"]:
+            return "<p><strong>Items:</strong> No items found for this order.</p>"
+        items = "\n".join(
+            f'<li><img src="{html.escape(i["image"])}" alt="{html.escape(i["product_name"])}">'
+            f'<h3 className="font-bold">{html.escape(i["product_name"])}</h3>'
+            f"<p><strong>Size:</strong> {html.escape(i['size'])}, <strong>Color:</strong> {html.escape(i['color'])}, "
+            f"<strong>Quantity:</strong> {i['quantity']}, <strong>Total:</strong> ₱{i['total']}</p></li>"
+            for i in order["items"]
+        )
+        return f"<p><strong>Items:</strong></p>\n<ul>\n{items}\n</ul>"
+    raise ValueError(f"Unknown order field: {field}")
+
+def order_not_found(order_id: str) -> str:
+    return (f"<p>No order found with ID: <strong>{html.escape(order_id)}</strong>. "
+            "Please check the order ID and try again.</p>")
+
+async def answer_order_field(question: OrderQuestion) -> str:
+    """Template answer to a single-field question, read through the order cache."""
+    entry = await run_in_tool_pool(get_order, question.order_id)
+    if entry is None:
+        return order_not_found(question.order_id)
+    return render_order_field(entry["order"], question.field)
+
+# Running prefetches, referenced until they finish
+_prefetches = set()
+
+def prefetch_order(order_id: str):
+    """
+    Start loading an order into the order cache without waiting for it, so the
+    agent's get_order_details call finds it loaded (or joins the load).
+    """
+    task = asyncio.get_running_loop().create_task(run_in_tool_pool(get_order, order_id))
+    _prefetches.add(task)
+    task.add_done_callback(_prefetch_done)
+    return task
+
+def _prefetch_done(task):
+    _prefetches.discard(task)
+    if not task.cancelled() and (error := task.exception()) is not None:
+        print("Order prefetch failed:", str(error))
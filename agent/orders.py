@@ -0,0 +1,169 @@
+import os
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy import select
+from agent.shared_cache import TieredCache
+from config.replicas import read_scope, replica_router
+from models.Customer import Customer
+from models.Order import Order
+from models.OrderAddress import OrderAddress
+from models.OrderItem import OrderItem
+from models.Product import Product
+from models.Thumbnail import Thumbnail
+
+# Orders in these states never change again, so their details can be cached for long
+TERMINAL_STATUSES = {"Received", "Cancelled", "Rejected", "Failed"}
+
+ORDER_CACHE_SIZE = int(os.getenv("ORDER_CACHE_SIZE", "2048"))
+ORDER_CACHE_TERMINAL_TTL = float(os.getenv("ORDER_CACHE_TERMINAL_TTL", "86400"))
+ORDER_CACHE_ACTIVE_TTL = float(os.getenv("ORDER_CACHE_ACTIVE_TTL", "60"))
+# An expired entry is still answered from for this long while it is reloaded
+ORDER_CACHE_STALE_TTL = float(os.getenv("ORDER_CACHE_STALE_TTL", "30"))
+# Orders placed within this many seconds are read from the primary: a replica
+# may not have them yet, or may still show their first status.
+ORDER_FRESHNESS_WINDOW = float(os.getenv("ORDER_FRESHNESS_WINDOW", "600"))
+
+def load_order(db, order_id: str):
+    """Load one order with its customer, items and address as a plain dict, or None."""
+    # Column selects: one row for the order, customer and address, one per item
+    order = db.execute(
+        select(
+            Order.order_id, Order.customer_id, Order.status, Order.payment_method, Order.subtotal,
+            Order.total, Order.order_date, Order.cancellation_reason,
+            Customer.firstname, Customer.lastname,
+            OrderAddress.fullname, OrderAddress.address_line_1, OrderAddress.address_line_2,
+            OrderAddress.admin_area_1, OrderAddress.admin_area_2, OrderAddress.postal_code, OrderAddress.phone,
+        )
+        .outerjoin(Customer, Customer.id == Order.customer_id)
+        .outerjoin(OrderAddress, OrderAddress.order_id == Order.order_id)
+        .where(Order.order_id == order_id)
+    ).first()
+    if not order:
+        return None
+    items = db.execute(
+        select(
+            Product.product_name, Thumbnail.thumbnailUrl,
+            OrderItem.size, OrderItem.color, OrderItem.price, OrderItem.quantity, OrderItem.total,
+        )
+        .outerjoin(Product, Product.id == OrderItem.product_id)
+        .outerjoin(Thumbnail, Thumbnail.product_id == Product.id)
+        .where(OrderItem.order_id == order_id)
+        .order_by(OrderItem.id)
+    ).all()
+
+    # Format enums and order date
+    utc_date = order.order_date.replace(tzinfo=ZoneInfo("UTC"))
+    manila_date = utc_date.astimezone(ZoneInfo("Asia/Manila"))
+
+    return {
+        "order_id": order.order_id,
+        "customer_id": order.customer_id,
+        "customer_name": f"{order.firstname} {order.lastname}" if order.firstname is not None else "N/A",
+        "status": order.status.value if order.status else "N/A",
+        "payment_method": order.payment_method.value if order.payment_method else "N/A",
+        "subtotal": order.subtotal,
+        "total": order.total,
+        "order_date": manila_date.strftime("%B %d, %Y %I:%M %p"),
+        "placed_at": utc_date,
+        "cancellation_reason": order.cancellation_reason or "No cancellation reason.",
+        "address": {
+            "fullname": order.fullname,
+            "address_line_1": order.address_line_1,
+            "address_line_2": order.address_line_2,
+            "admin_area_1": order.admin_area_1,
+            "admin_area_2": order.admin_area_2,
+            "postal_code": order.postal_code,
+            "phone": order.phone,
+        } if order.fullname is not None else None,
+        "items": [
+            {
+                "image": item.thumbnailUrl if item.thumbnailUrl is not None else "No image available",
+                "product_name": item.product_name if item.product_name is not None else "N/A",
+                "size": item.size,
+                "color": item.color,
+                "price": item.price,
+                "quantity": item.quantity,
+                "total": item.total,
+            }
+            for item in items
+        ],
+    }
+
+def format_order_details(order: dict) -> str:
+    """Render an order dict as the text block get_order_details returns."""
+    # Summary
+    summary = f"""
+Order ID: {order["order_id"]}
+Customer ID: {order["customer_id"]}
+Customer Name: {order["customer_name"]}
+Status: {order["status"]}
+Payment Method: {order["payment_method"]}
+Subtotal: ₱{order["subtotal"]}
+Shipping Fee: Free
+Total: ₱{order["total"]}
+Order Date: {order["order_date"]}
+"""
+
+    # Address
+    if addr := order["address"]:
+        address = f"""
+Shipping Address:
+  Name: {addr["fullname"]}
+  {addr["address_line_1"]}
+  {addr["address_line_2"]}
+  {addr["admin_area_2"]}, {addr["admin_area_1"]}
+  {addr["postal_code"]}
+  Phone: {addr["phone"]}
+"""
+    else:
+        address = "No shipping address found.\n"
+
+    items_list = []
+    for i, item in enumerate(order["items"], 1):
+        item_str = f"""
+Item {i}:
+- Image: {item["image"]}
+- Product Name: {item["product_name"]}
+- Size: {item["size"]}
+- Color: {item["color"]}
+- Price: ₱{item["price"]}
+- Quantity: {item["quantity"]}
+- Total: ₱{item["total"]}
+"""
+        items_list.append(item_str)
+    items = "\n".join(items_list) if items_list else "No items found for this order."
+
+    return f"Order summary:{summary}\n{address}\nOrder items:\n{items}\nCancellation Reason: {order['cancellation_reason']}\n"
+
+def _order_ttl(entry) -> float:
+    if entry is None:
+        # Unknown ids are not cached; the order may be created any moment
+        return 0
+    if entry["order"]["status"] in TERMINAL_STATUSES:
+        return ORDER_CACHE_TERMINAL_TTL
+    return ORDER_CACHE_ACTIVE_TTL
+
+# Rendered order details by order_id, with status-aware TTLs, shared by the workers
+order_cache = TieredCache("order_details", maxsize=ORDER_CACHE_SIZE, ttl=_order_ttl, stale_ttl=ORDER_CACHE_STALE_TTL)
+
+def _is_recent(order) -> bool:
+    return datetime.now(timezone.utc) - order["placed_at"] < timedelta(seconds=ORDER_FRESHNESS_WINDOW)
+
+def get_order(order_id: str):
+    """
+    Cached order details: {"order": dict, "text": rendered details}, or None
+    when the order does not exist.
+    """
+    def load():
+        with read_scope() as db:
+            order = load_order(db, order_id)
+        if replica_router.enabled and (order is None or _is_recent(order)):
+            with read_scope(fresh=True) as db:
+                order = load_order(db, order_id)
+        return {"order": order, "text": format_order_details(order)} if order else None
+
+    return order_cache.get_or_load(order_id, load)
+
+def invalidate_order(order_id: str = None):
+    """Drop cached order details of one order (of every order without an id) in every worker; call when an order changes."""
+    order_cache.invalidate(order_id)
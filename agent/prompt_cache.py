@@ -0,0 +1,216 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable, NamedTuple
+from agent.knowledge import REFERENCE_KNOWLEDGE
+from agent.metrics import PROMPT_TOKENS
+from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableLambda
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# "auto": keep the static prompt prefix in the provider's context cache when
+# the model supports it, else send it with every call; "local": always send it
+PROMPT_CACHE = os.getenv("PROMPT_CACHE", "auto")
+# Lifetime of a provider cache in seconds; it is renewed in the background before it runs out
+PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "3600"))
+# Smallest prefix (approximate tokens) worth a provider cache. Gemini refuses
+# explicit caches under 4096 tokens, so smaller prefixes skip the API call.
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "4096"))
+
+# Calls stop using a provider cache this many seconds before it expires
+_EXPIRY_MARGIN = 30
+
+# The static part of every model call. Built once; nothing per request goes in here.
+SYSTEM_PROMPT = f"""
+            `You are Ali, a knowledgeable AI assistant for Ballin Wear, a premium clothing and apparel store. Always provide responses in clean, well-formatted HTML.
+            IMPORTANT RULES:
+            - ALWAYS use tools to answer.
+            - Use only information retrieved from tools; never make up data.
+            - If the user asks for product info, top selling products, or order tracking, call the correct tool.
+            - For questions about specific products (name, category, size, color, price, stock), use search_products with filters. Only use products_tool when the user wants to browse the whole catalog.
+            - If the user asks about an order, your answer should be based on the tool:
+                1. Always check if the ID already exists.
+                2. Always highlight all the field before the value.    
+                3. Check if the order ID is already provided (In the memory). If yes, **do NOT ask for it again**.
+                4. If user specified what they want, **directly retrieve that information**. Do NOT include any other info.  
+                    (For example, if they asked about Status, do not include other fields or information.)
+
+            HTML GUIDELINES:
+            - Use semantic HTML (h1-h3, p, ul, li, div, img).
+            - No CSS except class attributes (no colors, no styling tags).
+            - All add gaps between the items
+            - Highlight product names using: <h3 className="font-bold">
+            - Use <img> with descriptive alt text.
+            - Wrap product sections in <div className="mt-10">
+            - Clearly show variants, stock, and prices.
+            - Be friendly, professional, and proactively helpful.
+
+REFERENCE KNOWLEDGE:
+{REFERENCE_KNOWLEDGE}
+"""
+
+class ProviderCache(NamedTuple):
+    name: str
+    model: object  # chat model that reads the prefix from the cache instead of being sent it
+    expires_at: float  # epoch seconds
+    renew: Callable[[], float]  # extends the cache and returns the new expiry
+    missing_errors: tuple  # errors of a call whose cache was deleted or expired early
+
+def _gemini_cache(model, system_message, tools, ttl) -> ProviderCache:
+    """Explicit Gemini context cache holding the system instruction and the tool declarations."""
+    from google.ai.generativelanguage_v1beta import CacheServiceClient, CachedContent
+    from google.api_core.exceptions import NotFound, PermissionDenied
+    from google.protobuf import duration_pb2, field_mask_pb2
+
+    # The model's own request builder converts the prompt and tools exactly as a call would
+    request = model._prepare_request([system_message, HumanMessage(content="-")], tools=tools)
+    api_key = model.google_api_key.get_secret_value() if model.google_api_key else None
+    client = CacheServiceClient(client_options={"api_key": api_key} if api_key else None)
+    cached = client.create_cached_content(cached_content=CachedContent(
+        model=model.model,
+        display_name="chatbot-system-prompt",
+        system_instruction=request.system_instruction,
+        tools=request.tools,
+        ttl=duration_pb2.Duration(seconds=ttl),
+    ), timeout=10)
+
+    def renew() -> float:
+        updated = client.update_cached_content(
+            cached_content=CachedContent(name=cached.name, ttl=duration_pb2.Duration(seconds=ttl)),
+            update_mask=field_mask_pb2.FieldMask(paths=["ttl"]),
+            timeout=10,
+        )
+        return updated.expire_time.timestamp()
+
+    return ProviderCache(cached.name, model.model_copy(update={"cached_content": cached.name}),
+                         cached.expire_time.timestamp(), renew, (NotFound, PermissionDenied))
+
+# Model _llm_type -> function creating a provider cache of the prompt prefix
+PROVIDER_CACHES = {"chat-google-generative-ai": _gemini_cache}
+
+def _tool_tokens(tools) -> int:
+    """Approximate tokens of the tool schemas sent with each call."""
+    return sum((len(json.dumps(convert_to_openai_tool(tool))) + 3) // 4 for tool in tools)
+
+def volatile_messages(messages) -> list:
+    """
+    The per-call part of a model call. Notes that the history trimmer adds as
+    system messages become context messages, so the system instruction is the
+    same on every call (Gemini folds later system messages into it).
+    """
+    return [HumanMessage(content=f"[Context, not from the customer]\n{m.content}") if isinstance(m, SystemMessage) else m
+            for m in messages]
+
+class PromptPrefix:
+    """
+    The static start of every model call, the system prompt and the tool
+    schemas, prepared once at startup. Used as the agent's model: each call
+    gets the volatile messages and either the provider cache, which already
+    holds the prefix, or the same prefix message sent byte for byte, which
+    providers with implicit prefix caching can still reuse.
+    """
+
+    def __init__(self, model, tools, text=SYSTEM_PROMPT, mode=PROMPT_CACHE, ttl=PROMPT_CACHE_TTL,
+                 min_tokens=PROMPT_CACHE_MIN_TOKENS):
+        self.message = SystemMessage(content=text)
+        self.ttl = ttl
+        self.tokens = count_tokens_approximately([self.message]) + _tool_tokens(tools)
+        self.fingerprint = hashlib.sha256(
+            (text + json.dumps([convert_to_openai_tool(t) for t in tools], sort_keys=True)).encode()
+        ).hexdigest()[:16]
+        self._local = RunnableLambda(self._with_prefix, name="prompt_prefix") | model.bind_tools(tools)
+        self._provider = None
+        self._cached = None
+        self._renewing = threading.Lock()
+        self._next_renewal = 0.0
+        self._lock = threading.Lock()
+        self._calls = {"local": 0, "provider": 0}
+        self._volatile_tokens = 0
+        self.reason = "PROMPT_CACHE=local" if mode != "auto" else None
+        if mode == "auto":
+            self._create_provider_cache(model, tools, min_tokens)
+
+    def _create_provider_cache(self, model, tools, min_tokens):
+        create = PROVIDER_CACHES.get(getattr(model, "_llm_type", None))
+        if create is None:
+            self.reason = f"no context cache for {type(model).__name__}"
+            return
+        if self.tokens < min_tokens:
+            self.reason = f"prefix of ~{self.tokens} tokens is under the {min_tokens} token minimum"
+            return
+        try:
+            self._provider = create(model, self.message, tools, self.ttl)
+        except Exception as e:
+            print("Prompt cache unavailable, sending the prompt with every call:", str(e))
+            self.reason = str(e)
+            return
+        # A cached call that fails because the cache is gone is retried with the prefix
+        # sent. Other errors (429, 5xx) go to the caller's retries and circuit breaker
+        # rather than being sent again at once.
+        self._cached = (RunnableLambda(self._without_prefix, name="prompt_prefix") | self._provider.model) \
+            .with_fallbacks([self._local], exceptions_to_handle=self._provider.missing_errors)
+        print(f"Prompt prefix cached by the provider as {self._provider.name} (~{self.tokens} tokens)")
+
+    def _count(self, source, volatile):
+        tokens = count_tokens_approximately(volatile)
+        with self._lock:
+            self._calls[source] += 1
+            self._volatile_tokens += tokens
+        PROMPT_TOKENS.observe(tokens, part="volatile")
+        PROMPT_TOKENS.observe(self.tokens, part="prefix_cached" if source == "provider" else "prefix_sent")
+
+    def _with_prefix(self, messages) -> list:
+        volatile = volatile_messages(messages)
+        self._count("local", volatile)
+        return [self.message] + volatile
+
+    def _without_prefix(self, messages) -> list:
+        volatile = volatile_messages(messages)
+        self._count("provider", volatile)
+        return volatile
+
+    def __call__(self, state, runtime):
+        """Dynamic model for create_react_agent: picks the cached or the local prefix for one call."""
+        provider = self._provider
+        if provider is not None:
+            remaining = provider.expires_at - time.time()
+            if remaining < self.ttl / 4 and time.time() >= self._next_renewal:
+                self._renew_in_background()
+            if remaining > _EXPIRY_MARGIN:
+                return self._cached
+        return self._local
+
+    def _renew_in_background(self):
+        if self._renewing.acquire(blocking=False):
+            threading.Thread(target=self._renew, name="prompt-cache-renew", daemon=True).start()
+
+    def _renew(self):
+        try:
+            self._provider = self._provider._replace(expires_at=self._provider.renew())
+        except Exception as e:
+            print("Renewing the prompt cache failed:", str(e))
+            self._next_renewal = time.time() + _EXPIRY_MARGIN
+        finally:
+            self._renewing.release()
+
+    def stats(self) -> dict:
+        provider = self._provider
+        with self._lock:
+            calls = dict(self._calls)
+            volatile = self._volatile_tokens
+        total = calls["local"] + calls["provider"]
+        return {
+            "mode": "provider" if provider is not None else "local",
+            "provider_cache": provider.name if provider is not None else None,
+            "provider_cache_expires_in": round(provider.expires_at - time.time()) if provider is not None else None,
+            "local_reason": self.reason if provider is None else None,
+            "fingerprint": self.fingerprint,
+            "prefix_tokens": self.tokens,
+            "calls": calls,
+            "prefix_tokens_sent": calls["local"] * self.tokens,
+            "prefix_tokens_cached": calls["provider"] * self.tokens,
+            "volatile_tokens_mean": round(volatile / total, 1) if total else 0.0,
+        }
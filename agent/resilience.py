@@ -0,0 +1,415 @@
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk
+from langchain_core.messages.tool import tool_call_chunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from agent.metrics import MODEL_ATTEMPT_SECONDS, add_collector
+
+# Seconds one model attempt may take (streamed: until its first chunk, then between chunks)
+MODEL_TIMEOUT = float(os.getenv("MODEL_TIMEOUT", "20"))
+# Seconds one model call may take across its attempts, retries and fallback included
+MODEL_CALL_DEADLINE = float(os.getenv("MODEL_CALL_DEADLINE", "45"))
+# Retries of a model call after a transient error (429, 5xx, timeout)
+MODEL_RETRIES = int(os.getenv("MODEL_RETRIES", "2"))
+# Base of the exponential retry backoff in seconds; each wait is drawn at random up to it
+MODEL_RETRY_BACKOFF = float(os.getenv("MODEL_RETRY_BACKOFF", "0.5"))
+# Send a second, hedged request when the first is slower than MODEL_HEDGE_PERCENTILE
+# of recent calls; MODEL_HEDGE_BUDGET caps hedges as a share of all calls
+MODEL_HEDGE = os.getenv("MODEL_HEDGE", "0") == "1"
+MODEL_HEDGE_PERCENTILE = float(os.getenv("MODEL_HEDGE_PERCENTILE", "95"))
+MODEL_HEDGE_BUDGET = float(os.getenv("MODEL_HEDGE_BUDGET", "0.05"))
+# Consecutive failed attempts that open the circuit: calls then go straight to the
+# fallback model (or fail at once without one) for MODEL_BREAKER_COOLDOWN seconds
+MODEL_BREAKER_FAILURES = int(os.getenv("MODEL_BREAKER_FAILURES", "5"))
+MODEL_BREAKER_COOLDOWN = float(os.getenv("MODEL_BREAKER_COOLDOWN", "30"))
+
+# Recent latencies kept for the hedge threshold, and how many it needs first
+_LATENCY_WINDOW = 500
+_MIN_LATENCY_SAMPLES = 50
+_BACKOFF_CAP = 4.0
+# Attempts run without the caller's callbacks: only the winning attempt's output
+# reaches the stream and the LLM metrics, through this wrapper
+_QUIET = {"callbacks": []}
+
+TRANSIENT_STATUS = (408, 429, 500, 502, 503, 504)
+
+def is_transient(error: BaseException) -> bool:
+    """Whether another attempt (or another model) may succeed where this one failed."""
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, ModelUnavailable)):
+        return True
+    # google.api_core errors carry the HTTP status as `code`, httpx-based clients as `status_code`
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    return status in TRANSIENT_STATUS
+
+class ModelUnavailable(Exception):
+    """The primary model's circuit is open and there is no fallback model; retry after `retry_after` seconds."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """
+    Opens after `failures` consecutive failed attempts and stays open for
+    `cooldown` seconds. Then one call at a time probes the model (half-open):
+    a success closes the circuit, a failure opens it again.
+    """
+
+    def __init__(self, failures=MODEL_BREAKER_FAILURES, cooldown=MODEL_BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at = None
+        self.opens = 0
+        self._probe_started = None  # a probe that never reports back is given up after `cooldown`
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "open" if time.monotonic() - self.opened_at < self.cooldown else "half_open"
+
+    def remaining(self) -> float:
+        """Seconds until the open circuit lets a probe through (0 unless open)."""
+        opened_at = self.opened_at
+        if opened_at is None:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - opened_at))
+
+    def allow(self) -> bool:
+        """Whether a call may use the model; in half-open state only one probe at a time."""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            now = time.monotonic()
+            if state == "half_open" and (self._probe_started is None or now - self._probe_started > self.cooldown):
+                self._probe_started = now
+                return True
+            return False
+
+    def record(self, ok: bool):
+        if not self.failures:
+            return
+        with self._lock:
+            self._probe_started = None
+            if ok:
+                self.consecutive = 0
+                self.opened_at = None
+                return
+            self.consecutive += 1
+            if self.opened_at is not None or self.consecutive >= self.failures:
+                if self.opened_at is None or self.state == "half_open":
+                    self.opens += 1
+                self.opened_at = time.monotonic()
+
+class ResiliencePolicy:
+    """Settings and shared state (breaker, latency window, counters) of the resilient model calls."""
+
+    def __init__(self, timeout=MODEL_TIMEOUT, call_deadline=MODEL_CALL_DEADLINE, retries=MODEL_RETRIES,
+                 backoff=MODEL_RETRY_BACKOFF, hedge=MODEL_HEDGE, hedge_percentile=MODEL_HEDGE_PERCENTILE,
+                 hedge_budget=MODEL_HEDGE_BUDGET, breaker=None, seed=None):
+        self.timeout = timeout
+        self.call_deadline = call_deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.breaker = breaker or CircuitBreaker()
+        self._rng = random.Random(seed)
+        self._latencies = {True: deque(maxlen=_LATENCY_WINDOW), False: deque(maxlen=_LATENCY_WINDOW)}
+        self._lock = threading.Lock()
+        # How calls were answered: first attempt, after a retry, by a hedged
+        # request, by the fallback model, or not at all
+        self.paths = {"primary": 0, "retry": 0, "hedge": 0, "fallback": 0, "failed": 0}
+        self.calls = 0
+        self.retried = 0
+        self.hedges = 0
+        self.timeouts = 0
+
+    def backoff_delay(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number `attempt` (from 0)."""
+        return self._rng.uniform(0, min(_BACKOFF_CAP, self.backoff * 2 ** attempt))
+
+    def observe(self, streamed: bool, seconds: float):
+        """Record the time to the first response of a successful primary attempt."""
+        with self._lock:
+            self._latencies[streamed].append(seconds)
+
+    def hedge_delay(self, streamed: bool) -> Optional[float]:
+        """Seconds after which a hedged request goes out, or None when hedging is off or not yet calibrated."""
+        if not self.hedge:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies[streamed])
+        if len(samples) < _MIN_LATENCY_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * self.hedge_percentile / 100))]
+
+    def take_hedge(self) -> bool:
+        """Spend one hedge from the budget, if there is one left."""
+        with self._lock:
+            if self.hedges + 1 > self.hedge_budget * self.calls:
+                return False
+            self.hedges += 1
+            return True
+
+    def count(self, path: str):
+        with self._lock:
+            self.paths[path] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            paths = dict(self.paths)
+            latencies = {"streamed" if k else "invoked": len(v) for k, v in self._latencies.items()}
+        return {
+            "calls": self.calls,
+            "paths": paths,
+            "retries": self.retried,
+            "hedges": self.hedges,
+            "timeouts": self.timeouts,
+            "hedge": {"enabled": self.hedge, "percentile": self.hedge_percentile,
+                      "delay_streamed": self.hedge_delay(True), "delay_invoked": self.hedge_delay(False),
+                      "samples": latencies},
+            "breaker": {"state": self.breaker.state, "consecutive_failures": self.breaker.consecutive,
+                        "opens": self.breaker.opens},
+        }
+
+    def gauges(self) -> list:
+        with self._lock:
+            paths = dict(self.paths)
+        lines = [
+            "# HELP chatbot_model_calls_total Model calls by how they were answered",
+            "# TYPE chatbot_model_calls_total counter",
+        ]
+        lines += [f'chatbot_model_calls_total{{path="{path}"}} {count}' for path, count in paths.items()]
+        lines += [
+            "# HELP chatbot_model_hedges_total Hedged second requests sent",
+            "# TYPE chatbot_model_hedges_total counter",
+            f"chatbot_model_hedges_total {self.hedges}",
+            "# HELP chatbot_model_circuit_open Whether calls bypass the primary model (1) or not (0)",
+            "# TYPE chatbot_model_circuit_open gauge",
+            f"chatbot_model_circuit_open {int(self.breaker.state == 'open')}",
+        ]
+        return lines
+
+def _as_chunk(message) -> AIMessageChunk:
+    """An AIMessage as a single stream chunk (models that do not stream answer whole)."""
+    if isinstance(message, AIMessageChunk):
+        return message
+    return AIMessageChunk(
+        content=message.content,
+        id=message.id,
+        additional_kwargs=message.additional_kwargs,
+        response_metadata=message.response_metadata,
+        usage_metadata=message.usage_metadata,
+        tool_call_chunks=[tool_call_chunk(name=call["name"], args=json.dumps(call["args"]), id=call["id"], index=i)
+                          for i, call in enumerate(message.tool_calls)],
+    )
+
+class _Stream:
+    """A started streamed attempt: its first chunk and the rest of the stream."""
+
+    def __init__(self, first, rest):
+        self.first = first
+        self.rest = rest
+
+    async def aclose(self):
+        await self.rest.aclose()
+
+class ResilientChatModel(BaseChatModel):
+    """
+    Chat model calling `primary` (a runnable from messages to an AIMessage)
+    with a deadline per attempt, jittered retries on transient errors, an
+    optional hedged second request once the first is slower than usual, and
+    `secondary` when the primary fails or its circuit is open. Streamed
+    calls retry, hedge and fail over only until the first chunk arrives.
+    """
+    primary: Any
+    secondary: Any = None
+    policy: Any
+    model_name: str = "unknown"
+
+    @property
+    def _llm_type(self) -> str:
+        return "resilient"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": self.model_name}
+
+    async def _attempt(self, tier, runnable, messages, streamed, timeout):
+        """One timed attempt; streamed attempts return once their first chunk is in."""
+        start = time.monotonic()
+        try:
+            if streamed:
+                rest = runnable.astream(messages, config=_QUIET).__aiter__()
+                try:
+                    first = await asyncio.wait_for(rest.__anext__(), timeout)
+                except BaseException:
+                    await rest.aclose()
+                    raise
+                result = _Stream(_as_chunk(first), rest)
+            else:
+                result = await asyncio.wait_for(runnable.ainvoke(messages, config=_QUIET), timeout)
+        except asyncio.CancelledError:
+            MODEL_ATTEMPT_SECONDS.observe(time.monotonic() - start, tier=tier, outcome="cancelled")
+            raise
+        except asyncio.TimeoutError:
+            self.policy.timeouts += 1
+            MODEL_ATTEMPT_SECONDS.observe(time.monotonic() - start, tier=tier, outcome="timeout")
+            raise
+        except Exception:
+            MODEL_ATTEMPT_SECONDS.observe(time.monotonic() - start, tier=tier, outcome="error")
+            raise
+        seconds = time.monotonic() - start
+        MODEL_ATTEMPT_SECONDS.observe(seconds, tier=tier, outcome="ok")
+        if tier == "primary":
+            self.policy.observe(streamed, seconds)
+        return result
+
+    async def _hedged(self, messages, streamed, timeout):
+        """
+        A primary attempt, plus a hedged one if it is slower than the hedge
+        threshold. Returns (result, hedge won); the loser is cancelled.
+        """
+        policy = self.policy
+        first = asyncio.ensure_future(self._attempt("primary", self.primary, messages, streamed, timeout))
+        tasks, winner = [first], None
+        try:
+            delay = policy.hedge_delay(streamed)
+            if delay is not None and delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done and policy.take_hedge():
+                    tasks.append(asyncio.ensure_future(
+                        self._attempt("primary", self.primary, messages, streamed, timeout - delay)))
+            pending, error = set(tasks), None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        winner = task
+                        return task.result(), task is not first
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Streams of losing attempts that started anyway are closed
+            for task, result in zip(tasks, await asyncio.gather(*tasks, return_exceptions=True)):
+                if task is not winner and isinstance(result, _Stream):
+                    await result.aclose()
+
+    async def _call(self, messages, streamed):
+        """The first response of a call: an AIMessage, or the started _Stream of a streamed call."""
+        policy = self.policy
+        policy.calls += 1
+        deadline = time.monotonic() + policy.call_deadline
+        error = None
+        if policy.breaker.allow():
+            for attempt in range(policy.retries + 1):
+                timeout = min(policy.timeout, deadline - time.monotonic())
+                try:
+                    result, hedged = await self._hedged(messages, streamed, timeout)
+                except Exception as e:
+                    if not is_transient(e):
+                        policy.breaker.record(True)  # the model answered; the request was at fault
+                        policy.count("failed")
+                        raise
+                    policy.breaker.record(False)
+                    error = e
+                    wait = policy.backoff_delay(attempt)
+                    if attempt == policy.retries or policy.breaker.state != "closed" \
+                            or deadline - time.monotonic() - wait < 1.0:
+                        break
+                    policy.retried += 1
+                    await asyncio.sleep(wait)
+                    continue
+                policy.breaker.record(True)
+                policy.count("hedge" if hedged else "retry" if attempt else "primary")
+                return result
+        if self.secondary is None:
+            policy.count("failed")
+            raise error or ModelUnavailable("Primary model circuit is open and no fallback model is configured",
+                                            max(1, math.ceil(policy.breaker.remaining())))
+        try:
+            result = await self._attempt("secondary", self.secondary, messages, streamed,
+                                         max(1.0, min(policy.timeout, deadline - time.monotonic())))
+        except Exception:
+            policy.count("failed")
+            raise
+        policy.count("fallback")
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = await self._call(messages, streamed=False)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        stream = await self._call(messages, streamed=True)
+        try:
+            yield ChatGenerationChunk(message=stream.first)
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.rest.__anext__(), self.policy.timeout)
+                except StopAsyncIteration:
+                    break
+                yield ChatGenerationChunk(message=_as_chunk(chunk))
+        finally:
+            await stream.aclose()
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        """Sync path (not used by the app): retries and fallback only, within the client's own timeout."""
+        policy = self.policy
+        for attempt in range(policy.retries + 1):
+            try:
+                return ChatResult(generations=[ChatGeneration(message=self.primary.invoke(messages, config=_QUIET))])
+            except Exception as e:
+                if not is_transient(e):
+                    raise
+                error = e
+                if attempt < policy.retries:
+                    time.sleep(policy.backoff_delay(attempt))
+        if self.secondary is None:
+            raise error
+        return ChatResult(generations=[ChatGeneration(message=self.secondary.invoke(messages, config=_QUIET))])
+
+class ResilientModel:
+    """
+    Dynamic model for create_react_agent. `primary` and `secondary` are
+    dynamic models themselves (e.g. PromptPrefix), resolved on every call;
+    the call goes through a ResilientChatModel sharing one policy.
+    """
+
+    def __init__(self, primary, secondary=None, policy=None, model_name="unknown"):
+        self.primary = primary
+        self.secondary = secondary
+        self.policy = policy or model_policy
+        self.model_name = model_name
+        self._models = {}  # (primary runnable, secondary runnable) ids -> ResilientChatModel
+
+    def __call__(self, state, runtime):
+        primary = self.primary(state, runtime)
+        secondary = self.secondary(state, runtime) if self.secondary is not None else None
+        key = (id(primary), id(secondary))
+        model = self._models.get(key)
+        if model is None:
+            model = self._models[key] = ResilientChatModel(primary=primary, secondary=secondary, policy=self.policy,
+                                                          model_name=self.model_name)
+        return model
+
+    def stats(self) -> dict:
+        return {"model": self.model_name, "fallback": self.secondary is not None, **self.policy.stats()}
+
+model_policy = ResiliencePolicy()
+add_collector(model_policy.gauges)
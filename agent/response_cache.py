@@ -0,0 +1,56 @@
+import os
+from datetime import datetime
+from typing import Optional
+from agent.cache import TTLCache
+from agent.catalog import catalog_cache
+from agent.faq import message_terms
+from agent.top_sellers import MANILA, sales_rollup
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+# Upper bound on staleness for changes this worker does not hear about
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+# Tools whose output is the same for every shopper. A turn that used any other
+# tool (get_order_details) is personal and never cached.
+CACHEABLE_TOOLS = {"products_tool", "search_products", "get_top_products"}
+
+# (normalized message, data_version()) -> reply HTML. Entries of an older data
+# version are never looked up again and age out of the LRU.
+response_cache = TTLCache("responses", maxsize=RESPONSE_CACHE_SIZE, ttl=RESPONSE_CACHE_TTL)
+
+def normalize_message(message: str) -> str:
+    """
+    Cache key of a message: its normalized terms in order, so "Show me
+    hoodies!" and "show hoodies please" share one entry but "black hoodies,
+    not white" and "white hoodies, not black" do not.
+    """
+    return " ".join(message_terms(message))
+
+def data_version() -> tuple:
+    """
+    What a cached answer was computed from: the catalog snapshot, the sales
+    rollup state and the Asia/Manila month ("this month" best sellers roll over).
+    """
+    now = datetime.now(MANILA)
+    return catalog_cache.version, sales_rollup.refreshes, now.year * 100 + now.month
+
+def is_cacheable_turn(tools_used: set) -> bool:
+    """A turn is shareable when it used tools, and only non-personal ones."""
+    return bool(tools_used) and tools_used <= CACHEABLE_TOOLS
+
+def get_cached_response(message: str) -> Optional[str]:
+    """Cached answer to an equivalent message, if the data behind it has not changed."""
+    terms = normalize_message(message)
+    if not terms:
+        return None
+    return response_cache.get((terms, data_version()))
+
+def cache_response(message: str, response: str, version: tuple):
+    """Store an answer computed against the data at `version`."""
+    terms = normalize_message(message)
+    if terms and response and version == data_version():
+        response_cache.set((terms, version), response)
+
+def invalidate_responses():
+    """Drop every cached answer; call when catalog or sales data changes."""
+    response_cache.invalidate()
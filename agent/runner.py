@@ -0,0 +1,233 @@
+import os
+import re
+from typing import AsyncIterator, Optional
+from langchain_core.messages import HumanMessage, ToolMessage
+from agent.admission import INTERACTIVE, Overloaded, chat_admission
+from agent.faq import get_faq_index
+from agent.index import flush_memory, get_chat_bot_agent, record_exchange
+from agent.metrics import llm_metrics_callback, set_request_source
+from agent.order_answers import answer_order_field, mentions_order, parse_order_question, prefetch_order
+from agent.resilience import ModelUnavailable
+from agent.response_cache import cache_response, data_version, get_cached_response, is_cacheable_turn
+from config.db import turn_session
+
+# Answer FAQ/policy questions straight from the reference knowledge, without the LLM
+FAQ_FAST_PATH_ENABLED = os.getenv("FAQ_FAST_PATH", "1") == "1"
+
+# Reuse agent answers to equivalent catalog/best-seller questions across shoppers
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") == "1"
+
+# Answer single-field order questions from a template, and prefetch the order
+# of other order-tracking turns while the model starts
+ORDER_FAST_PATH_ENABLED = os.getenv("ORDER_FAST_PATH", "1") == "1"
+
+def clean_response(text: str) -> str:
+    """Remove markdown-style code fences from a model reply."""
+    return re.sub(r"```[a-zA-Z]*\n?", "", text).replace("```", "").strip()
+
+class FenceStripper:
+    """
+    Incremental version of clean_response for streamed chunks.
+    A fence (```lang\\n) may be split across chunks, so a possible fence prefix is
+    held back until the next chunk shows whether it really is one.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._in_fence = False
+        self._started = False
+
+    def feed(self, chunk: str) -> str:
+        self._buf += chunk
+        out = []
+        while self._buf:
+            if self._in_fence:
+                # Drop the language tag and an optional newline after the fence
+                i = 0
+                while i < len(self._buf) and self._buf[i].isascii() and self._buf[i].isalpha():
+                    i += 1
+                if i == len(self._buf):
+                    self._buf = ""
+                    break
+                if self._buf[i] == "\n":
+                    i += 1
+                self._buf = self._buf[i:]
+                self._in_fence = False
+                continue
+
+            idx = self._buf.find("```")
+            if idx >= 0:
+                out.append(self._buf[:idx])
+                self._buf = self._buf[idx + 3:]
+                self._in_fence = True
+                continue
+
+            # Keep up to two trailing backticks; they may start a fence in the next chunk
+            keep = len(self._buf) - len(self._buf.rstrip("`"))
+            out.append(self._buf[:len(self._buf) - keep])
+            self._buf = self._buf[len(self._buf) - keep:]
+            break
+        return self._emit("".join(out))
+
+    def flush(self) -> str:
+        rest = "" if self._in_fence else self._buf
+        self._buf = ""
+        return self._emit(rest)
+
+    def _emit(self, text: str) -> str:
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
+async def _agent_text_chunks(user_message: str, thread_id: str, tools_used: set = None,
+                             priority: int = INTERACTIVE) -> AsyncIterator[str]:
+    """
+    Yield raw text chunks from the `agent` node as the model produces them.
+    Names of the tools the turn ran are added to `tools_used`. Raises
+    Overloaded when admission control turns the run away or the model is
+    unavailable.
+    """
+    agent = get_chat_bot_agent()
+    if agent is None:
+        raise RuntimeError("Chat agent not initialized.")
+
+    input_message = {"role": "user", "content": user_message}
+    config = {"configurable": {"thread_id": thread_id}, "callbacks": [llm_metrics_callback]}
+
+    try:
+        # Requests above the concurrency limit wait for a slot instead of piling onto Gemini and the DB pool
+        async with chat_admission.slot(priority):
+            try:
+                # Tool calls of this turn share one DB session
+                with turn_session():
+                    async for step, metadata in agent.astream(
+                        {"messages": [input_message]},
+                        config=config,
+                        stream_mode="messages"
+                    ):
+                        node = metadata.get("langgraph_node")
+                        if node == "agent" and (text := step.text):
+                            yield text
+                        elif node == "tools" and tools_used is not None and isinstance(step, ToolMessage):
+                            tools_used.add(step.name)
+            finally:
+                # Durable checkpointers buffer the turn; persist it before the reply
+                # goes out so the next message can land on any worker.
+                await flush_memory(thread_id)
+    except ModelUnavailable as e:
+        # The model's circuit is open and there is no fallback: a fast 503, like a shed run
+        raise Overloaded("model_unavailable", e.retry_after) from e
+
+async def answer_from_faq(user_message: str, thread_id: str) -> Optional[str]:
+    """
+    Pre-agent fast path: return the stored HTML answer when the message confidently
+    matches a reference Q&A, after recording the exchange in the thread's memory.
+    """
+    if not FAQ_FAST_PATH_ENABLED:
+        return None
+    match = get_faq_index().match(user_message)
+    if match is None:
+        return None
+    await record_exchange(thread_id, user_message, match.entry.html)
+    return match.entry.html
+
+async def answer_from_cache(user_message: str, thread_id: str) -> Optional[str]:
+    """
+    Return a cached agent answer to an equivalent non-personal question, after
+    recording the exchange in the thread's memory. Like _remember_response,
+    only opening messages qualify: a follow-up depends on earlier turns.
+    """
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    answer = get_cached_response(user_message)
+    if answer is None:
+        return None
+    state = await get_chat_bot_agent().aget_state({"configurable": {"thread_id": thread_id}})
+    if any(isinstance(m, HumanMessage) for m in state.values.get("messages", [])):
+        return None
+    await record_exchange(thread_id, user_message, answer)
+    return answer
+
+async def answer_from_order(user_message: str, thread_id: str) -> Optional[str]:
+    """
+    Pre-agent order path. A question about one field of an order (named in the
+    message or earlier in the thread) is answered from a template after
+    recording the exchange; for other order questions the order is prefetched
+    for the agent's get_order_details call and None is returned.
+    """
+    if not ORDER_FAST_PATH_ENABLED or not mentions_order(user_message):
+        return None
+    history = ()
+    if not parse_order_question(user_message):
+        state = await get_chat_bot_agent().aget_state({"configurable": {"thread_id": thread_id}})
+        history = state.values.get("messages", [])
+    question = parse_order_question(user_message, history)
+    if question is None:
+        return None
+    if question.field is None:
+        prefetch_order(question.order_id)
+        return None
+    answer = await answer_order_field(question)
+    await record_exchange(thread_id, user_message, answer)
+    return answer
+
+async def _remember_response(user_message: str, thread_id: str, response: str, tools_used: set, version: tuple):
+    """
+    Cache the answer of a turn that only used non-personal tools. Only opening
+    messages are stored: a follow-up's answer may depend on earlier turns.
+    """
+    if not RESPONSE_CACHE_ENABLED or not is_cacheable_turn(tools_used):
+        return
+    state = await get_chat_bot_agent().aget_state({"configurable": {"thread_id": thread_id}})
+    human_turns = sum(isinstance(m, HumanMessage) for m in state.values.get("messages", []))
+    if human_turns == 1:
+        cache_response(user_message, response, version)
+
+async def _cached_answer(user_message: str, thread_id: str) -> Optional[str]:
+    """FAQ fast path first, then order field templates, then the shared response cache."""
+    if (answer := await answer_from_faq(user_message, thread_id)) is not None:
+        set_request_source("faq")
+        return answer
+    if (answer := await answer_from_order(user_message, thread_id)) is not None:
+        set_request_source("order")
+        return answer
+    if (answer := await answer_from_cache(user_message, thread_id)) is not None:
+        set_request_source("cache")
+    return answer
+
+async def run_chat_turn(user_message: str, thread_id: str, priority: int = INTERACTIVE) -> str:
+    """
+    Run one chat turn through the agent on the async path and return the cleaned reply.
+    Fast-path answers skip admission control; agent runs wait with `priority`.
+    """
+    if (answer := await _cached_answer(user_message, thread_id)) is not None:
+        return answer
+
+    version, tools_used = data_version(), set()
+    result = ""
+    async for text in _agent_text_chunks(user_message, thread_id, tools_used, priority):
+        result += text
+    response = clean_response(result)
+    await _remember_response(user_message, thread_id, response, tools_used, version)
+    return response
+
+async def stream_chat_turn(user_message: str, thread_id: str) -> AsyncIterator[str]:
+    """
+    Run one chat turn and yield cleaned reply text as soon as it arrives.
+    """
+    if (answer := await _cached_answer(user_message, thread_id)) is not None:
+        yield answer
+        return
+
+    version, tools_used = data_version(), set()
+    stripper = FenceStripper()
+    parts = []
+    async for text in _agent_text_chunks(user_message, thread_id, tools_used):
+        if cleaned := stripper.feed(text):
+            parts.append(cleaned)
+            yield cleaned
+    if tail := stripper.flush():
+        parts.append(tail)
+        yield tail
+    await _remember_response(user_message, thread_id, "".join(parts).strip(), tools_used, version)
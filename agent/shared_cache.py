@@ -0,0 +1,501 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from agent.cache import _caches
+from config.db import SQLALCHEMY_DATABASE_URL
+
+try:
+    import fcntl
+except ImportError:  # Windows: workers setting up a new file at once may race
+    fcntl = None
+
+# SQLite file shared by the worker processes on this host ("" disables the
+# shared tier). Its directory must belong to this user and be closed to others;
+# the default is a private per-user directory, and the file name is per
+# database so different stores never mix.
+TOOL_CACHE_PATH = os.getenv("TOOL_CACHE_PATH", os.path.join(
+    tempfile.gettempdir(),
+    f"chatbot-{os.getuid() if hasattr(os, 'getuid') else 'cache'}",
+    f"tool-cache-{hashlib.sha1(SQLALCHEMY_DATABASE_URL.encode()).hexdigest()[:12]}.sqlite3",
+))
+# How long a process may hold the right to load a key before others take over
+TOOL_CACHE_LEASE = float(os.getenv("TOOL_CACHE_LEASE", "15"))
+# How often a process re-reads the shared invalidation generation and invalidated keys of a cache
+TOOL_CACHE_GENERATION_CHECK = float(os.getenv("TOOL_CACHE_GENERATION_CHECK", "1"))
+# Background refreshes of stale entries running at once in this process
+TOOL_CACHE_REFRESH_WORKERS = int(os.getenv("TOOL_CACHE_REFRESH_WORKERS", "2"))
+
+_POLL_INTERVAL = 0.05
+# Seconds a per-key invalidation stays in the shared log for other processes to pick up
+_INVALIDATION_RETENTION = 3600
+
+def _check_private(path):
+    """Raise OSError unless only this user can write the store's directory and file."""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if not hasattr(os, "getuid"):
+        return
+    # SQLite also opens -wal and -shm files next to the database, so the directory
+    # must be closed to other users, not just the file
+    st = os.stat(directory)
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise OSError(f"{directory} must belong to this user and not be writable by others")
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+    try:
+        st = os.fstat(fd)
+    finally:
+        os.close(fd)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise OSError(f"{path} must belong to this user and not be readable by others")
+
+@contextmanager
+def _setup_lock(path):
+    """
+    Hold an exclusive lock on `path` while a process sets the store file up.
+    SQLite does not make that safe by itself: the switch to WAL fails instead
+    of waiting for other processes, and a WAL file next to a still empty
+    database file is taken for a leftover and ignored.
+    """
+    if fcntl is None:
+        yield
+        return
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)
+
+def _encode(value):
+    """Turn a cached value into plain JSON types; dicts with non-string keys and datetimes are tagged."""
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value):
+            return {k: _encode(v) for k, v in value.items()}
+        return {"__items__": [[k, _encode(v)] for k, v in value.items()]}
+    if isinstance(value, (list, tuple)):
+        return [_encode(v) for v in value]
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    raise TypeError(f"Cannot store {type(value).__name__} in the shared tool cache")
+
+def _decode(obj):
+    if len(obj) == 1:
+        if "__items__" in obj:
+            return {k: v for k, v in obj["__items__"]}
+        if "__datetime__" in obj:
+            return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+class SharedStore:
+    """
+    Cache entries, load leases, invalidation generations and a log of
+    invalidated keys in a SQLite file
+    that every worker process on the host opens. Values are stored as JSON
+    (dicts with non-string keys and datetimes are tagged), never pickled. A
+    store that cannot be opened or written, or whose file other users could
+    tamper with, disables itself and every lookup misses, leaving the
+    in-process tier to work alone. Nothing is opened until the first lookup.
+    """
+
+    def __init__(self, path=TOOL_CACHE_PATH):
+        self.path = path
+        self.enabled = bool(path)
+        self._local = threading.local()
+        self._owner = f"{os.getpid()}-{random.getrandbits(32):08x}"
+        self._writes = 0
+        self._created = False
+        self._create_lock = threading.Lock()
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            _check_private(self.path)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            # One thread per process sets the file up, one process at a time
+            with self._create_lock:
+                if not self._created:
+                    with _setup_lock(self.path + ".lock"):
+                        conn.execute("PRAGMA journal_mode=WAL")
+                        self._create(conn)
+                    self._created = True
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _call(self, fn, *args, default=None):
+        if not self.enabled:
+            return default
+        try:
+            return fn(self._connect(), *args)
+        except (sqlite3.Error, OSError, TypeError, ValueError) as e:
+            print(f"Shared tool cache at {self.path} disabled:", str(e))
+            self.enabled = False
+            return default
+
+    @staticmethod
+    def _create(conn):
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT, fresh_until REAL, stale_until REAL);
+            CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT, expires_at REAL);
+            CREATE TABLE IF NOT EXISTS generations (name TEXT PRIMARY KEY, generation INTEGER);
+            CREATE TABLE IF NOT EXISTS invalidations (seq INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, key TEXT, at REAL);
+        """)
+
+    def get(self, key):
+        """(value, fresh_until, stale_until) of a key, or None."""
+        def get(conn):
+            row = conn.execute("SELECT value, fresh_until, stale_until FROM entries WHERE key = ? AND stale_until > ?",
+                               (key, time.time())).fetchone()
+            return (json.loads(row[0], object_hook=_decode), row[1], row[2]) if row else None
+        return self._call(get)
+
+    def set(self, key, value, fresh_until, stale_until):
+        def set_(conn):
+            conn.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                         (key, json.dumps(_encode(value), separators=(",", ":")), fresh_until, stale_until))
+            self._writes += 1
+            if self._writes % 500 == 0:
+                conn.execute("DELETE FROM entries WHERE stale_until <= ?", (time.time(),))
+        self._call(set_)
+
+    def delete(self, key):
+        self._call(lambda conn: conn.execute("DELETE FROM entries WHERE key = ?", (key,)))
+
+    def invalidate_key(self, name, key):
+        """Delete a key's entry and log it, so other processes drop their local copy too."""
+        def invalidate(conn):
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                conn.execute("INSERT INTO invalidations (name, key, at) VALUES (?, ?, ?)", (name, key, now))
+                conn.execute("DELETE FROM invalidations WHERE at < ?", (now - _INVALIDATION_RETENTION,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self._call(invalidate)
+
+    def invalidated_since(self, name, seq):
+        """(last seq, keys of `name` invalidated after `seq`); with seq None, only the last seq."""
+        def read(conn):
+            if seq is None:
+                return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM invalidations").fetchone()[0], []
+            rows = conn.execute("SELECT seq, name, key FROM invalidations WHERE seq > ? ORDER BY seq", (seq,)).fetchall()
+            return (rows[-1][0] if rows else seq), [key for _, n, key in rows if n == name]
+        return self._call(read, default=(seq, []))
+
+    def try_lease(self, key, seconds=TOOL_CACHE_LEASE) -> bool:
+        """Take the right to load `key` unless another live process holds it."""
+        def lease(conn):
+            now = time.time()
+            cursor = conn.execute(
+                "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, "
+                "expires_at = excluded.expires_at WHERE leases.expires_at <= ? OR leases.owner = excluded.owner",
+                (key, self._owner, now + seconds, now))
+            return cursor.rowcount == 1
+        return self._call(lease, default=True)
+
+    def release(self, key):
+        self._call(lambda conn: conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self._owner)))
+
+    def generation(self, name) -> int:
+        def read(conn):
+            row = conn.execute("SELECT generation FROM generations WHERE name = ?", (name,)).fetchone()
+            return row[0] if row else 0
+        return self._call(read, default=0)
+
+    def bump(self, name) -> int:
+        def bump(conn):
+            return conn.execute(
+                "INSERT INTO generations VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET generation = generation + 1 "
+                "RETURNING generation", (name,)).fetchone()[0]
+        return self._call(bump)
+
+shared_store = SharedStore()
+
+_refresh_executor = ThreadPoolExecutor(max_workers=TOOL_CACHE_REFRESH_WORKERS, thread_name_prefix="cache-refresh")
+
+class TieredCache:
+    """
+    In-process LRU in front of the shared store, with the get_or_load()
+    interface of TTLCache.
+
+    - Keys are versioned: cache name, `version` (bump it when the cached value
+      changes shape) and the shared invalidation generation, so invalidate()
+      in one process retires the entries of every process.
+    - invalidate(key) deletes one key from both tiers and logs it; the other
+      processes drop their local copy at their next generation check. A load
+      of the key that was already running when it was invalidated, here or
+      in another process, returns its value to its callers but never stores it.
+    - A fresh entry in either tier is served as is. An expired one is still
+      served for `stale_ttl` more seconds while one background refresh per
+      key (across processes) loads the new value.
+    - A cold key is loaded once: concurrent callers in the process wait for
+      the same load, and other processes wait for the process holding the
+      load lease to publish it (or take over once the lease runs out).
+    """
+
+    def __init__(self, name, maxsize=1024, ttl=60.0, stale_ttl=0.0, version=1, store=shared_store):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.version = version
+        self.store = store
+        self._data = OrderedDict()  # full key -> (fresh_until, stale_until, value)
+        self._inflight = {}  # full key -> Future of the running cold load
+        self._refreshing = set()
+        self._epochs = {}  # full key -> [loads running, local invalidations since the first began]
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._generation_checked = float("-inf")
+        self._invalidation_seq = None
+        self.hits = 0
+        self.shared_hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.waited = 0
+        self.refreshes = 0
+        self.evictions = 0
+        _caches[name] = self
+
+    def _full_key(self, key) -> str:
+        now = time.monotonic()
+        if self.store.enabled and now - self._generation_checked >= TOOL_CACHE_GENERATION_CHECK:
+            self._generation = self.store.generation(self.name)
+            self._generation_checked = now
+            self._invalidation_seq, keys = self.store.invalidated_since(self.name, self._invalidation_seq)
+            if keys:
+                with self._lock:
+                    for full in keys:
+                        self._data.pop(full, None)
+        return f"{self.name}:v{self.version}:g{self._generation}:{key!r}"
+
+    def get_or_load(self, key, loader, ttl=None):
+        """Return the cached value for `key`, possibly stale, or load it once across processes."""
+        full = self._full_key(key)
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(full)
+            if entry is not None:
+                if now < entry[0]:
+                    self._data.move_to_end(full)
+                    self.hits += 1
+                    return entry[2]
+                if now >= entry[1]:
+                    del self._data[full]
+                    entry = None
+
+        if entry is None and (shared := self.store.get(full)) is not None:
+            value, fresh_until, stale_until = shared
+            entry = (fresh_until, stale_until, value)
+            with self._lock:
+                self._put_locked(full, entry)
+            if now < fresh_until:
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+
+        if entry is not None:
+            with self._lock:
+                self.stale += 1
+            self._refresh_in_background(full, loader, ttl)
+            return entry[2]
+        return self._load_cold(full, loader, ttl)
+
+    def _load_cold(self, full, loader, ttl):
+        with self._lock:
+            future = self._inflight.get(full)
+            if future is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                self.misses += 1
+                future = self._inflight[full] = Future()
+                leader = True
+        if not leader:
+            return future.result()
+
+        try:
+            value = self._load_shared(full, loader, ttl)
+        except BaseException as e:
+            self._finish_inflight(full, future)
+            future.set_exception(e)
+            raise
+        self._finish_inflight(full, future)
+        future.set_result(value)
+        return value
+
+    def _finish_inflight(self, full, future):
+        with self._lock:
+            # invalidate() may have let a newer load take the slot
+            if self._inflight.get(full) is future:
+                del self._inflight[full]
+
+    def _load_shared(self, full, loader, ttl):
+        """Load under the key's lease, or wait for the process that holds it."""
+        deadline = time.monotonic() + TOOL_CACHE_LEASE
+        while not self.store.try_lease(full):
+            if time.monotonic() >= deadline:
+                break  # the holder died or hangs; load it here
+            time.sleep(_POLL_INTERVAL)
+            if (shared := self.store.get(full)) is not None and time.time() < shared[1]:
+                with self._lock:
+                    self.waited += 1
+                    self._put_locked(full, (shared[1], shared[2], shared[0]))
+                return shared[0]
+        try:
+            # The previous holder may have published and released the key since this process last looked
+            if (shared := self.store.get(full)) is not None and time.time() < shared[1]:
+                with self._lock:
+                    self.waited += 1
+                    self._put_locked(full, (shared[1], shared[2], shared[0]))
+                return shared[0]
+            token = self._begin_load(full)
+            try:
+                value = loader()
+                self._store(full, value, ttl, token)
+                return value
+            finally:
+                self._end_load(full)
+        finally:
+            self.store.release(full)
+
+    def _refresh_in_background(self, full, loader, ttl):
+        with self._lock:
+            if full in self._refreshing:
+                return
+            self._refreshing.add(full)
+        _refresh_executor.submit(self._refresh, full, loader, ttl)
+
+    def _refresh(self, full, loader, ttl):
+        try:
+            if (shared := self.store.get(full)) is not None and time.time() < shared[1]:
+                # Another process already refreshed it
+                with self._lock:
+                    self._put_locked(full, (shared[1], shared[2], shared[0]))
+                return
+            if not self.store.try_lease(full):
+                return  # another process is refreshing it
+            token = self._begin_load(full)
+            try:
+                if self._store(full, loader(), ttl, token):
+                    with self._lock:
+                        self.refreshes += 1
+            finally:
+                self._end_load(full)
+                self.store.release(full)
+        except Exception as e:
+            print(f"Background refresh of {self.name} failed:", str(e))
+        finally:
+            with self._lock:
+                self._refreshing.discard(full)
+
+    def _begin_load(self, full):
+        """What _invalidated_since() compares against: the key's local epoch and the shared invalidation log's position."""
+        with self._lock:
+            epoch = self._epochs.setdefault(full, [0, 0])
+            epoch[0] += 1
+            local = epoch[1]
+        return local, self.store.invalidated_since(self.name, None)[0]
+
+    def _end_load(self, full):
+        with self._lock:
+            epoch = self._epochs[full]
+            epoch[0] -= 1
+            if not epoch[0]:
+                del self._epochs[full]
+
+    def _invalidated_since(self, full, token) -> bool:
+        """Whether invalidate(key) ran for this key, in any process, after the load that took `token` began."""
+        local, seq = token
+        with self._lock:
+            if self._epochs[full][1] != local:
+                return True
+        return seq is not None and full in self.store.invalidated_since(self.name, seq)[1]
+
+    def _store(self, full, value, ttl, token) -> bool:
+        """Cache a loaded value unless the key was invalidated while it loaded; True if it was stored."""
+        ttl = self.ttl if ttl is None else ttl
+        if callable(ttl):
+            ttl = ttl(value)
+        if ttl <= 0:
+            # Not cacheable (e.g. an unknown order); drop what may be stale
+            with self._lock:
+                self._data.pop(full, None)
+            self.store.delete(full)
+            return False
+        if self._invalidated_since(full, token):
+            return False
+        fresh_until = time.time() + ttl
+        stale_until = fresh_until + self.stale_ttl
+        with self._lock:
+            self._put_locked(full, (fresh_until, stale_until, value))
+        self.store.set(full, value, fresh_until, stale_until)
+        # An invalidation that landed between the check and the writes must still win
+        if self._invalidated_since(full, token):
+            with self._lock:
+                self._data.pop(full, None)
+            self.store.delete(full)
+            return False
+        return True
+
+    def _put_locked(self, full, entry):
+        self._data[full] = entry
+        self._data.move_to_end(full)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key=None, predicate=None):
+        """
+        Drop one key, or with no key retire every entry, in this process and
+        the others. A predicate cannot be evaluated against other processes'
+        entries, so it retires everything too.
+        """
+        if key is not None:
+            full = self._full_key(key)
+            with self._lock:
+                self._data.pop(full, None)
+                # Running loads of the key must not store what they read, nor new callers wait for them
+                self._inflight.pop(full, None)
+                if full in self._epochs:
+                    self._epochs[full][1] += 1
+            self.store.invalidate_key(self.name, full)
+            return
+        generation = self.store.bump(self.name)
+        with self._lock:
+            self._generation = generation if generation is not None else self._generation + 1
+            self._generation_checked = time.monotonic()
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.stale + self.misses + self.coalesced
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "stale_served": self.stale,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "waited_for_other_process": self.waited,
+                "background_refreshes": self.refreshes,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.shared_hits + self.stale) / lookups, 4) if lookups else 0.0,
+                "shared_store": self.store.path if self.store.enabled else None,
+            }
@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+from agent.catalog_feed import CATALOG_FEED, catalog_feed
+from agent.index import flush_memory, get_chat_bot_agent, initialize_agent
+from config.db import check_connection
+
+# Seconds between retries of a failed startup step (model init, DB check)
+STARTUP_RETRY_INTERVAL = float(os.getenv("STARTUP_RETRY_INTERVAL", "5"))
+# How long a chat request that arrives during startup waits for the agent
+STARTUP_WAIT_TIMEOUT = float(os.getenv("STARTUP_WAIT_TIMEOUT", "20"))
+
+_state = {"started_at": None, "agent_ready_at": None, "database_ready_at": None, "errors": {}}
+_agent_ready = None
+_tasks = []
+
+def _get_agent_ready():
+    global _agent_ready
+    if _agent_ready is None:
+        _agent_ready = asyncio.Event()
+    return _agent_ready
+
+async def _until_done(name, step):
+    """Run a blocking startup step off the event loop, retrying until it succeeds."""
+    while True:
+        try:
+            if await asyncio.to_thread(step) is not False:
+                _state["errors"].pop(name, None)
+                return
+            _state["errors"][name] = "check failed"
+        except Exception as e:
+            print(f"Startup step {name} failed:", str(e))
+            _state["errors"][name] = str(e)
+        await asyncio.sleep(STARTUP_RETRY_INTERVAL)
+
+async def _start_agent():
+    await _until_done("agent", initialize_agent)
+    _state["agent_ready_at"] = time.monotonic()
+    _get_agent_ready().set()
+
+async def _start_database():
+    await _until_done("database", check_connection)
+    _state["database_ready_at"] = time.monotonic()
+    if CATALOG_FEED:
+        catalog_feed.start()
+
+def start_background():
+    """
+    Begin model/agent creation and the first DB connection concurrently, in
+    worker threads, and return at once so the server can bind right away.
+    """
+    _state["started_at"] = time.monotonic()
+    _get_agent_ready()
+    _tasks.extend([asyncio.create_task(_start_agent()), asyncio.create_task(_start_database())])
+
+async def shutdown():
+    """Stop pending startup steps and persist buffered conversation memory."""
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+    await asyncio.to_thread(catalog_feed.stop)
+    if get_chat_bot_agent() is not None:
+        await flush_memory()
+
+async def wait_for_agent(timeout=STARTUP_WAIT_TIMEOUT) -> bool:
+    """Wait (up to `timeout` seconds) until the chat agent is usable."""
+    if get_chat_bot_agent() is not None:
+        return True
+    try:
+        await asyncio.wait_for(_get_agent_ready().wait(), timeout)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
+def readiness() -> dict:
+    """Startup progress, for the readiness endpoint."""
+    started = _state["started_at"]
+
+    def since_start(at):
+        return round(at - started, 3) if at is not None and started is not None else None
+
+    agent_ready = get_chat_bot_agent() is not None
+    database_ready = _state["database_ready_at"] is not None
+    return {
+        "ready": agent_ready and database_ready,
+        "agent": agent_ready,
+        "database": database_ready,
+        "agent_ready_after": since_start(_state["agent_ready_at"]),
+        "database_ready_after": since_start(_state["database_ready_at"]),
+        "errors": dict(_state["errors"]),
+    }
@@ -0,0 +1,48 @@
+import os
+
+# "compact": header-row tables without unused fields; "verbose": the original
+# indented JSON / padded text blocks. Override per tool with
+# TOOL_OUTPUT_FORMAT_<TOOL NAME>, e.g. TOOL_OUTPUT_FORMAT_PRODUCTS_TOOL=verbose.
+TOOL_OUTPUT_FORMAT = os.getenv("TOOL_OUTPUT_FORMAT", "compact")
+
+def output_format(tool_name: str) -> str:
+    """Output format configured for one tool."""
+    return os.getenv(f"TOOL_OUTPUT_FORMAT_{tool_name.upper()}", TOOL_OUTPUT_FORMAT)
+
+def format_product(product: dict, variants) -> str:
+    """One product as a header line plus a size,color,price,stock table of its variants."""
+    thumbnail = product["thumbnail"]["thumbnailUrl"] if product["thumbnail"] else "No image available"
+    lines = [f"{product['product_name']} | {product['category']} | image: {thumbnail}",
+             "size,color,price,stock"]
+    lines += [f"{v['size'] or '-'},{v['color']},{v['price']:g},{v['stock']}" for v in variants]
+    return "\n".join(lines)
+
+def format_catalog(products) -> str:
+    """The whole catalog in the compact product format."""
+    if not products:
+        return "No products available."
+    return "\n\n".join(format_product(p, p["variants"]) for p in products)
+
+def format_order(order: dict) -> str:
+    """Compact rendering of an order dict from agent.orders.load_order."""
+    lines = [
+        f"order {order['order_id']} | status: {order['status']} | payment: {order['payment_method']} | date: {order['order_date']}",
+        f"customer: {order['customer_id']} | {order['customer_name']}",
+        f"subtotal: ₱{order['subtotal']} | shipping: Free | total: ₱{order['total']}",
+    ]
+    if addr := order["address"]:
+        parts = [addr["fullname"], addr["address_line_1"], addr["address_line_2"],
+                 addr["admin_area_2"], addr["admin_area_1"], addr["postal_code"], f"phone {addr['phone']}"]
+        lines.append("ship to: " + ", ".join(str(p) for p in parts if p))
+    else:
+        lines.append("ship to: none")
+    if order["items"]:
+        lines.append("items: product | size | color | price | qty | total | image")
+        lines += [
+            f"{i['product_name']} | {i['size']} | {i['color']} | ₱{i['price']} | {i['quantity']} | ₱{i['total']} | {i['image']}"
+            for i in order["items"]
+        ]
+    else:
+        lines.append("items: none")
+    lines.append(f"cancellation reason: {order['cancellation_reason']}")
+    return "\n".join(lines)
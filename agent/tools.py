@@ -1,48 +1,85 @@
-from datetime import datetime
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import functools
 import json
-from zoneinfo import ZoneInfo
+import os
+from typing import Optional
 from langchain.tools import tool
-from sqlalchemy import desc, func, literal
-from sqlalchemy.orm import joinedload
-from config.db import SessionLocal
-from models.OrderAddress import OrderAddress
-from models.Order import Order
-from models.OrderItem import OrderItem
-from models.Product import Product
-from models.Thumbnail import Thumbnail
-from models.Variant import Variant
+from langchain_core.tools import StructuredTool
+from agent.catalog import catalog_cache
+from agent.catalog_search import format_results, get_catalog_index
+from agent.metrics import tool_span
+from agent.orders import get_order
+from agent.shared_cache import TieredCache
+from agent.tool_format import format_order, output_format
+from agent.top_sellers import result_bucket, sales_rollup
+from config.db import session_scope
+
+# Tool bodies are blocking (SQLAlchemy/PyMySQL), so on the async path they run
+# on a bounded pool instead of the event loop or the unbounded default executor.
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+_tool_executor = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="chatbot-tool")
+
+# An expired get_top_products answer is still served for this long while it is reloaded
+TOP_PRODUCTS_STALE_TTL = float(os.getenv("TOP_PRODUCTS_STALE_TTL", "300"))
+
+# Formatted get_top_products answers keyed by filter and Asia/Manila period, shared by the workers
+top_products_cache = TieredCache("top_products", maxsize=64, stale_ttl=TOP_PRODUCTS_STALE_TTL)
 
 @tool
 def products_tool() -> str:
     """Search products by name, stock, prices from the inventory."""
-    db = SessionLocal()
     try:
-        products = db.query(Product).filter(Product.status == "Available").options(joinedload(Product.variants), joinedload(Product.thumbnail)).all()
-
-        result = []
-        for product in products:
-            result.append({
-                "product_name": product.product_name,
-                "category": product.category,
-                "variants": [
-                    {
-                        "price": v.price,
-                        "stock": v.stock,
-                        "size": v.size,
-                        "color": v.color
-                    }
-                    for v in product.variants
-                ],
-                "thumbnail": {
-                    "thumbnailUrl": product.thumbnail.thumbnailUrl,
-                    "thumbnailPublicId": product.thumbnail.thumbnailPublicId
-                } if product.thumbnail else None
-            })
-        return json.dumps(result, indent=2)
+        if output_format("products_tool") == "compact":
+            return catalog_cache.get_compact()
+        return catalog_cache.get_json()
     except Exception as e:
         print(e)
         return json.dumps({"error": str(e)}, indent=2)
-    
+
+@tool
+def search_products(
+    query: str = "",
+    category: str = "",
+    size: str = "",
+    color: str = "",
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    in_stock_only: bool = False,
+    limit: int = 5,
+) -> str:
+    """
+    Search the inventory and return only the best matching products with their variants.
+    Prefer this over products_tool for any question about specific products.
+
+    Args:
+        query: Free-text product search, e.g. "black hoodie" (typos are tolerated)
+        category: Category filter, e.g. "Hoodies", "Shorts"
+        size: Exact size filter, e.g. "M", "XL"
+        color: Color filter, e.g. "Black"
+        min_price: Minimum variant price in PHP
+        max_price: Maximum variant price in PHP
+        in_stock_only: Only return variants that are in stock
+        limit: Maximum number of products to return (1-20)
+    """
+    try:
+        results = get_catalog_index().search(
+            query=query,
+            category=category,
+            size=size,
+            color=color,
+            min_price=min_price,
+            max_price=max_price,
+            in_stock_only=in_stock_only,
+            limit=max(1, min(limit, 20)),
+        )
+        return format_results(results)
+    except Exception as e:
+        print(e)
+        return json.dumps({"error": str(e)}, indent=2)
+
 @tool
 def get_top_products(filter: str = "all") -> str:
     """
@@ -50,76 +87,26 @@ def get_top_products(filter: str = "all") -> str:
     filter: "all", "thisMonth", "lastMonth", "thisYear"
     """
     limit = 10
-    db = SessionLocal()
-    try:
-        now = datetime.now(ZoneInfo("Asia/Manila"))
-        year = now.year
-        month = now.month
-
-        date_conditions = []
-        if filter == "thisMonth":
-            # Get first day of next month, then subtract 1 second to get end of current month
-            if month == 12:
-                next_month_start = datetime(year + 1, 1, 1)
-            else:
-                next_month_start = datetime(year, month + 1, 1)
-            
-            date_conditions = [
-                Order.order_date >= datetime(year, month, 1),
-                Order.order_date < next_month_start
-            ]
-        elif filter == "lastMonth":
-            last_month = month - 1 if month > 1 else 12
-            last_month_year = year if month > 1 else year - 1
-            
-            # Get first day of current month for upper bound
-            date_conditions = [
-                Order.order_date >= datetime(last_month_year, last_month, 1),
-                Order.order_date < datetime(year, month, 1)
-            ]
-        elif filter == "thisYear":
-            date_conditions = [
-                Order.order_date >= datetime(year, 1, 1),
-                Order.order_date < datetime(year + 1, 1, 1)
-            ]
-
-        top_products_query = (
-            db.query(
-                OrderItem.product_id,
-                Product,
-                func.sum(OrderItem.quantity).label("total_sold")
-            )
-            .join(Order, Order.order_id == OrderItem.order_id)
-            .join(Product, Product.id == OrderItem.product_id)
-            .outerjoin(Variant, Variant.product_id == Product.id)
-            .outerjoin(Thumbnail, Thumbnail.product_id == Product.id)
-            .filter(Order.status.in_(["Delivered", "Received"]))
-            .filter(Product.status == "Available")
-        )
 
-        for condition in date_conditions:
-            top_products_query = top_products_query.filter(condition)
+    def load():
+        # Totals come from the per-month rollup, never from a join over all order items
+        sales_rollup.ensure_fresh()
+        with session_scope() as db:
+            top_products = sales_rollup.top_products(db, filter, limit)
 
-        top_products = (
-            top_products_query
-            .group_by(OrderItem.product_id, Product.id)  # Include Product.id in GROUP BY
-            .order_by(desc("total_sold"))  # Use desc() instead of literal
-            .limit(limit)
-            .all()
-        )
-        
-        result_str = "\n\n".join([
-            f"Product: {row.Product.product_name}\n"
-            f"Image: {row.Product.thumbnail.thumbnailUrl if row.Product.thumbnail else 'No image available'}\n"
+        return "\n\n".join([
+            f"Product: {row.product_name}\n"
+            f"Image: {row.thumbnailUrl or 'No image available'}\n"
             f"Quantity Sold: {int(row.total_sold)}"
             for row in top_products
         ])
-        return result_str
+
+    try:
+        key, ttl = result_bucket(filter)
+        return top_products_cache.get_or_load(key, load, ttl)
     except Exception as e:
         print(e)
         return json.dumps({"error": str(e)}, indent=2)
-    finally:
-        db.close()
 
 @tool
 def get_order_details(order_id: str) -> str:
@@ -129,95 +116,110 @@ def get_order_details(order_id: str) -> str:
     Args:
         order_id: Order ID to retrieve
     """
-    db = SessionLocal()
     try:
-        # Eager loading (like Sequelize include)
-        order = (
-            db.query(Order)
-            .options(
-                joinedload(Order.customer),
-                joinedload(Order.order_items)
-                    .joinedload(OrderItem.product)
-                    .joinedload(Product.thumbnail),  # optional thumbnail
-                joinedload(Order.order_address)
-            )
-            .filter(Order.order_id == order_id)
-            .first()
-        )
-
-        if not order:
+        entry = get_order(order_id)
+        if not entry:
             return f"No order found with ID: {order_id}"
-
-        # Format enums and order date
-        status = order.status.value if order.status else "N/A"
-        payment_method = order.payment_method.value if order.payment_method else "N/A"
-        customer_name = f"{order.customer.firstname} {order.customer.lastname}" if order.customer else "N/A"
-        utc_date = order.order_date.replace(tzinfo=ZoneInfo("UTC"))
-        manila_date = utc_date.astimezone(ZoneInfo("Asia/Manila"))
-        formatted = manila_date.strftime("%B %d, %Y %I:%M %p")
-        
-        # Summary
-        summary = f"""
-Order ID: {order.order_id}
-Customer ID: {order.customer_id}
-Customer Name: {customer_name}
-Status: {status}
-Payment Method: {payment_method}
-Subtotal: ₱{order.subtotal}
-Shipping Fee: Free
-Total: ₱{order.total}
-Order Date: {formatted}
-"""
-
-        # Cancellation reason
-        cancellation_reason = order.cancellation_reason or "No cancellation reason."
-
-        # Address
-        if order.order_address:
-            addr = order.order_address
-            address = f"""
-Shipping Address:
-  Name: {addr.fullname}
-  {addr.address_line_1}
-  {addr.address_line_2}
-  {addr.admin_area_2}, {addr.admin_area_1}
-  {addr.postal_code}
-  Phone: {addr.phone}
-"""
-        else:
-            address = "No shipping address found.\n"
-
-        # Items (always process items, outside of address if/else)
-        items_list = []
-        if order.order_items:
-            for i, item in enumerate(order.order_items, 1):
-                product_name = item.product.product_name if item.product else "N/A"
-                thumbnail_url = (
-                    item.product.thumbnail.thumbnailUrl
-                    if item.product and item.product.thumbnail
-                    else "No image available"
-                )
-                item_str = f"""
-Item {i}:
-- Image: {thumbnail_url}
-- Product Name: {product_name}
-- Size: {item.size}
-- Color: {item.color}
-- Price: ₱{item.price}
-- Quantity: {item.quantity}
-- Total: ₱{item.total}
-"""
-                items_list.append(item_str)
-        items = "\n".join(items_list) if items_list else "No items found for this order."
-
-        return f"Order summary:{summary}\n{address}\nOrder items:\n{items}\nCancellation Reason: {cancellation_reason}\n"
+        if output_format("get_order_details") == "compact":
+            return format_order(entry["order"])
+        return entry["text"]
 
     except Exception as e:
         print(f"Error fetching order details: {e}")
         return "Failed to fetch order details."
+
+
+async def run_in_tool_pool(fn, *args, **kwargs):
+    """Run a blocking call on the bounded tool pool with the caller's context."""
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(_tool_executor, ctx.run, functools.partial(fn, *args, **kwargs))
+
+class SharedToolCalls:
+    """
+    Results of the tool calls made while it is active, keyed by tool name and
+    arguments, so identical calls from concurrent turns (e.g. the items of one
+    batch request) run once. Used from the event loop only.
+    """
+
+    def __init__(self):
+        self._calls = {}  # (tool, arguments) -> Future of the first call
+        self.calls = 0
+        self.shared = 0
+
+    async def run(self, name, kwargs, call):
+        key = (name, json.dumps(kwargs, sort_keys=True, default=str))
+        self.calls += 1
+        future = self._calls.get(key)
+        if future is not None:
+            self.shared += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                # The first caller was cancelled, not this one: run it here
+                return await call()
+        future = self._calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            self._calls.pop(key, None)
+            future.cancel()
+            raise
+        except Exception as e:
+            # Let a later identical call try again instead of sharing the failure
+            self._calls.pop(key, None)
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        future.set_result(result)
+        return result
+
+    def stats(self) -> dict:
+        return {"tool_calls": self.calls, "shared": self.shared}
+
+_shared_tool_calls = contextvars.ContextVar("shared_tool_calls", default=None)
+
+@contextmanager
+def share_tool_calls():
+    """Share identical async tool calls made inside this block (and tasks created in it)."""
+    shared = SharedToolCalls()
+    reset = _shared_tool_calls.set(shared)
+    try:
+        yield shared
     finally:
-        db.close()
+        _shared_tool_calls.reset(reset)
 
+def _with_tool_pool(sync_tool):
+    """
+    Give a sync tool an async path that runs its body on the bounded tool pool.
+    The caller's context is copied so per-request state follows the call.
+    Both paths are timed, including the wait for a pool thread. Inside
+    share_tool_calls() identical async calls run once.
+    """
+    @functools.wraps(sync_tool.func)
+    def _run(*args, **kwargs):
+        with tool_span(sync_tool.name):
+            return sync_tool.func(*args, **kwargs)
+
+    async def _call(*args, **kwargs):
+        with tool_span(sync_tool.name):
+            return await run_in_tool_pool(sync_tool.func, *args, **kwargs)
+
+    async def _arun(*args, **kwargs):
+        shared = _shared_tool_calls.get()
+        if shared is None or args:
+            return await _call(*args, **kwargs)
+        return await shared.run(sync_tool.name, kwargs, lambda: _call(**kwargs))
+
+    return StructuredTool.from_function(
+        func=_run,
+        coroutine=_arun,
+        name=sync_tool.name,
+        description=sync_tool.description,
+        args_schema=sync_tool.args_schema,
+    )
 
 def getChatbotTools():
-    return [products_tool, get_top_products, get_order_details]
+    return [_with_tool_pool(t) for t in (products_tool, search_products, get_top_products, get_order_details)]
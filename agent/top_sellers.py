@@ -0,0 +1,251 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+from sqlalchemy import and_, bindparam, desc, func, insert, select, update
+from sqlalchemy.exc import DatabaseError, IntegrityError
+from config.db import Base, session_scope
+from models.Order import Order
+from models.OrderItem import OrderItem
+from models.Product import Product
+from models.ProductSalesMonthly import ProductSalesMonthly
+from models.SalesRollupOrder import SalesRollupOrder
+from models.Thumbnail import Thumbnail
+
+# How often the rollup picks up newly delivered/received orders
+TOP_SELLERS_REFRESH_INTERVAL = float(os.getenv("TOP_SELLERS_REFRESH_INTERVAL", "60"))
+
+# Result cache TTL per filter, in seconds. lastMonth cannot change until the month
+# rolls over (its key changes then), so it can live much longer than thisMonth.
+TOP_SELLERS_CACHE_TTL = {
+    "thisMonth": float(os.getenv("TOP_SELLERS_TTL_THIS_MONTH", "300")),
+    "lastMonth": float(os.getenv("TOP_SELLERS_TTL_LAST_MONTH", "21600")),
+    "thisYear": float(os.getenv("TOP_SELLERS_TTL_THIS_YEAR", "900")),
+    "all": float(os.getenv("TOP_SELLERS_TTL_ALL", "600")),
+}
+
+SOLD_STATUSES = ["Delivered", "Received"]
+MANILA = ZoneInfo("Asia/Manila")
+UTC = ZoneInfo("UTC")
+_CHUNK = 500
+
+def manila_period(order_date: datetime) -> int:
+    """year * 100 + month of a stored (naive UTC) order date, in Asia/Manila time."""
+    local = order_date.replace(tzinfo=UTC).astimezone(MANILA)
+    return local.year * 100 + local.month
+
+def filter_months(filter: str, now: datetime = None):
+    """
+    First and last (year, month) covered by a get_top_products filter in Asia/Manila,
+    or None for "all".
+    """
+    now = now or datetime.now(MANILA)
+    year, month = now.year, now.month
+    if filter == "thisMonth":
+        return (year, month), (year, month)
+    if filter == "lastMonth":
+        last = (year, month - 1) if month > 1 else (year - 1, 12)
+        return last, last
+    if filter == "thisYear":
+        return (year, 1), (year, 12)
+    return None
+
+def result_bucket(filter: str, now: datetime = None):
+    """
+    Cache key and TTL for a filter: the key names the Asia/Manila period the
+    answer covers, so it changes by itself when the period boundary passes.
+    """
+    if filter not in TOP_SELLERS_CACHE_TTL:
+        filter = "all"
+    months = filter_months(filter, now)
+    if months is None:
+        return (filter,), TOP_SELLERS_CACHE_TTL[filter]
+    (start_year, start_month), (end_year, end_month) = months
+    return (filter, start_year * 100 + start_month, end_year * 100 + end_month), TOP_SELLERS_CACHE_TTL[filter]
+
+def _utc_bounds(months):
+    """[start, end) of a month range as naive UTC datetimes, matching stored order dates."""
+    (start_year, start_month), (end_year, end_month) = months
+    end_year, end_month = (end_year + 1, 1) if end_month == 12 else (end_year, end_month + 1)
+    start = datetime(start_year, start_month, 1, tzinfo=MANILA).astimezone(UTC).replace(tzinfo=None)
+    end = datetime(end_year, end_month, 1, tzinfo=MANILA).astimezone(UTC).replace(tzinfo=None)
+    return start, end
+
+def reference_top_products(db, filter="all", limit=10, now=None):
+    """
+    Direct aggregate over order items: the correctness reference for the rollup.
+    Returns (product_id, product_name, thumbnailUrl, total_sold) rows.
+    """
+    query = (
+        select(Product.id, Product.product_name, Thumbnail.thumbnailUrl, func.sum(OrderItem.quantity).label("total_sold"))
+        .join(Order, Order.order_id == OrderItem.order_id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .outerjoin(Thumbnail, Thumbnail.product_id == Product.id)
+        .where(Order.status.in_(SOLD_STATUSES), Product.status == "Available")
+        .group_by(Product.id, Product.product_name, Thumbnail.thumbnailUrl)
+        .order_by(desc("total_sold"), Product.id)
+        .limit(limit)
+    )
+    if months := filter_months(filter, now):
+        start, end = _utc_bounds(months)
+        query = query.where(Order.order_date >= start, Order.order_date < end)
+    return db.execute(query).all()
+
+class SalesRollup:
+    """
+    Per-product, per-month units sold, maintained incrementally.
+
+    Each refresh folds in Delivered/Received orders that are not yet counted and
+    backs out counted orders that left those statuses. SalesRollupOrder records
+    which orders are counted, and a refresh commits its deltas and that record in
+    one transaction: inserting an order another worker counted first fails, and
+    an order is only backed out by the worker whose DELETE removed its record.
+    Totals are incremented in place, so concurrent refreshes never overwrite
+    each other's deltas.
+    """
+
+    def __init__(self, refresh_interval=TOP_SELLERS_REFRESH_INTERVAL, session_factory=session_scope):
+        self.refresh_interval = refresh_interval
+        self.session_factory = session_factory
+        self._lock = threading.Lock()
+        self._refreshed_at = None
+        self._tables_ready = set()
+        self.refreshes = 0
+
+    def ensure_fresh(self):
+        """Refresh if due. While one thread refreshes, others read the current rollup."""
+        if self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.refresh_interval:
+            return
+        if not self._lock.acquire(blocking=self._refreshed_at is None):
+            return
+        try:
+            if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+                with self.session_factory() as db:
+                    self.refresh(db)
+                self._refreshed_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def invalidate(self):
+        """Make the next read pick up order changes right away."""
+        if self._refreshed_at is not None:
+            self._refreshed_at = float("-inf")
+
+    def refresh(self, db) -> dict:
+        """Fold order changes since the last refresh into the rollup."""
+        self._ensure_tables(db)
+        deltas = defaultdict(int)
+        added = set()
+        removed = defaultdict(lambda: defaultdict(int))  # order_id -> (product_id, period) -> units
+
+        new_items = (
+            select(Order.order_id, Order.order_date, OrderItem.product_id, OrderItem.quantity)
+            .join(OrderItem, OrderItem.order_id == Order.order_id)
+            .outerjoin(SalesRollupOrder, SalesRollupOrder.order_id == Order.order_id)
+            .where(Order.status.in_(SOLD_STATUSES), SalesRollupOrder.order_id.is_(None))
+            .execution_options(yield_per=10000)
+        )
+        for order_id, order_date, product_id, quantity in db.execute(new_items):
+            deltas[(product_id, manila_period(order_date))] += quantity
+            added.add(order_id)
+
+        reverted_items = (
+            select(Order.order_id, Order.order_date, OrderItem.product_id, OrderItem.quantity)
+            .join(SalesRollupOrder, SalesRollupOrder.order_id == Order.order_id)
+            .join(OrderItem, OrderItem.order_id == Order.order_id)
+            .where(Order.status.not_in(SOLD_STATUSES))
+        )
+        for order_id, order_date, product_id, quantity in db.execute(reverted_items):
+            removed[order_id][(product_id, manila_period(order_date))] += quantity
+
+        if not added and not removed:
+            return {"added": 0, "removed": 0}
+
+        try:
+            backed_out = self._apply(db, deltas, added, removed)
+            db.commit()
+        except IntegrityError:
+            # Another worker counted the same orders first; pick up its result next time
+            db.rollback()
+            return {"added": 0, "removed": 0}
+        self.refreshes += 1
+        return {"added": len(added), "removed": backed_out}
+
+    def _apply(self, db, deltas, added, removed) -> int:
+        """Record counted orders and apply the deltas; returns how many orders were backed out."""
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        if added:
+            db.execute(insert(SalesRollupOrder), [{"order_id": o, "counted_at": now} for o in added])
+        backed_out = 0
+        for order_id, items in removed.items():
+            # Only the worker whose DELETE removed the record backs the order out
+            result = db.execute(SalesRollupOrder.__table__.delete().where(SalesRollupOrder.order_id == order_id))
+            if result.rowcount == 1:
+                backed_out += 1
+                for key, quantity in items.items():
+                    deltas[key] -= quantity
+
+        existing = set()
+        product_ids = sorted({product_id for product_id, _ in deltas})
+        for start in range(0, len(product_ids), _CHUNK):
+            rows = db.execute(
+                select(ProductSalesMonthly.product_id, ProductSalesMonthly.period)
+                .where(ProductSalesMonthly.product_id.in_(product_ids[start:start + _CHUNK]))
+            )
+            existing.update((p, period) for p, period in rows)
+
+        inserts, updates = [], []
+        for (product_id, period), delta in deltas.items():
+            if (product_id, period) in existing:
+                if delta:
+                    updates.append({"p_id": product_id, "p_period": period, "p_delta": delta})
+            elif delta:
+                # A row another worker inserts meanwhile makes this fail with IntegrityError
+                inserts.append({"product_id": product_id, "period": period, "total_sold": delta})
+        if inserts:
+            db.execute(insert(ProductSalesMonthly), inserts)
+        if updates:
+            table = ProductSalesMonthly.__table__
+            db.connection().execute(
+                update(table)
+                .where(and_(table.c.product_id == bindparam("p_id"), table.c.period == bindparam("p_period")))
+                .values(total_sold=table.c.total_sold + bindparam("p_delta")),
+                updates,
+            )
+        return backed_out
+
+    def _ensure_tables(self, db):
+        bind = db.get_bind()
+        if bind not in self._tables_ready:
+            tables = [ProductSalesMonthly.__table__, SalesRollupOrder.__table__]
+            try:
+                Base.metadata.create_all(bind, tables=tables)
+            except DatabaseError:
+                # Another worker created them between the existence check and CREATE
+                Base.metadata.create_all(bind, tables=tables)
+            self._tables_ready.add(bind)
+
+    def top_products(self, db, filter="all", limit=10, now=None):
+        """
+        Best sellers for a filter, read from the rollup only.
+        Returns (product_id, product_name, thumbnailUrl, total_sold) rows.
+        """
+        sold = select(ProductSalesMonthly.product_id, func.sum(ProductSalesMonthly.total_sold).label("total_sold"))
+        if months := filter_months(filter, now):
+            (start_year, start_month), (end_year, end_month) = months
+            sold = sold.where(ProductSalesMonthly.period.between(start_year * 100 + start_month, end_year * 100 + end_month))
+        sold = sold.group_by(ProductSalesMonthly.product_id).subquery()
+
+        query = (
+            select(Product.id, Product.product_name, Thumbnail.thumbnailUrl, sold.c.total_sold)
+            .join(Product, Product.id == sold.c.product_id)
+            .outerjoin(Thumbnail, Thumbnail.product_id == Product.id)
+            .where(Product.status == "Available", sold.c.total_sold > 0)
+            .order_by(desc(sold.c.total_sold), Product.id)
+            .limit(limit)
+        )
+        return db.execute(query).all()
+
+sales_rollup = SalesRollup()
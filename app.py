@@ -1,20 +1,40 @@
 import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import uvicorn
-from agent.index import initialize_agent
+from agent.metrics import instrument_engine
+from agent.startup import readiness, shutdown, start_background
+from config.db import engine
+from config.replicas import replica_router
 from routes.ai_routes import ai_router
+from routes.catalog_routes import catalog_router
+from routes.metrics_routes import metrics_router
+from routes.order_routes import order_router
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Nothing slow happens at import time; the model, agent graph and first DB
+    # connection are created in the background while the server starts serving.
+    instrument_engine(engine)
+    for replica in replica_router.replicas:
+        instrument_engine(replica.engine, pool=replica.name)
+    start_background()
+    yield
+    await shutdown()
+
+app = FastAPI(lifespan=lifespan)
 
 allowed_origins = [
     "https://ballin-wear.onrender.com",
     "http://localhost:5173"
 ]
 
-initialize_agent()
 app.include_router(ai_router)
+app.include_router(catalog_router)
+app.include_router(order_router)
+app.include_router(metrics_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -32,6 +52,15 @@ async def root():
         print("Error in /:", str(e))
         return JSONResponse(content={"error": "Internal Server Error"}, status_code=500)
 
+@app.get("/api/ready")
+async def ready():
+    try:
+        state = readiness()
+        return JSONResponse(content=state, status_code=200 if state["ready"] else 503)
+    except Exception as e:
+        print("Error in /api/ready:", str(e))
+        return JSONResponse(content={"error": "Internal Server Error"}, status_code=500)
+
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
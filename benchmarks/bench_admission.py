@@ -0,0 +1,134 @@
+"""
+Chat latency, errors and goodput under overload with a fixed semaphore vs adaptive admission control.
+
+Drives /api/chat in-process with open-loop traffic: --rate new conversations
+per second for --seconds, whatever the replies, like shoppers arriving. A
+--faq-share of them ask a policy question the FAQ fast path answers; the rest
+search the catalog through the agent (two model calls). The scripted model
+serves --capacity calls at once with --latency each; calls queued longer than
+--provider-timeout fail with a 429, like a rate-limited Gemini project.
+Clients give up after --client-timeout seconds. The response cache is off so
+every search reaches the model.
+
+- semaphore: the old fixed limit of CHAT_MAX_CONCURRENCY runs, unbounded wait.
+- adaptive: the gradient limit, a bounded priority queue with deadlines, fast 503s.
+
+    python -m benchmarks.bench_admission --rate 12 --seconds 20 --capacity 4 --latency 0.5
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+import uuid
+from benchmarks.util import percentile
+
+FAQ_QUESTION = "what payment methods do you accept?"
+
+async def drive(app, args, searches):
+    import httpx
+    rng = random.Random(args.seed)
+    results = []  # (kind, status, seconds); status None when the client gave up
+
+    async def one(kind, message):
+        start = time.perf_counter()
+        try:
+            r = await client.post("/api/chat", json={"message": message, "thread_id": str(uuid.uuid4())})
+            status = r.status_code
+        except httpx.TimeoutException:
+            status = None
+        results.append((kind, status, time.perf_counter() - start))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.client_timeout) as client:
+        tasks = []
+        start = time.perf_counter()
+        arrival = 0.0
+        while arrival < args.seconds:
+            await asyncio.sleep(max(0.0, arrival - (time.perf_counter() - start)))
+            if rng.random() < args.faq_share:
+                tasks.append(asyncio.create_task(one("faq", FAQ_QUESTION)))
+            else:
+                tasks.append(asyncio.create_task(one("agent", rng.choice(searches))))
+            arrival += rng.expovariate(args.rate)
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+def worker(mode, args, searches, queue):
+    import agent.config
+    import agent.index
+    from benchmarks.fake_llm import ScriptedChatModel, shopper_responder
+    model = ScriptedChatModel(latency=args.latency, capacity=args.capacity, capacity_timeout=args.provider_timeout,
+                              responder=shopper_responder)
+    agent.config.get_model = lambda: model
+    agent.index.get_model = agent.config.get_model
+    from app import app
+    from agent.admission import chat_admission
+
+    async def run():
+        async with app.router.lifespan_context(app):
+            return await drive(app, args, searches)
+
+    results, elapsed = asyncio.run(run())
+    queue.put({"results": results, "elapsed": elapsed, "calls": model.calls, "admission": chat_admission.stats()})
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=12, help="new requests per second")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--faq-share", type=float, default=0.2)
+    parser.add_argument("--capacity", type=int, default=4, help="model calls the provider serves at once")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds per model call")
+    parser.add_argument("--provider-timeout", type=float, default=1, help="seconds a queued model call waits before a 429")
+    parser.add_argument("--client-timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    ctx = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'admission.sqlite3')}"
+        env = {"DATABASE_URL": url, "RESPONSE_CACHE": "0", "CHAT_MEMORY_BACKEND": "bounded",
+               "TOOL_CACHE_PATH": "", "CATALOG_FEED": "0", "GOOGLE_API_KEY": "offline"}
+        os.environ.update(env)
+        from sqlalchemy import text
+        from benchmarks.seed import SIZES, seed_database
+        engine = seed_database(url, products=args.products, orders=100)
+        with engine.connect() as conn:
+            names = [r[0] for r in conn.execute(text("SELECT product_name FROM products"))]
+        engine.dispose()
+        searches = [f"do you have {name} in {size}?" for name in names for size in SIZES]
+
+        capacity = args.capacity / (2 * args.latency)
+        print(f"{args.rate:g} req/s for {args.seconds:g} s, {args.faq_share:.0%} FAQ; the provider serves "
+              f"{args.capacity} calls at once of {args.latency:g} s: about {capacity:.1f} searches/s")
+        print(f"\n{'mode':<11}{'kind':<7}{'sent':>6}{'200':>6}{'503':>6}{'5xx':>6}{'gave up':>9}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'503 p50':>9}{'503 p95':>9}{'ok/s':>7}")
+        semaphore = {"CHAT_ADAPTIVE_LIMIT": "0", "CHAT_QUEUE_SIZE": "0", "CHAT_QUEUE_TIMEOUT": "0"}
+        for mode, extra in (("semaphore", semaphore), ("adaptive", {})):
+            os.environ.update(dict(env, **extra))
+            queue = ctx.Queue()
+            process = ctx.Process(target=worker, args=(mode, args, searches, queue))
+            process.start()
+            r = queue.get(timeout=args.seconds + args.client_timeout + 600)
+            process.join()
+            for key in extra:
+                os.environ.pop(key)
+            for kind in ("faq", "agent"):
+                rows = [(status, seconds) for k, status, seconds in r["results"] if k == kind]
+                ok = [s * 1000 for status, s in rows if status == 200]
+                shed = [s * 1000 for status, s in rows if status == 503]
+                errors = sum(1 for status, _ in rows if status is not None and status >= 500 and status != 503)
+                gave_up = sum(1 for status, _ in rows if status is None)
+                print(f"{mode:<11}{kind:<7}{len(rows):>6}{len(ok):>6}{len(shed):>6}{errors:>6}{gave_up:>9}"
+                      f"{percentile(ok, 50):>9.0f}{percentile(ok, 95):>9.0f}{percentile(shed, 50):>9.0f}"
+                      f"{percentile(shed, 95):>9.0f}{len(ok) / r['elapsed']:>7.2f}")
+            stats = r["admission"]
+            print(f"{'':<11}model calls {r['calls']}, limit at the end {stats['limit']}, shed {stats['shed']}, "
+                  f"failed runs {stats['failed']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Replay transcripts through /api/chat one request at a time and through one /api/chat/batch request.
+
+Each transcript is a thread of two or three turns drawn from a small set of
+shopper questions, so many turns across threads call the same tool with the
+same arguments. Reports wall time for both, the tool calls the batch shared,
+and checks that every item succeeded and that each thread's turns reached its
+memory in order. The response cache and FAQ fast path are off so every turn
+runs the agent.
+
+    python -m benchmarks.bench_batch --threads 50 --latency 0.2 --concurrency 8
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+
+TURNS = [
+    "show me hoodies", "do you have black jerseys?", "any oversized shirts?",
+    "what's your best seller this month?", "where is my order {order_id}?", "thanks",
+]
+
+def build_items(rng, threads, order_ids):
+    """Batch items, the turns of different threads interleaved as a replay log would be."""
+    transcripts = []
+    for _ in range(threads):
+        thread_id = str(uuid.uuid4())
+        order_id = rng.choice(order_ids)
+        turns = rng.sample(TURNS, rng.randint(2, 3))
+        transcripts.append([{"thread_id": thread_id, "message": t.format(order_id=order_id)} for t in turns])
+    items = []
+    while any(transcripts):
+        transcript = rng.choice([t for t in transcripts if t])
+        items.append(transcript.pop(0))
+    return items
+
+async def replay(app, items, concurrency):
+    import httpx
+    from agent.batch import run_chat_batch
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            start = time.perf_counter()
+            for item in items:
+                (await client.post("/api/chat", json=item)).raise_for_status()
+            single_s = time.perf_counter() - start
+
+            # Fresh threads so the batch starts from the same (empty) memory
+            rename = {}
+            batch_items = [{"thread_id": rename.setdefault(i["thread_id"], str(uuid.uuid4())), "message": i["message"]}
+                           for i in items]
+            start = time.perf_counter()
+            if concurrency is None:
+                r = await client.post("/api/chat/batch", json={"items": batch_items})
+                r.raise_for_status()
+                batch = r.json()
+            else:
+                batch = await run_chat_batch(batch_items, concurrency)
+            batch_s = time.perf_counter() - start
+        ordered = await check_order(batch_items)
+    return single_s, batch_s, batch, ordered
+
+async def check_order(items):
+    """True when every thread's memory holds its messages in input order."""
+    from langchain_core.messages import HumanMessage
+    from agent.index import get_chat_bot_agent
+    expected = {}
+    for item in items:
+        expected.setdefault(item["thread_id"], []).append(item["message"])
+    for thread_id, messages in expected.items():
+        state = await get_chat_bot_agent().aget_state({"configurable": {"thread_id": thread_id}})
+        seen = [m.content for m in state.values["messages"] if isinstance(m, HumanMessage)]
+        if seen != messages:
+            return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated LLM latency in seconds")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="batch workers (default: the route's CHAT_BATCH_CONCURRENCY)")
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'batch.sqlite3')}"
+        os.environ["DATABASE_URL"] = url
+        os.environ["FAQ_FAST_PATH"] = "0"
+        os.environ["RESPONSE_CACHE"] = "0"
+        os.environ.setdefault("CHAT_MEMORY_BACKEND", "bounded")
+        from sqlalchemy import text
+        from benchmarks.seed import seed_database
+        engine = seed_database(url, products=args.products, orders=2000)
+        with engine.connect() as conn:
+            order_ids = [r[0] for r in conn.execute(text("SELECT order_id FROM orders LIMIT 5"))]
+
+        import agent.config
+        import agent.index
+        from benchmarks.fake_llm import ScriptedChatModel, shopper_responder
+        model = ScriptedChatModel(latency=args.latency, responder=shopper_responder)
+        agent.config.get_model = lambda: model
+        agent.index.get_model = agent.config.get_model
+        from app import app
+
+        items = build_items(random.Random(args.seed), args.threads, order_ids)
+        single_s, batch_s, batch, ordered = asyncio.run(replay(app, items, args.concurrency))
+
+    failed = [r for r in batch["results"] if not r["success"]]
+    stats = batch["stats"]
+    print(f"{len(items)} turns in {args.threads} threads")
+    print(f"one request per turn  {single_s:8.2f}s")
+    print(f"one batch request     {batch_s:8.2f}s   {single_s / batch_s:.1f}x faster")
+    print(f"tool calls {stats['tool_calls']}, shared {stats['shared']}; failed items {len(failed)}; "
+          f"per-thread order {'OK' if ordered else 'BROKEN'}")
+    raise SystemExit(0 if ordered and not failed else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Stock freshness and refresh cost of the catalog with watermark polling vs the change feed.
+
+A writer thread changes the stock of a random variant every --write-interval
+seconds (triggers record each change) while shopper threads search the
+catalog and render it the way the tools do. Measured per mode, in a fresh
+process each: how long until a stock change is visible in the snapshot, full
+reloads vs patched products, SELECTs, process CPU and tool read latency.
+
+- watermark: the feed is off and the watermark is checked every
+  --check-interval seconds; any change reloads the whole catalog.
+- feed: the change table is tailed every --feed-interval seconds and only
+  changed products are re-read; the watermark check stays at its default.
+
+    python -m benchmarks.bench_catalog_feed --products 10000 --seconds 10
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from benchmarks.util import percentile
+
+def worker(url, mode, args, results):
+    from sqlalchemy import create_engine, event, text
+    import agent.tools  # registers every model, as in the app
+    from config.db import engine
+    from agent.catalog_feed import catalog_feed
+    catalog_cache, get_catalog_index = agent.tools.catalog_cache, agent.tools.get_catalog_index
+
+    counts = {"selects": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            counts["selects"] += 1
+
+    writer_engine = create_engine(url, connect_args={"timeout": 30})
+    with writer_engine.connect() as conn:
+        variants = conn.execute(text(
+            "SELECT v.id, v.product_id FROM variants v JOIN products p ON p.id = v.product_id "
+            "WHERE p.status = 'Available'")).all()
+        # Stock values no earlier run has written, so a match means this change is visible
+        first_stock = conn.execute(text("SELECT MAX(stock) FROM variants")).scalar() + 1
+
+    catalog_cache.get_products()
+    if mode == "feed":
+        catalog_feed.start()
+    stop = threading.Event()
+    pending = {}  # (product_id, stock) -> time of the write
+    lags, reads = [], {"search": [], "render": []}
+    lock = threading.Lock()
+    counts["selects"] = 0
+    cpu_start = time.process_time()
+    reloads, patches = catalog_cache.reloads, catalog_cache.patched_products
+
+    def write():
+        rng = random.Random(7)
+        stock = first_stock
+        while not stop.wait(args.write_interval):
+            variant_id, product_id = rng.choice(variants)
+            # Timed from before the write: an upper bound on the lag, whatever the thread scheduling
+            with lock:
+                pending[(product_id, stock)] = time.monotonic()
+            with writer_engine.begin() as conn:
+                conn.execute(text("UPDATE variants SET stock = :s WHERE id = :v"), {"s": stock, "v": variant_id})
+            stock += 1
+
+    def watch():
+        while not stop.wait(0.01):
+            with lock:
+                waiting = list(pending.items())
+            for (product_id, stock), written in waiting:
+                product = catalog_cache.get_product(product_id)
+                if product is not None and any(v["stock"] == stock for v in product["variants"]):
+                    with lock:
+                        pending.pop((product_id, stock), None)
+                    lags.append(time.monotonic() - written)
+
+    def shop():
+        rng = random.Random(threading.get_ident())
+        while not stop.wait(0.02):
+            start = time.perf_counter()
+            get_catalog_index().search(rng.choice(["hoodie", "black jersey", "cap", "shorts"]), in_stock_only=True)
+            reads["search"].append((time.perf_counter() - start) * 1000)
+            start = time.perf_counter()
+            catalog_cache.get_compact()
+            reads["render"].append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=write), threading.Thread(target=watch)] + \
+              [threading.Thread(target=shop) for _ in range(args.shoppers)]
+    for t in threads:
+        t.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    catalog_feed.stop()
+    results.put({
+        "writes": len(lags) + len(pending), "visible": len(lags), "lags": lags, "reads": reads,
+        "reloads": catalog_cache.reloads - reloads, "patched": catalog_cache.patched_products - patches,
+        "selects": counts["selects"], "cpu": time.process_time() - cpu_start,
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--write-interval", type=float, default=0.05)
+    parser.add_argument("--check-interval", type=float, default=1, help="watermark check interval of the polling mode")
+    parser.add_argument("--feed-interval", type=float, default=1)
+    parser.add_argument("--shoppers", type=int, default=4)
+    args = parser.parse_args()
+    ctx = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'catalog.sqlite3')}"
+        env = {"DATABASE_URL": url, "TOOL_CACHE_PATH": "", "CATALOG_FEED_TRIGGERS": "1", "GOOGLE_API_KEY": "offline"}
+        os.environ.update(env)
+        from benchmarks.seed import seed_database
+        engine = seed_database(url, products=args.products, orders=100)
+        with engine.connect() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+        from agent.catalog_feed import CatalogFeed
+        with engine.connect() as conn:
+            from sqlalchemy.orm import Session
+            CatalogFeed(triggers=True)._ensure_tables(Session(bind=conn))
+        engine.dispose()
+
+        print(f"{args.products} products, a stock change every {args.write_interval * 1000:.0f} ms, "
+              f"{args.shoppers} shopper threads, {args.seconds:.0f} s per mode")
+        print(f"{'mode':<11}{'changes':>8}{'seen':>6}{'lag p50 s':>10}{'p95 s':>7}{'max s':>7}{'reloads':>9}"
+              f"{'patched':>9}{'SELECTs':>9}{'CPU s':>7}{'search p95 ms':>15}{'render p95 ms':>15}")
+        for mode, extra in (("watermark", {"CATALOG_FEED": "0", "CATALOG_CHECK_INTERVAL": str(args.check_interval)}),
+                            ("feed", {"CATALOG_FEED_INTERVAL": str(args.feed_interval)})):
+            os.environ.update(dict(env, **extra))
+            results = ctx.Queue()
+            process = ctx.Process(target=worker, args=(url, mode, args, results))
+            process.start()
+            r = results.get(timeout=600)
+            process.join()
+            for key in extra:
+                os.environ.pop(key)
+            lags = r["lags"] or [float("nan")]
+            print(f"{mode:<11}{r['writes']:>8}{r['visible']:>6}{percentile(lags, 50):>10.2f}{percentile(lags, 95):>7.2f}"
+                  f"{max(lags):>7.2f}{r['reloads']:>9}{r['patched']:>9}{r['selects']:>9}{r['cpu']:>7.1f}"
+                  f"{percentile(r['reads']['search'], 95):>15.1f}{percentile(r['reads']['render'], 95):>15.1f}")
+
+if __name__ == "__main__":
+    main()
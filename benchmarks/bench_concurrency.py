@@ -0,0 +1,73 @@
+"""
+Load benchmark for /api/chat with a stubbed model.
+
+Compares the old blocking handler (sync agent.stream inside an async route)
+with the async execution path, at increasing numbers of concurrent requests.
+
+    python -m benchmarks.bench_concurrency --latency 0.2 --requests 64
+"""
+import argparse
+import asyncio
+import time
+import uuid
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import agent.index
+from benchmarks.fake_llm import ScriptedChatModel
+
+def build_apps(latency: float):
+    agent.index.get_model = lambda: ScriptedChatModel(latency=latency)
+    agent.index.initialize_agent()
+    from app import app
+    from agent.index import get_chat_bot_agent
+    from agent.runner import clean_response
+
+    blocking_app = FastAPI()
+
+    @blocking_app.post("/api/chat")
+    async def blocking_chat(request: Request):
+        body = await request.json()
+        thread_id = body.get("thread_id") or str(uuid.uuid4())
+        result = ""
+        for step, metadata in get_chat_bot_agent().stream(
+            {"messages": [{"role": "user", "content": body["message"]}]},
+            config={"configurable": {"thread_id": thread_id}},
+            stream_mode="messages"
+        ):
+            if metadata.get("langgraph_node") == "agent" and (text := step.text):
+                result += text
+        return JSONResponse(content={"response": clean_response(result), "thread_id": thread_id})
+
+    return {"blocking": blocking_app, "async": app}
+
+async def drive(app, total: int, concurrency: int) -> float:
+    """Send `total` chat requests with at most `concurrency` in flight; return req/s."""
+    limit = asyncio.Semaphore(concurrency)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            async with limit:
+                r = await client.post("/api/chat", json={"message": f"hi {i}"})
+                r.raise_for_status()
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return total / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.2, help="simulated LLM latency in seconds")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    apps = build_apps(args.latency)
+    print(f"{'mode':<10}{'concurrency':>12}{'req/s':>10}")
+    for mode, app in apps.items():
+        for c in args.concurrency:
+            rps = asyncio.run(drive(app, args.requests, c))
+            print(f"{mode:<10}{c:>12}{rps:>10.2f}")
+
+if __name__ == "__main__":
+    main()
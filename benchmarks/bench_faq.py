@@ -0,0 +1,63 @@
+"""
+p50 latency and LLM call count for a scripted chat mix, with and without the FAQ fast path.
+
+    python -m benchmarks.bench_faq --latency 0.8
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from benchmarks.util import percentile
+
+MESSAGES = [
+    "What payment methods do you accept?",
+    "Do you ship to Mindanao?",
+    "How long does shipping take?",
+    "Can I return an item?",
+    "How do I create an account?",
+    "Is my payment info safe?",
+    "Do you deliver to Cebu?",
+    "What is your refund policy?",
+    "Do you share my data with anyone?",
+    "What is Ballin Wear?",
+    "Show me black hoodies",
+    "What are your best sellers this month?",
+    "Where is my order?",
+    "Do you have jerseys in XL?",
+    "Thanks!",
+]
+
+async def run_mix(rounds: int):
+    from agent.runner import run_chat_turn
+    latencies = []
+    for _ in range(rounds):
+        for message in MESSAGES:
+            start = time.perf_counter()
+            await run_chat_turn(message, str(uuid.uuid4()))
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.8, help="simulated LLM latency in seconds")
+    parser.add_argument("--rounds", type=int, default=2)
+    args = parser.parse_args()
+
+    import agent.index
+    import agent.runner
+    from benchmarks.fake_llm import ScriptedChatModel
+    model = ScriptedChatModel(latency=args.latency)
+    agent.index.get_model = lambda: model
+    agent.index.initialize_agent()
+
+    print(f"{'fast path':<10}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}{'LLM calls':>11}")
+    for enabled in (False, True):
+        agent.runner.FAQ_FAST_PATH_ENABLED = enabled
+        model.calls = 0
+        latencies = asyncio.run(run_mix(args.rounds))
+        print(f"{'on' if enabled else 'off':<10}{statistics.median(latencies):>10.1f}"
+              f"{percentile(latencies, 95):>10.1f}{statistics.mean(latencies):>10.1f}{model.calls:>11}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Per-turn prompt size over a 30-turn scripted conversation, with and without history trimming.
+
+Runs the same conversation twice through the agent with a scripted model:
+once sending the full history every turn, once with the pre-model hook that
+caps it (agent/history.py). Each row shows the input tokens of the turn's
+model calls (system prompt included) and the simulated model time. The FAQ,
+order and response-cache fast paths are off so every turn reaches the model.
+
+    python -m benchmarks.bench_history --products 300 --budget 6000 --per-token 0.00002
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import uuid
+
+SCRIPT = [
+    "hi", "show me your full catalog", "do you have black hoodies?", "any in size XL?",
+    "where is my order {order_id}?", "what's the status?", "show me shorts under 600",
+    "what's your best seller this month?", "do you have jerseys?", "show me caps",
+    "show me your full catalog", "any oversized shirts?", "what is the total?", "show me hoodies",
+    "what's your best seller?", "do you have white shirts?", "show me jerseys in M",
+    "any red shorts?", "what payment did I use?", "show me your full catalog",
+    "show me socks", "any black caps?", "what's the status of my order?", "show me jackets",
+    "do you have shorts in L?", "top products this month", "show me your full catalog",
+    "any blue hoodies?", "what is in my order?", "thanks",
+]
+
+async def run_conversation(model, turns):
+    """Input tokens of each turn's model calls, in order."""
+    from agent.runner import run_chat_turn
+    thread_id = str(uuid.uuid4())
+    per_turn = []
+    for message in turns:
+        before = len(model.prompt_tokens)
+        await run_chat_turn(message, thread_id)
+        per_turn.append(model.prompt_tokens[before:])
+    return per_turn
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--budget", type=int, default=6000, help="history token budget")
+    parser.add_argument("--keep-turns", type=int, default=2)
+    parser.add_argument("--no-summary", action="store_true")
+    parser.add_argument("--per-token", type=float, default=0.00002, help="simulated model seconds per input token")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'history.sqlite3')}"
+        os.environ["DATABASE_URL"] = url
+        for flag in ("FAQ_FAST_PATH", "RESPONSE_CACHE", "ORDER_FAST_PATH"):
+            os.environ[flag] = "0"
+        os.environ.setdefault("CHAT_MEMORY_BACKEND", "bounded")
+        from sqlalchemy import text
+        from benchmarks.seed import seed_database
+        engine = seed_database(url, products=args.products, orders=200)
+        with engine.connect() as conn:
+            order_id = conn.execute(text("SELECT order_id FROM orders LIMIT 1")).scalar()
+        turns = [t.format(order_id=order_id) for t in SCRIPT]
+
+        import agent.history
+        import agent.index
+        from agent.history import trim_history
+        from benchmarks.fake_llm import ScriptedChatModel, shopper_responder
+        results = {}
+        for label, budget in (("full", 0), ("trimmed", args.budget)):
+            model = ScriptedChatModel(responder=shopper_responder)
+            agent.index.get_model = lambda: model
+            agent.index.history_hook = lambda state, budget=budget: {"llm_input_messages": trim_history(
+                state["messages"], budget=budget, keep_turns=args.keep_turns, summarize=not args.no_summary)}
+            agent.index._model = agent.index._chat_bot_agent = None
+            agent.index.initialize_agent()
+            results[label] = asyncio.run(run_conversation(model, turns))
+
+    print(f"\n{'turn':>4}  {'message':<36}{'full tok':>10}{'trimmed':>10}{'full s':>8}{'trim s':>8}")
+    totals = {"full": 0, "trimmed": 0}
+    for i, message in enumerate(turns):
+        full, trimmed = sum(results["full"][i]), sum(results["trimmed"][i])
+        totals["full"] += full
+        totals["trimmed"] += trimmed
+        print(f"{i + 1:>4}  {message[:34]:<36}{full:>10}{trimmed:>10}"
+              f"{full * args.per_token:>8.2f}{trimmed * args.per_token:>8.2f}")
+    largest = {label: max(max(calls) for calls in turns_ if calls) for label, turns_ in results.items()}
+    print(f"\ntotal input tokens: full {totals['full']}, trimmed {totals['trimmed']} "
+          f"({1 - totals['trimmed'] / totals['full']:.0%} less)")
+    print(f"largest single call: full {largest['full']}, trimmed {largest['trimmed']}")
+
+if __name__ == "__main__":
+    main()
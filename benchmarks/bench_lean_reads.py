@@ -0,0 +1,187 @@
+"""
+Compare the column-projection read paths with the ORM entity paths they replaced.
+
+Seeds a SQLite store and, for each read, times the old ORM query (entities,
+identity map, joinedload relationships) against the column-only select,
+reporting the median time, the tracemalloc peak and whether both produce the
+same result:
+
+  catalog      every Available product with variants and thumbnail
+  order        get_order_details' order + customer + address + items lookup
+  item scan    sold quantity per (product, month) over every order item,
+               as the top-sellers rollup build reads it
+
+    python -m benchmarks.bench_lean_reads --products 10000 --orders 400000
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from zoneinfo import ZoneInfo
+from sqlalchemy.orm import joinedload, sessionmaker
+from benchmarks.seed import seed_database
+
+def legacy_load_products(db):
+    """The ORM catalog loader that agent/catalog.py::_load_products replaced."""
+    from models.Product import Product
+    products = db.query(Product).filter(Product.status == "Available").options(
+        joinedload(Product.variants), joinedload(Product.thumbnail)).all()
+    return [
+        {
+            "product_name": product.product_name,
+            "category": product.category,
+            "variants": [{"price": v.price, "stock": v.stock, "size": v.size, "color": v.color}
+                         for v in sorted(product.variants, key=lambda v: v.id)],
+            "thumbnail": {
+                "thumbnailUrl": product.thumbnail.thumbnailUrl,
+                "thumbnailPublicId": product.thumbnail.thumbnailPublicId
+            } if product.thumbnail else None,
+        }
+        for product in sorted(products, key=lambda p: p.id)
+    ]
+
+def legacy_load_order(db, order_id):
+    """The ORM order loader that agent/orders.py::load_order replaced."""
+    from models.Order import Order
+    from models.OrderItem import OrderItem
+    from models.Product import Product
+    order = (
+        db.query(Order)
+        .options(joinedload(Order.customer),
+                 joinedload(Order.order_items).joinedload(OrderItem.product).joinedload(Product.thumbnail),
+                 joinedload(Order.order_address))
+        .filter(Order.order_id == order_id)
+        .first()
+    )
+    if not order:
+        return None
+    utc_date = order.order_date.replace(tzinfo=ZoneInfo("UTC"))
+    addr = order.order_address
+    return {
+        "order_id": order.order_id,
+        "customer_id": order.customer_id,
+        "customer_name": f"{order.customer.firstname} {order.customer.lastname}" if order.customer else "N/A",
+        "status": order.status.value if order.status else "N/A",
+        "payment_method": order.payment_method.value if order.payment_method else "N/A",
+        "subtotal": order.subtotal,
+        "total": order.total,
+        "order_date": utc_date.astimezone(ZoneInfo("Asia/Manila")).strftime("%B %d, %Y %I:%M %p"),
+        "placed_at": utc_date,
+        "cancellation_reason": order.cancellation_reason or "No cancellation reason.",
+        "address": {
+            "fullname": addr.fullname, "address_line_1": addr.address_line_1, "address_line_2": addr.address_line_2,
+            "admin_area_1": addr.admin_area_1, "admin_area_2": addr.admin_area_2,
+            "postal_code": addr.postal_code, "phone": addr.phone,
+        } if addr else None,
+        "items": [
+            {
+                "image": item.product.thumbnail.thumbnailUrl if item.product and item.product.thumbnail else "No image available",
+                "product_name": item.product.product_name if item.product else "N/A",
+                "size": item.size, "color": item.color, "price": item.price,
+                "quantity": item.quantity, "total": item.total,
+            }
+            for item in sorted(order.order_items, key=lambda i: i.id)
+        ],
+    }
+
+def legacy_item_scan(db):
+    """Sold quantities per (product, month) from OrderItem and Order entities."""
+    from agent.top_sellers import SOLD_STATUSES, manila_period
+    from models.Order import Order
+    from models.OrderItem import OrderItem
+    totals = defaultdict(int)
+    rows = db.query(OrderItem, Order).join(Order, Order.order_id == OrderItem.order_id) \
+        .filter(Order.status.in_(SOLD_STATUSES))
+    for item, order in rows:
+        totals[(item.product_id, manila_period(order.order_date))] += item.quantity
+    return dict(totals)
+
+def lean_item_scan(db):
+    """The same totals from a streamed column select, as SalesRollup.refresh reads them."""
+    from sqlalchemy import select
+    from agent.top_sellers import SOLD_STATUSES, manila_period
+    from models.Order import Order
+    from models.OrderItem import OrderItem
+    totals = defaultdict(int)
+    rows = db.execute(
+        select(Order.order_date, OrderItem.product_id, OrderItem.quantity)
+        .join(OrderItem, OrderItem.order_id == Order.order_id)
+        .where(Order.status.in_(SOLD_STATUSES))
+        .execution_options(yield_per=10000)
+    )
+    for order_date, product_id, quantity in rows:
+        totals[(product_id, manila_period(order_date))] += quantity
+    return dict(totals)
+
+def measure(Session, fn, repeat):
+    """(median ms, tracemalloc peak MB, result) of `fn(db)`, each run in a new session."""
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        with Session() as db:
+            start = time.perf_counter()
+            result = fn(db)
+            samples.append((time.perf_counter() - start) * 1000)
+    gc.collect()
+    tracemalloc.start()
+    with Session() as db:
+        fn(db)
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    samples.sort()
+    return samples[len(samples) // 2], peak, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--orders", type=int, default=400000, help="about 2.5 order items each")
+    parser.add_argument("--customers", type=int, default=2000)
+    parser.add_argument("--lookups", type=int, default=200, help="orders looked up for the order comparison")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'lean.sqlite3')}"
+        os.environ["DATABASE_URL"] = url
+        start = time.perf_counter()
+        engine = seed_database(url, products=args.products, orders=args.orders, customers=args.customers)
+        from sqlalchemy import func, select
+        from models.OrderItem import OrderItem
+        with engine.connect() as conn:
+            item_count = conn.execute(select(func.count(OrderItem.id))).scalar()
+            order_ids = [r[0] for r in conn.execute(select(OrderItem.order_id).distinct().limit(args.lookups * 10))]
+        print(f"seeded {args.products} products, {args.orders} orders, {item_count} order items "
+              f"in {time.perf_counter() - start:.1f}s\n")
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        from agent.catalog import _load_products
+        from agent.orders import load_order
+        lookups = random.Random(42).sample(order_ids, min(args.lookups, len(order_ids)))
+
+        def lookup_all(loader):
+            return lambda db: [loader(db, order_id) for order_id in lookups]
+
+        cases = [
+            ("catalog", legacy_load_products, lambda db: list(_load_products(db).values())),
+            (f"order x{len(lookups)}", lookup_all(legacy_load_order), lookup_all(load_order)),
+            ("item scan", legacy_item_scan, lean_item_scan),
+        ]
+        print(f"{'read':<12}{'path':<8}{'ms':>10}{'peak MB':>10}")
+        ok = True
+        for name, legacy, lean in cases:
+            legacy_ms, legacy_mb, expected = measure(Session, legacy, args.repeat)
+            lean_ms, lean_mb, actual = measure(Session, lean, args.repeat)
+            match = expected == actual
+            ok &= match
+            print(f"{name:<12}{'orm':<8}{legacy_ms:>10.1f}{legacy_mb:>10.1f}")
+            print(f"{'':<12}{'lean':<8}{lean_ms:>10.1f}{lean_mb:>10.1f}"
+                  f"   {legacy_ms / lean_ms:.1f}x faster, {'same result' if match else 'RESULTS DIFFER'}")
+        engine.dispose()
+    raise SystemExit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
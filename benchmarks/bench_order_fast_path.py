@@ -0,0 +1,103 @@
+"""
+Latency of scripted order-tracking conversations with and without the order fast path.
+
+With the fast path, a turn that asks for one field of an order (named in the
+message or earlier in the thread) is answered from a template with no model
+call, and other order turns start loading the order while the model runs.
+Order lookups get a simulated database round trip (--db-latency) and the
+model a fixed latency (--latency); the FAQ path and response cache are off.
+
+    python -m benchmarks.bench_order_fast_path --conversations 40 --latency 0.3 --db-latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from benchmarks.util import percentile
+
+# (kind, message): "lookup" turns name the order, "field" turns ask for one field of it
+CONVERSATIONS = [
+    [("lookup", "where is my order {order_id}?"), ("field", "what's the status?"), ("field", "what is the total?")],
+    [("field", "track order {order_id}"), ("field", "what payment did I use?")],
+    [("field", "what items are in order {order_id}?"), ("field", "what's the address?")],
+    [("other", "hi"), ("field", "status of order {order_id}?"), ("lookup", "can I still change my order?")],
+]
+
+async def replay(conversations):
+    from agent.runner import run_chat_turn
+    latencies = {}
+    for turns in conversations:
+        thread_id = str(uuid.uuid4())
+        for kind, message in turns:
+            start = time.perf_counter()
+            await run_chat_turn(message, thread_id)
+            latencies.setdefault(kind, []).append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--conversations", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated LLM latency in seconds")
+    parser.add_argument("--db-latency", type=float, default=0.05, help="simulated order lookup round trip in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'orders.sqlite3')}"
+        os.environ["DATABASE_URL"] = url
+        os.environ["FAQ_FAST_PATH"] = "0"
+        os.environ["RESPONSE_CACHE"] = "0"
+        os.environ.setdefault("CHAT_MEMORY_BACKEND", "bounded")
+        from sqlalchemy import text
+        from benchmarks.seed import seed_database
+        engine = seed_database(url, products=200, orders=args.conversations * 2)
+        with engine.connect() as conn:
+            order_ids = [r[0] for r in conn.execute(text("SELECT order_id FROM orders"))]
+
+        import agent.index
+        import agent.orders
+        import agent.runner
+        from agent.orders import invalidate_order
+        from benchmarks.fake_llm import ScriptedChatModel, shopper_responder
+        model = ScriptedChatModel(latency=args.latency, responder=shopper_responder)
+        agent.index.get_model = lambda: model
+        agent.index.initialize_agent()
+
+        load_order = agent.orders.load_order
+
+        def slow_load_order(db, order_id):
+            time.sleep(args.db_latency)
+            return load_order(db, order_id)
+        agent.orders.load_order = slow_load_order
+
+        rng = random.Random(args.seed)
+        conversations = []
+        for i in range(args.conversations):
+            turns = CONVERSATIONS[i % len(CONVERSATIONS)]
+            order_id = rng.choice(order_ids)
+            conversations.append([(kind, message.format(order_id=order_id)) for kind, message in turns])
+
+        results = {}
+        for label, enabled in (("agent only", False), ("fast path", True)):
+            agent.runner.ORDER_FAST_PATH_ENABLED = enabled
+            invalidate_order()
+            calls = model.calls
+            start = time.perf_counter()
+            latencies = asyncio.run(replay(conversations))
+            results[label] = (latencies, model.calls - calls, time.perf_counter() - start)
+
+    print(f"\n{'mode':<12}{'turns':>7}{'LLM calls':>11}{'total s':>9}  {'kind':<8}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    for label, (latencies, calls, elapsed) in results.items():
+        turns = sum(len(v) for v in latencies.values())
+        for i, kind in enumerate(sorted(latencies)):
+            samples = latencies[kind]
+            head = f"{label:<12}{turns:>7}{calls:>11}{elapsed:>9.1f}" if i == 0 else " " * 39
+            print(f"{head}  {kind:<8}{statistics.mean(samples):>9.1f}{percentile(samples, 50):>9.1f}"
+                  f"{percentile(samples, 95):>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Input tokens per model call with the static prompt prefix sent every call vs held in a provider cache.
+
+Replays the 30-turn conversation of bench_history through the agent twice
+with a scripted model: once sending the system prompt with every call, and
+once with the prefix in a (simulated) provider context cache, so each call
+sends only the trimmed conversation. Each call's sent and cached input
+tokens are recorded; --per-token turns the sent tokens into model time
+(cached tokens cost none). The FAQ, order and response-cache fast paths are
+off so every turn reaches the model.
+
+    python -m benchmarks.bench_prompt_cache --products 300 --per-token 0.00002
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from benchmarks.util import percentile
+
+async def run_conversation(turns):
+    from agent.runner import run_chat_turn
+    thread_id = str(uuid.uuid4())
+    for message in turns:
+        await run_chat_turn(message, thread_id)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=300)
+    parser.add_argument("--per-token", type=float, default=0.00002, help="simulated model seconds per sent input token")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'prompt.sqlite3')}"
+        os.environ["DATABASE_URL"] = url
+        for flag in ("FAQ_FAST_PATH", "RESPONSE_CACHE", "ORDER_FAST_PATH"):
+            os.environ[flag] = "0"
+        os.environ.setdefault("CHAT_MEMORY_BACKEND", "bounded")
+        # The scripted prompt is under Gemini's minimum cache size; cache it anyway
+        os.environ["PROMPT_CACHE_MIN_TOKENS"] = "0"
+        from sqlalchemy import text
+        from benchmarks.seed import seed_database
+        from benchmarks.bench_history import SCRIPT
+        engine = seed_database(url, products=args.products, orders=200)
+        with engine.connect() as conn:
+            order_id = conn.execute(text("SELECT order_id FROM orders LIMIT 1")).scalar()
+        turns = [t.format(order_id=order_id) for t in SCRIPT]
+
+        import agent.index
+        import agent.prompt_cache
+        from agent.metrics import LLM_TOKENS
+        from benchmarks.fake_llm import ScriptedChatModel, fake_prompt_cache, shopper_responder
+        agent.prompt_cache.PROVIDER_CACHES["scripted-fake"] = fake_prompt_cache
+        results = {}
+        for label, mode in (("prompt sent", "local"), ("provider cache", "auto")):
+            model = ScriptedChatModel(responder=shopper_responder, latency_per_token=args.per_token)
+            agent.index.get_model = lambda: model
+            agent.index.PromptPrefix = lambda m, tools, mode=mode: agent.prompt_cache.PromptPrefix(m, tools, mode=mode)
+            agent.index._model = agent.index._chat_bot_agent = None
+            agent.index.initialize_agent()
+            cached_before = LLM_TOKENS._series.get(("in_cached",), [0, 0])[-2]
+            start = time.perf_counter()
+            asyncio.run(run_conversation(turns))
+            elapsed = time.perf_counter() - start
+            stats = agent.index.get_prompt_stats()
+            cached = LLM_TOKENS._series.get(("in_cached",), [0, 0])[-2] - cached_before
+            results[label] = (list(model.prompt_tokens), cached, elapsed, stats)
+
+    print(f"\n{'prefix':<16}{'calls':>6}{'sent tok':>10}{'cached tok':>12}{'mean/call':>11}"
+          f"{'p50/call':>10}{'p95/call':>10}{'model s':>9}")
+    for label, (sent, cached, elapsed, stats) in results.items():
+        print(f"{label:<16}{len(sent):>6}{sum(sent):>10}{cached:>12.0f}{statistics.mean(sent):>11.0f}"
+              f"{percentile(sent, 50):>10.0f}{percentile(sent, 95):>10.0f}{elapsed:>9.2f}")
+    for label, (*_, stats) in results.items():
+        print(f"{label}: mode {stats['mode']}, prefix ~{stats['prefix_tokens']} tokens "
+              f"(system prompt + tool schemas), calls {stats['calls']}")
+    sent = {label: sum(r[0]) for label, r in results.items()}
+    print(f"\nsent input tokens: {sent['prompt sent']} -> {sent['provider cache']} "
+          f"({1 - sent['provider cache'] / sent['prompt sent']:.0%} less)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Model call latency and failures with faulty models, called directly vs through the resilient wrapper.
+
+Each scenario starts --calls model calls at --rate per second against a
+scripted model with injected faults: directly, and through
+ResilientChatModel with each policy. The models do not stream.
+
+- stalls: --stall-rate of the calls hang for --stall seconds (the p99 problem).
+- errors: --failure-rate of the calls fail with a 503.
+- outage: the primary fails every call for the middle third of the run; a
+  secondary model is configured for the "failover" policy.
+
+    python -m benchmarks.bench_resilience --calls 2000 --rate 60
+"""
+import argparse
+import asyncio
+import time
+from benchmarks.util import percentile
+
+def build_policies(args):
+    from agent.resilience import CircuitBreaker, ResiliencePolicy
+
+    def policy(**kwargs):
+        options = dict(timeout=args.timeout, retries=2, backoff=0.05, breaker=CircuitBreaker(failures=0), seed=1)
+        options.update(kwargs)
+        return ResiliencePolicy(**options)
+
+    return {
+        "stalls": [("direct", None), ("deadline+retry", policy()), ("+hedge p95", policy(hedge=True))],
+        "errors": [("direct", None), ("retry", policy())],
+        "outage": [("direct", None), ("retry", policy()),
+                   ("breaker", policy(breaker=CircuitBreaker(failures=5, cooldown=args.cooldown))),
+                   ("failover", policy(breaker=CircuitBreaker(failures=5, cooldown=args.cooldown)))],
+    }
+
+async def run(args, scenario, name, policy):
+    from agent.resilience import ResilientChatModel
+    from benchmarks.fake_llm import ScriptedChatModel
+    faults = {"stalls": {"stall_rate": args.stall_rate, "stall": args.stall},
+              "errors": {"failure_rate": args.failure_rate},
+              "outage": {}}[scenario]
+    primary = ScriptedChatModel(latency=args.latency, jitter=args.jitter, seed=7, **faults)
+    secondary = ScriptedChatModel(latency=args.latency * 1.5, jitter=args.jitter, seed=8)
+    model = primary
+    if policy is not None:
+        model = ResilientChatModel(primary=primary, secondary=secondary if name == "failover" else None,
+                                   policy=policy, model_name="scripted")
+    latencies, failures = [], 0
+    start = time.perf_counter()
+    third = args.calls / args.rate / 3
+
+    async def call(i):
+        nonlocal failures
+        await asyncio.sleep(i / args.rate)
+        if scenario == "outage":
+            primary.failure_rate = 1.0 if third <= time.perf_counter() - start < 2 * third else 0.0
+        t = time.perf_counter()
+        try:
+            await model.ainvoke(f"hi {i}")
+            latencies.append(time.perf_counter() - t)
+        except Exception:
+            failures += 1
+
+    await asyncio.gather(*(call(i) for i in range(args.calls)))
+    return {"latencies": latencies, "failures": failures, "secondary": secondary.calls,
+            "stats": policy.stats() if policy is not None else None}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=60, help="calls started per second")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per model call")
+    parser.add_argument("--jitter", type=float, default=0.1, help="up to this many extra seconds per call")
+    parser.add_argument("--stall-rate", type=float, default=0.02)
+    parser.add_argument("--stall", type=float, default=10)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--timeout", type=float, default=2, help="per-attempt deadline of the wrapper")
+    parser.add_argument("--cooldown", type=float, default=2, help="seconds the breaker stays open")
+    args = parser.parse_args()
+
+    print(f"{args.calls} calls at {args.rate:g}/s, model latency {args.latency:g} s "
+          f"+ up to {args.jitter:g} s, attempt deadline {args.timeout:g} s")
+    print(f"\n{'scenario':<9}{'policy':<16}{'failed':>7}{'p50 ms':>8}{'p95 ms':>8}{'p99 ms':>8}{'max ms':>8}"
+          f"{'2nd model':>10}  paths")
+    for scenario, policies in build_policies(args).items():
+        for name, policy in policies:
+            r = asyncio.run(run(args, scenario, name, policy))
+            ms = [s * 1000 for s in r["latencies"]] or [0.0]
+            paths = ""
+            if stats := r["stats"]:
+                paths = ", ".join(f"{k} {v}" for k, v in stats["paths"].items() if v)
+                paths += f"; {stats['retries']} retries, {stats['hedges']} hedges, {stats['timeouts']} timeouts"
+                if stats["breaker"]["opens"]:
+                    paths += f", breaker opened {stats['breaker']['opens']}x"
+            print(f"{scenario:<9}{name:<16}{r['failures']:>7}{percentile(ms, 50):>8.0f}{percentile(ms, 95):>8.0f}"
+                  f"{percentile(ms, 99):>8.0f}{max(ms):>8.0f}{r['secondary']:>10}  {paths}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Replay a synthetic shopper query log with and without the response cache.
+
+The log draws intents from a Zipf distribution (a few questions are asked a
+lot), each phrased in several ways. Every query opens a new thread, like a
+shopper landing on the chat widget. The scripted model calls the tool an
+intent needs, so order lookups go through get_order_details and must never
+be served from the cache.
+
+    python -m benchmarks.bench_response_cache --queries 400 --latency 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+import uuid
+from benchmarks.util import percentile
+
+INTENTS = [
+    ["What's your best seller?", "what is your best seller", "Best sellers?", "whats ur best seller"],
+    ["Show me hoodies", "show me hoodies please", "Show me hoodies!", "hoodies show me"],
+    ["Do you have black jerseys?", "do you have black jerseys", "Black jerseys, do you have?"],
+    ["Top products this month", "top products this month?", "This month top products"],
+    ["Show me shorts under 600", "show me shorts under 600 please", "Shorts under 600 show me"],
+    ["Any oversized shirts?", "any oversized shirts", "Oversized shirts any?"],
+    ["What caps do you sell?", "what caps do you sell", "Caps, what do you sell?"],
+    ["Show me your full catalog", "show me your full catalog please"],
+    ["Where is my order ORDER_ID?", "Track my order ORDER_ID", "order ORDER_ID status?"],
+]
+
+def build_log(rng, queries, order_ids):
+    weights = [1 / (rank + 1) for rank in range(len(INTENTS))]
+    log = []
+    for _ in range(queries):
+        intent = rng.choices(INTENTS, weights)[0]
+        log.append(rng.choice(intent).replace("ORDER_ID", rng.choice(order_ids)))
+    return log
+
+async def replay(log):
+    from agent.runner import run_chat_turn
+    latencies = []
+    for message in log:
+        start = time.perf_counter()
+        await run_chat_turn(message, str(uuid.uuid4()))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.3, help="simulated LLM latency in seconds")
+    parser.add_argument("--products", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'responses.sqlite3')}"
+        os.environ["DATABASE_URL"] = url
+        from benchmarks.seed import seed_database
+        engine = seed_database(url, products=args.products, orders=200)
+        from sqlalchemy import text
+        with engine.connect() as conn:
+            order_ids = [row[0] for row in conn.execute(text("SELECT order_id FROM orders LIMIT 20"))]
+
+        import agent.index
+        import agent.runner
+        from agent.response_cache import invalidate_responses, response_cache
+        from benchmarks.fake_llm import ScriptedChatModel, shopper_responder
+        model = ScriptedChatModel(latency=args.latency, responder=shopper_responder)
+        agent.index.get_model = lambda: model
+        agent.index.initialize_agent()
+
+        log = build_log(random.Random(11), args.queries, order_ids)
+        print(f"{len(log)} queries, {len({m for m in log})} distinct strings\n")
+        print(f"{'cache':<8}{'p50 ms':>10}{'p95 ms':>10}{'total s':>10}{'LLM calls':>11}{'hit rate':>10}")
+        for enabled in (False, True):
+            agent.runner.RESPONSE_CACHE_ENABLED = enabled
+            invalidate_responses()
+            response_cache.hits = response_cache.misses = 0
+            model.calls = 0
+            latencies = asyncio.run(replay(log))
+            hit_rate = response_cache.stats()["hit_rate"] if enabled else 0.0
+            print(f"{'on' if enabled else 'off':<8}{statistics.median(latencies):>10.1f}"
+                  f"{percentile(latencies, 95):>10.1f}{sum(latencies) / 1000:>10.1f}{model.calls:>11}{hit_rate:>10.1%}")
+
+        personal = [key for key, _ in response_cache._data if "order" in key]
+        print(f"\ncached entries: {len(response_cache._data)}, order lookups cached: {len(personal)}")
+
+if __name__ == "__main__":
+    main()
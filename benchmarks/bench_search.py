@@ -0,0 +1,69 @@
+"""
+Token and latency comparison: full-catalog products_tool vs search_products.
+
+For each catalog size, seeds a SQLite file and reports, per call:
+- uncached: the original products_tool (ORM load + json.dumps(indent=2))
+- cached:   the snapshot served by CatalogCache
+- search:   CatalogIndex top-k search over the same snapshot
+
+    python -m benchmarks.bench_search --sizes 100 1000 10000
+"""
+import argparse
+import json
+import os
+import tempfile
+from sqlalchemy.orm import sessionmaker
+from benchmarks.seed import seed_database
+from benchmarks.util import approx_tokens, time_calls
+
+QUERIES = [
+    {"query": "black hoodie"},
+    {"query": "jersy", "size": "L"},
+    {"query": "", "category": "Shorts", "max_price": 600, "in_stock_only": True},
+    {"query": "vintage cap", "color": "navy"},
+    {"query": "oversized t-shirt", "min_price": 500, "max_price": 1000},
+]
+
+def bench_size(products: int, workdir: str):
+    from agent.catalog import CatalogCache, _load_products
+    from agent.catalog_search import CatalogIndex, format_results
+
+    engine = seed_database(f"sqlite:///{os.path.join(workdir, f'catalog_{products}.sqlite3')}", products=products, orders=0)
+    Session = sessionmaker(bind=engine)
+
+    def uncached():
+        with Session() as db:
+            return json.dumps(list(_load_products(db).values()), indent=2)
+
+    cache = CatalogCache(check_interval=60, session_factory=Session)
+    cache.get_json()
+    version, snapshot = cache.get_snapshot()
+    index = CatalogIndex(snapshot, version)
+    build_ms = time_calls(lambda: CatalogIndex(snapshot, version), repeat=3)
+
+    full = uncached()
+    rows = [
+        ("uncached", approx_tokens(full), time_calls(uncached, repeat=5)),
+        ("cached", approx_tokens(cache.get_json()), time_calls(cache.get_json)),
+    ]
+    search_outputs = [format_results(index.search(**q)) for q in QUERIES]
+    search_tokens = sum(approx_tokens(o) for o in search_outputs) // len(QUERIES)
+    search_ms = sum(time_calls(lambda q=q: format_results(index.search(**q))) for q in QUERIES) / len(QUERIES)
+    rows.append(("search", search_tokens, search_ms))
+
+    for name, tokens, ms in rows:
+        print(f"{products:>8}{name:>10}{tokens:>12}{ms:>12.2f}")
+    print(f"{products:>8}{'build':>10}{'':>12}{build_ms:>12.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    print(f"{'products':>8}{'tool':>10}{'tokens':>12}{'ms/call':>12}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for size in args.sizes:
+            bench_size(size, workdir)
+
+if __name__ == "__main__":
+    main()
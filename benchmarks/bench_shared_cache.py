@@ -0,0 +1,139 @@
+"""
+Database load and latency of the tool caches with several worker processes.
+
+Stampede: N worker processes (each with several threads) start at the same
+moment and call get_order_details, get_top_products and products_tool with
+the same arguments on a cold cache. Counted are the SELECTs every process
+sends to the database, with the shared tier off (every process loads for
+itself) and on (one process loads, the others read its result).
+
+Stale-while-revalidate: one process reads the same active order every 20 ms
+for a few seconds, with a 0.5 s TTL and a slow order query. Without a stale
+window every expiry puts the query on a read; with one, reads keep getting
+the previous answer while it is reloaded in the background.
+
+    python -m benchmarks.bench_shared_cache --workers 4 --threads 4 --db-latency 0.1
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+from benchmarks.util import percentile
+
+FILTERS = ["all", "thisMonth", "lastMonth", "thisYear"]
+
+def _count_selects():
+    from sqlalchemy import event
+    from config.db import engine
+    counts = {"selects": 0}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            counts["selects"] += 1
+    return counts
+
+def stampede_worker(barrier, order_ids, threads, results):
+    """One worker process: `threads` threads making the same tool calls."""
+    import threading
+    counts = _count_selects()
+    from agent.tools import get_order_details, get_top_products, products_tool
+
+    def calls():
+        for order_id in order_ids:
+            get_order_details.func(order_id)
+        for f in FILTERS:
+            get_top_products.func(f)
+        products_tool.func()
+
+    barrier.wait()
+    start = time.perf_counter()
+    pool = [threading.Thread(target=calls) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    results.put((counts["selects"], time.perf_counter() - start))
+
+def swr_worker(order_id, db_latency, seconds, results):
+    """Read one order every 20 ms and report each read's latency in ms."""
+    import agent.orders
+    import agent.tools  # noqa: F401 - registers every model, as in the app
+    load_order = agent.orders.load_order
+
+    def slow_load_order(db, order_id):
+        time.sleep(db_latency)
+        return load_order(db, order_id)
+    agent.orders.load_order = slow_load_order
+
+    agent.orders.get_order(order_id)  # warm
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        agent.orders.get_order(order_id)
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.02)
+    results.put(latencies)
+
+def run(ctx, target, args, processes, env):
+    os.environ.update(env)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=target, args=(*args, results)) for _ in range(processes)]
+    for p in procs:
+        p.start()
+    out = [results.get(timeout=600) for _ in procs]
+    for p in procs:
+        p.join()
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--orders", type=int, default=20, help="distinct orders looked up by every thread")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--db-latency", type=float, default=0.1, help="simulated order query time for the SWR run")
+    parser.add_argument("--seconds", type=float, default=4)
+    args = parser.parse_args()
+    ctx = multiprocessing.get_context("spawn")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'store.sqlite3')}"
+        # Settings are read at import time, so they must be in place first
+        env = {"DATABASE_URL": url, "CHAT_MEMORY_BACKEND": "bounded", "GOOGLE_API_KEY": "offline-benchmark",
+               "TOOL_CACHE_PATH": ""}
+        os.environ.update(env)
+        from sqlalchemy import text
+        from benchmarks.seed import seed_database
+        engine = seed_database(url, products=args.products, orders=5000)
+        with engine.connect() as conn:
+            order_ids = [r[0] for r in conn.execute(text("SELECT order_id FROM orders LIMIT :n"), {"n": args.orders})]
+            active = conn.execute(text("SELECT order_id FROM orders WHERE status = 'Pending' LIMIT 1")).scalar()
+        engine.dispose()
+        # Build the sales rollup up front, so the workers only measure the tool caches
+        from agent.top_sellers import sales_rollup
+        sales_rollup.ensure_fresh()
+
+        print(f"stampede: {args.workers} processes x {args.threads} threads, cold caches")
+        print(f"{'shared tier':<14}{'SELECTs':>9}{'slowest s':>11}  per process")
+        for label, path in (("off", ""), ("on", os.path.join(workdir, "tool-cache.sqlite3"))):
+            barrier = ctx.Barrier(args.workers)
+            out = run(ctx, stampede_worker, (barrier, order_ids, args.threads), args.workers,
+                      dict(env, TOOL_CACHE_PATH=path))
+            selects = [s for s, _ in out]
+            print(f"{label:<14}{sum(selects):>9}{max(e for _, e in out):>11.2f}  {' / '.join(map(str, selects))}")
+
+        print(f"\nstale-while-revalidate: reads of one active order, TTL 0.5 s, query {args.db_latency * 1000:.0f} ms")
+        print(f"{'stale window':<14}{'reads':>7}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}{'slow reads':>12}")
+        for stale in ("0", "30"):
+            latencies, = run(ctx, swr_worker, (active, args.db_latency, args.seconds), 1, dict(
+                env, TOOL_CACHE_PATH=os.path.join(workdir, f"swr-{stale}.sqlite3"),
+                ORDER_CACHE_ACTIVE_TTL="0.5", ORDER_CACHE_STALE_TTL=stale))
+            slow = sum(1 for ms in latencies if ms >= args.db_latency * 1000)
+            print(f"{stale + ' s':<14}{len(latencies):>7}{percentile(latencies, 50):>9.2f}"
+                  f"{percentile(latencies, 99):>9.2f}{max(latencies):>9.2f}{slow:>12}")
+
+if __name__ == "__main__":
+    main()
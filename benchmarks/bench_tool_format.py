@@ -0,0 +1,88 @@
+"""
+Bytes, approximate tokens and latency of verbose vs compact tool output.
+
+For products_tool (whole catalog) and get_order_details (one order) reports the
+output size, the render time, and the end-to-end time of a chat turn that
+calls the tool. The scripted model charges `--per-token` seconds of prompt
+processing per input token on top of `--latency`, so the turn time reflects
+how many tokens the tool output adds.
+
+    python -m benchmarks.bench_tool_format --products 1000 --per-token 0.00002
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from benchmarks.util import approx_tokens, time_calls
+
+def tool_responder(messages):
+    """Open with the tool the message names, then answer from its result."""
+    from langchain_core.messages import AIMessage, ToolMessage
+    from benchmarks.fake_llm import tool_call
+    last = messages[-1]
+    if isinstance(last, ToolMessage):
+        return AIMessage(content="<p>Done.</p>")
+    name, _, arg = last.content.partition(" ")
+    return tool_call(name, {"order_id": arg} if arg else {})
+
+def turn_ms(message: str, repeat: int) -> float:
+    from agent.runner import run_chat_turn
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        asyncio.run(run_chat_turn(message, str(uuid.uuid4())))
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.2, help="fixed LLM latency per call in seconds")
+    parser.add_argument("--per-token", type=float, default=0.00002, help="LLM seconds per input token")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'formats.sqlite3')}"
+        os.environ["DATABASE_URL"] = url
+        from benchmarks.seed import seed_database
+        engine = seed_database(url, products=args.products, orders=200)
+        from sqlalchemy import text
+        with engine.connect() as conn:
+            order_id = conn.execute(text(
+                "SELECT order_id FROM orderitems GROUP BY order_id ORDER BY COUNT(*) DESC LIMIT 1"
+            )).scalar()
+
+        import agent.index
+        import agent.runner
+        from agent.catalog import catalog_cache
+        from agent.orders import format_order_details, get_order
+        from agent.tool_format import format_catalog, format_order
+        from benchmarks.fake_llm import ScriptedChatModel
+        agent.runner.RESPONSE_CACHE_ENABLED = False
+        model = ScriptedChatModel(latency=args.latency, latency_per_token=args.per_token, responder=tool_responder)
+        agent.index.get_model = lambda: model
+        agent.index.initialize_agent()
+
+        products = catalog_cache.get_products()
+        order = get_order(order_id)["order"]
+        renderers = {
+            ("products_tool", "verbose"): lambda: json.dumps(products, indent=2),
+            ("products_tool", "compact"): lambda: format_catalog(products),
+            ("get_order_details", "verbose"): lambda: format_order_details(order),
+            ("get_order_details", "compact"): lambda: format_order(order),
+        }
+        messages = {"products_tool": "products_tool", "get_order_details": f"get_order_details {order_id}"}
+
+        print(f"{'tool':<20}{'format':<9}{'bytes':>10}{'tokens':>9}{'render ms':>11}{'turn ms':>10}")
+        for (tool, fmt), render in renderers.items():
+            output = render()
+            os.environ[f"TOOL_OUTPUT_FORMAT_{tool.upper()}"] = fmt
+            print(f"{tool:<20}{fmt:<9}{len(output.encode()):>10}{approx_tokens(output):>9}"
+                  f"{time_calls(render, 5):>11.2f}{turn_ms(messages[tool], args.repeat):>10.0f}")
+
+if __name__ == "__main__":
+    main()
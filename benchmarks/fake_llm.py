@@ -0,0 +1,175 @@
+import asyncio
+import random
+import re
+import time
+import uuid
+from typing import Callable, NamedTuple, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatResult
+from google.api_core.exceptions import ResourceExhausted, ServiceUnavailable
+from pydantic import PrivateAttr
+
+def default_responder(messages: list[BaseMessage]) -> AIMessage:
+    """Answer straight away, or summarize the last tool result if there is one."""
+    last = messages[-1]
+    if isinstance(last, ToolMessage):
+        return AIMessage(content=f"<p>Here is what I found: {len(str(last.content))} chars.</p>")
+    return AIMessage(content="<p>Hello from Ali!</p>")
+
+def tool_call(name: str, args: Optional[dict] = None) -> AIMessage:
+    """Build an AIMessage that asks the agent to run one tool."""
+    return AIMessage(
+        content="",
+        tool_calls=[{"name": name, "args": args or {}, "id": f"call_{uuid.uuid4().hex[:8]}"}]
+    )
+
+_ORDER_ID_RE = re.compile(r"[0-9a-f]{8}(?:-[0-9a-f]{4}){3}-[0-9a-f]{12}")
+
+def shopper_responder(messages: list[BaseMessage]) -> AIMessage:
+    """
+    Route a shopper message the way Gemini usually does: order IDs go to
+    get_order_details, best-seller questions to get_top_products, catalog
+    browsing to products_tool, greetings are answered directly and anything
+    else is a product search. Tool results are summarized in one line.
+    """
+    last = messages[-1]
+    if isinstance(last, ToolMessage):
+        return AIMessage(content=f"<p>{last.name}: {len(str(last.content))} chars of results.</p>")
+    text = last.content if isinstance(last, HumanMessage) else ""
+    lower = text.lower()
+    if order_id := _ORDER_ID_RE.search(lower):
+        return tool_call("get_order_details", {"order_id": order_id.group(0)})
+    if "order" in lower or any(word in lower for word in ("status", "total", "payment")):
+        # Like Gemini, reuse an order ID given earlier in the conversation
+        earlier = [i for m in messages[:-1] for i in _ORDER_ID_RE.findall(str(m.content).lower())]
+        if earlier or "order" in lower:
+            return tool_call("get_order_details", {"order_id": earlier[-1] if earlier else ""})
+    if "best" in lower or "top" in lower:
+        return tool_call("get_top_products", {"filter": "thisMonth" if "month" in lower else "all"})
+    if "catalog" in lower:
+        return tool_call("products_tool")
+    if lower.strip(" !.?") in ("hi", "hello", "thanks", "thank you"):
+        return AIMessage(content="<p>Hello from Ali! How can I help?</p>")
+    return tool_call("search_products", {"query": text})
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic offline stand-in for the Gemini chat model.
+    `latency` simulates the provider round trip: the sync path blocks with time.sleep,
+    the async path yields with asyncio.sleep, like a real HTTP client would.
+    `latency_per_token` adds prompt processing time for each (approximate) input token.
+    `prompt_tokens` records the approximate input tokens of every call.
+    `cached_content` names a context cache (see fake_prompt_cache) holding
+    `cached_tokens` of prefix: like Gemini, a call must then not send a system
+    message, the cached tokens cost no prompt processing time, and the usage
+    reports them as cache reads.
+    `capacity` is how many async calls the simulated provider serves at once
+    (0: no limit); the others queue, and one that has waited `capacity_timeout`
+    seconds fails with ResourceExhausted, like a rate-limited Gemini project.
+    Faults for testing resilience: `jitter` adds up to that many seconds to
+    each call, `failure_rate` of the calls fail with ServiceUnavailable after
+    the usual latency, and `stall_rate` of them hang for `stall` seconds
+    first. `seed` makes the draws repeatable.
+    """
+    latency: float = 0.0
+    latency_per_token: float = 0.0
+    responder: Callable[[list[BaseMessage]], AIMessage] = default_responder
+    calls: int = 0
+    prompt_tokens: list = []
+    cached_content: Optional[str] = None
+    cached_tokens: int = 0
+    capacity: int = 0
+    capacity_timeout: float = 0.0
+    jitter: float = 0.0
+    failure_rate: float = 0.0
+    stall_rate: float = 0.0
+    stall: float = 30.0
+    seed: Optional[int] = None
+    _slots: Optional[asyncio.Semaphore] = PrivateAttr(default=None)
+    _rng: Optional[random.Random] = PrivateAttr(default=None)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _delay(self, messages: list[BaseMessage]) -> float:
+        delay = self.latency
+        if self.latency_per_token:
+            chars = sum(len(str(m.content)) for m in messages)
+            delay += self.latency_per_token * ((chars + 3) // 4)
+        if self.jitter or self.stall_rate:
+            if self._rng is None:
+                self._rng = random.Random(self.seed)
+            delay += self._rng.uniform(0, self.jitter)
+            if self._rng.random() < self.stall_rate:
+                delay += self.stall
+        return delay
+
+    def _fail(self) -> bool:
+        if not self.failure_rate:
+            return False
+        if self._rng is None:
+            self._rng = random.Random(self.seed)
+        return self._rng.random() < self.failure_rate
+
+    def _respond(self, messages: list[BaseMessage]) -> ChatResult:
+        if self._fail():
+            raise ServiceUnavailable("503 The model is overloaded. Please try again later.")
+        if self.cached_content and any(isinstance(m, SystemMessage) for m in messages):
+            raise ValueError("CachedContent can not be used with a system instruction in the request")
+        self.calls += 1
+        sent = count_tokens_approximately(messages)
+        self.prompt_tokens.append(sent)
+        message = self.responder(messages)
+        message.usage_metadata = {
+            "input_tokens": sent + self.cached_tokens,
+            "output_tokens": (len(str(message.content)) + 3) // 4,
+            "total_tokens": sent + self.cached_tokens + (len(str(message.content)) + 3) // 4,
+            "input_token_details": {"cache_read": self.cached_tokens},
+        }
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if delay := self._delay(messages):
+            time.sleep(delay)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if not self.capacity:
+            if delay := self._delay(messages):
+                await asyncio.sleep(delay)
+            return self._respond(messages)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.capacity)
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.capacity_timeout or None)
+        except asyncio.TimeoutError:
+            raise ResourceExhausted("429 Resource has been exhausted (e.g. check quota).") from None
+        try:
+            if delay := self._delay(messages):
+                await asyncio.sleep(delay)
+            return self._respond(messages)
+        finally:
+            self._slots.release()
+
+class FakeCache(NamedTuple):
+    name: str
+    model: ScriptedChatModel
+    expires_at: float
+    renew: Callable[[], float]
+    missing_errors: tuple = ()  # the scripted cache never goes missing
+
+def fake_prompt_cache(model, system_message, tools, ttl) -> FakeCache:
+    """
+    Provider cache factory for ScriptedChatModel, to register in
+    agent.prompt_cache.PROVIDER_CACHES under "scripted-fake".
+    """
+    tokens = count_tokens_approximately([system_message])
+    cached = model.model_copy(update={"cached_content": f"cachedContents/{uuid.uuid4().hex[:12]}",
+                                      "cached_tokens": tokens})
+    return FakeCache(cached.cached_content, cached, time.time() + ttl, lambda: time.time() + ttl)
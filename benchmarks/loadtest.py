@@ -0,0 +1,186 @@
+"""
+Offline load test for /api/chat with a scripted model and a seeded SQLite store.
+
+Replaces agent/config.py::get_model with ScriptedChatModel, points config/db.py
+at a generated dataset, and drives the real app in-process with scripted
+multi-turn conversations at each requested concurrency (maximum requests in
+flight). Reports p50/p95/p99 latency, throughput, errors and memory.
+
+    python -m benchmarks.loadtest --products 2000 --orders 20000 --concurrency 1 8 32
+    python -m benchmarks.loadtest --output baseline.json
+    python -m benchmarks.loadtest --baseline baseline.json --tolerance 0.2
+
+With --baseline the exit status is 1 when p95 latency or throughput at any
+concurrency is worse than the baseline by more than the tolerance.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from benchmarks.util import peak_rss_mb, percentile, rss_mb
+
+# (weight, turns); placeholders are filled from the seeded data
+CONVERSATIONS = [
+    (5, ["hi", "show me {category}", "do you have {product} in {size}?"]),
+    (4, ["what's your best seller this month?", "show me {category} under 800"]),
+    (4, ["where is my order {order_id}?", "what items are in order {order_id}?"]),
+    (3, ["what payment methods do you accept?", "how long does shipping take?"]),
+    (3, ["{color} {category} please", "any {size} left?", "thanks"]),
+    (1, ["show me your full catalog"]),
+]
+
+def build_conversations(rng, count, data):
+    """`count` scripted conversations drawn by weight from CONVERSATIONS."""
+    weights = [weight for weight, _ in CONVERSATIONS]
+    conversations = []
+    for _ in range(count):
+        _, turns = rng.choices(CONVERSATIONS, weights)[0]
+        values = {key: rng.choice(options) for key, options in data.items()}
+        conversations.append([turn.format(**values) for turn in turns])
+    return conversations
+
+def seeded_data(engine):
+    """Real product names, categories and order ids to fill conversation templates."""
+    from sqlalchemy import text
+    with engine.connect() as conn:
+        products = [r[0] for r in conn.execute(text("SELECT product_name FROM products LIMIT 200"))]
+        categories = [r[0] for r in conn.execute(text("SELECT DISTINCT category FROM products"))]
+        order_ids = [r[0] for r in conn.execute(text("SELECT order_id FROM orders LIMIT 200"))]
+    from benchmarks.seed import COLORS, SIZES
+    return {"product": products, "category": [c.lower() for c in categories], "order_id": order_ids,
+            "size": SIZES, "color": [c.lower() for c in COLORS]}
+
+async def run_load(app, conversations, concurrency):
+    """Run every conversation, at most `concurrency` requests in flight; one thread per conversation."""
+    import httpx
+    queue = asyncio.Queue()
+    for conversation in conversations:
+        queue.put_nowait(conversation)
+    latencies, errors = [], 0
+
+    async def user(client):
+        nonlocal errors
+        while not queue.empty():
+            turns = queue.get_nowait()
+            thread_id = str(uuid.uuid4())
+            for message in turns:
+                start = time.perf_counter()
+                r = await client.post("/api/chat", json={"message": message, "thread_id": thread_id})
+                latencies.append((time.perf_counter() - start) * 1000)
+                if r.status_code != 200:
+                    errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(user(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+async def run_all(app, conversations, levels):
+    from agent.response_cache import invalidate_responses
+    results = []
+    # Runs the app's startup/shutdown hooks, whatever they are
+    async with app.router.lifespan_context(app):
+        for concurrency in levels:
+            # Every level starts cold, so levels stay comparable
+            invalidate_responses()
+            latencies, errors, elapsed = await run_load(app, conversations, concurrency)
+            results.append({
+                "concurrency": concurrency,
+                "requests": len(latencies),
+                "errors": errors,
+                "rps": round(len(latencies) / elapsed, 2),
+                "p50_ms": round(percentile(latencies, 50), 1),
+                "p95_ms": round(percentile(latencies, 95), 1),
+                "p99_ms": round(percentile(latencies, 99), 1),
+                "rss_mb": round(rss_mb(), 1),
+            })
+    return results
+
+def regressions(results, baseline, tolerance):
+    """Human-readable list of results that are worse than the baseline by more than `tolerance`."""
+    previous = {r["concurrency"]: r for r in baseline["results"]}
+    problems = []
+    for r in results:
+        base = previous.get(r["concurrency"])
+        if base is None:
+            continue
+        if r["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            problems.append(f"c={r['concurrency']}: p95 {r['p95_ms']} ms vs baseline {base['p95_ms']} ms")
+        if r["rps"] < base["rps"] * (1 - tolerance):
+            problems.append(f"c={r['concurrency']}: {r['rps']} req/s vs baseline {base['rps']} req/s")
+        if r["errors"] > base["errors"]:
+            problems.append(f"c={r['concurrency']}: {r['errors']} errors vs baseline {base['errors']}")
+    return problems
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--variants-per-product", type=int, default=None)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--max-items", type=int, default=4, help="maximum order items per order")
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--conversations", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--latency", type=float, default=0.2, help="fixed LLM latency per call in seconds")
+    parser.add_argument("--per-token", type=float, default=0.0, help="LLM seconds per input token")
+    parser.add_argument("--no-fast-paths", action="store_true", help="disable the FAQ fast path and response cache")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="compare against a JSON file written with --output")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Settings are read at import time, so they must be in place first
+        url = f"sqlite:///{os.path.join(workdir, 'loadtest.sqlite3')}"
+        os.environ["DATABASE_URL"] = url
+        os.environ.setdefault("CHAT_MEMORY_BACKEND", "bounded")
+        if args.no_fast_paths:
+            os.environ["FAQ_FAST_PATH"] = "0"
+            os.environ["RESPONSE_CACHE"] = "0"
+
+        from benchmarks.seed import seed_database
+        seed_start = time.perf_counter()
+        engine = seed_database(url, products=args.products, orders=args.orders, customers=args.customers,
+                               seed=args.seed, variants_per_product=args.variants_per_product,
+                               max_items=args.max_items)
+        print(f"seeded {args.products} products, {args.orders} orders in {time.perf_counter() - seed_start:.1f}s")
+
+        import agent.config
+        import agent.index
+        from benchmarks.fake_llm import ScriptedChatModel, shopper_responder
+        model = ScriptedChatModel(latency=args.latency, latency_per_token=args.per_token, responder=shopper_responder)
+        agent.config.get_model = lambda: model
+        agent.index.get_model = agent.config.get_model
+        from app import app
+
+        conversations = build_conversations(random.Random(args.seed), args.conversations, seeded_data(engine))
+        rss_before = rss_mb()
+        results = asyncio.run(run_all(app, conversations, args.concurrency))
+
+    print(f"\n{'conc':>5}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'rss MB':>9}")
+    for r in results:
+        print(f"{r['concurrency']:>5}{r['requests']:>10}{r['errors']:>8}{r['rps']:>9.2f}"
+              f"{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}{r['rss_mb']:>9.1f}")
+    print(f"\nLLM calls: {model.calls}, rss before load: {rss_before:.1f} MB, peak rss: {peak_rss_mb():.1f} MB")
+
+    report = {"config": vars(args), "results": results, "llm_calls": model.calls, "peak_rss_mb": round(peak_rss_mb(), 1)}
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = regressions(results, json.load(f), args.tolerance)
+        for problem in problems:
+            print("REGRESSION", problem)
+        sys.exit(1 if problems else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""
+Generate a deterministic store dataset for offline benchmarks.
+
+    python -m benchmarks.seed --url sqlite:///bench.sqlite3 --products 1000 --orders 20000
+"""
+import argparse
+import random
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert
+from config.db import Base
+from models.Customer import Customer
+from models.Order import Order, OrderStatus, PaymentMethod
+from models.OrderAddress import OrderAddress
+from models.OrderItem import OrderItem
+from models.Product import Product, ProductStatus
+from models.Thumbnail import Thumbnail
+from models.Variant import Variant
+
+CATEGORIES = ["Hoodies", "T-Shirts", "Jerseys", "Shorts", "Joggers", "Jackets", "Caps", "Socks"]
+ADJECTIVES = ["Classic", "Street", "Court", "Premium", "Vintage", "Essential", "Oversized", "Drift",
+              "Baseline", "Crossover", "Fadeaway", "Alley", "Rebound", "Dunk", "Hustle", "Clutch"]
+COLORS = ["Black", "White", "Navy", "Red", "Gray", "Olive", "Beige", "Royal Blue", "Maroon", "Pink"]
+SIZES = ["XS", "S", "M", "L", "XL", "XXL"]
+CITIES = [("Quezon City", "Metro Manila"), ("Makati", "Metro Manila"), ("Baguio", "Benguet"),
+          ("Angeles", "Pampanga"), ("Batangas City", "Batangas"), ("Lucena", "Quezon")]
+STATUS_WEIGHTS = {
+    OrderStatus.Received: 40, OrderStatus.Delivered: 20, OrderStatus.Shipped: 8, OrderStatus.Confirmed: 6,
+    OrderStatus.Pending: 10, OrderStatus.Cancelled: 8, OrderStatus.Rejected: 4, OrderStatus.Failed: 4,
+}
+
+def make_catalog(rng, products, variants_per_product=None):
+    """
+    Product, variant and thumbnail rows for `products` products. Each product
+    gets 2-15 variants, or exactly `variants_per_product` (up to 60) when given.
+    """
+    product_rows, variant_rows, thumbnail_rows = [], [], []
+    variant_id = 1
+    for product_id in range(1, products + 1):
+        category = CATEGORIES[product_id % len(CATEGORIES)]
+        name = f"Ballin {rng.choice(ADJECTIVES)} {category[:-1] if category.endswith('s') else category} {product_id}"
+        product_rows.append({
+            "id": product_id,
+            "product_name": name,
+            "description": f"{name} from the Ballin Wear {category.lower()} line.",
+            "category": category,
+            "status": ProductStatus.Deleted if rng.random() < 0.05 else ProductStatus.Available,
+        })
+        price = float(rng.choice([399, 499, 599, 699, 799, 899, 999, 1299, 1499, 1999]))
+        if variants_per_product is None:
+            combos = [(color, size) for color in rng.sample(COLORS, rng.randint(1, 3))
+                      for size in rng.sample(SIZES, rng.randint(2, 5))]
+        else:
+            combos = rng.sample([(color, size) for color in COLORS for size in SIZES],
+                                min(variants_per_product, len(COLORS) * len(SIZES)))
+        for color, size in combos:
+            variant_rows.append({
+                "id": variant_id,
+                "product_id": product_id,
+                "sku": f"BW-{product_id}-{color[:3].upper()}-{size}",
+                "price": price,
+                "stock": rng.choice([0, 0, 3, 5, 10, 25, 50]),
+                "size": size,
+                "color": color,
+            })
+            variant_id += 1
+        thumbnail_rows.append({
+            "product_id": product_id,
+            "thumbnailUrl": f"https://res.cloudinary.com/ballin/image/upload/products/{product_id}.jpg",
+            "thumbnailPublicId": f"products/{product_id}",
+        })
+    return product_rows, variant_rows, thumbnail_rows
+
+def make_orders(rng, orders, variants, customers, now, max_items=4):
+    """Order, order item (1 to `max_items` each) and address rows spread over the last two years."""
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    order_rows, item_rows, address_rows = [], [], []
+    for _ in range(orders):
+        order_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        customer_id = rng.randint(1, customers)
+        subtotal = 0.0
+        for variant in rng.sample(variants, rng.randint(1, max_items)):
+            quantity = rng.randint(1, 3)
+            total = variant["price"] * quantity
+            subtotal += total
+            item_rows.append({
+                "order_id": order_id,
+                "product_id": variant["product_id"],
+                "size": variant["size"],
+                "color": variant["color"],
+                "price": variant["price"],
+                "quantity": quantity,
+                "total": total,
+            })
+        status = rng.choices(statuses, weights)[0]
+        order_rows.append({
+            "order_id": order_id,
+            "customer_id": customer_id,
+            "status": status,
+            "payment_method": rng.choice(list(PaymentMethod)),
+            "subtotal": subtotal,
+            "shipping_fee": 0.0,
+            "total": subtotal,
+            "order_date": now - timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60)),
+            "cancellation_reason": "Changed my mind" if status == OrderStatus.Cancelled else None,
+        })
+        city, province = rng.choice(CITIES)
+        address_rows.append({
+            "order_id": order_id,
+            "fullname": f"Customer {customer_id}",
+            "address_line_1": f"{rng.randint(1, 999)} Rizal St.",
+            "address_line_2": f"Barangay {rng.randint(1, 200)}",
+            "admin_area_1": province,
+            "admin_area_2": city,
+            "postal_code": f"{rng.randint(1000, 4999)}",
+            "phone": f"09{rng.randint(100000000, 999999999)}",
+        })
+    return order_rows, item_rows, address_rows
+
+def seed_database(url, products=1000, orders=5000, customers=500, seed=42, now=None,
+                  variants_per_product=None, max_items=4):
+    """Create the store tables at `url` and fill them; returns the engine."""
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    product_rows, variant_rows, thumbnail_rows = make_catalog(rng, products, variants_per_product)
+    customer_rows = [
+        {"id": i, "firstname": f"Juan{i}", "lastname": "Dela Cruz", "email": f"juan{i}@example.com", "password": "x"}
+        for i in range(1, customers + 1)
+    ]
+    order_rows, item_rows, address_rows = make_orders(rng, orders, variant_rows, customers, now, max_items)
+
+    with engine.begin() as conn:
+        for model, rows in ((Product, product_rows), (Variant, variant_rows), (Thumbnail, thumbnail_rows),
+                            (Customer, customer_rows), (Order, order_rows), (OrderItem, item_rows),
+                            (OrderAddress, address_rows)):
+            for start in range(0, len(rows), 10000):
+                conn.execute(insert(model), rows[start:start + 10000])
+    return engine
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite:///bench.sqlite3")
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--customers", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--variants-per-product", type=int, default=None)
+    parser.add_argument("--max-items", type=int, default=4, help="maximum order items per order")
+    args = parser.parse_args()
+    seed_database(args.url, args.products, args.orders, args.customers, args.seed,
+                  variants_per_product=args.variants_per_product, max_items=args.max_items)
+    print(f"Seeded {args.url}: {args.products} products, {args.orders} orders")
+
+if __name__ == "__main__":
+    main()
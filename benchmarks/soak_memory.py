@@ -0,0 +1,55 @@
+"""
+Soak test for conversation memory.
+
+Runs many short conversations (each on a fresh thread_id, like /api/chat does
+when the client sends none) and prints resident memory as it goes. With the
+bounded checkpointer RSS levels off; with the plain MemorySaver it keeps growing.
+
+    python -m benchmarks.soak_memory --backend bounded --turns 20000
+    python -m benchmarks.soak_memory --backend memory --turns 20000
+"""
+import argparse
+import asyncio
+import os
+import uuid
+from langchain_core.messages import AIMessage
+from benchmarks.util import rss_mb
+
+async def soak(turns: int, turns_per_thread: int, report_every: int):
+    from agent.index import get_memory_stats
+    from agent.runner import run_chat_turn
+
+    thread_id = None
+    for i in range(1, turns + 1):
+        if (i - 1) % turns_per_thread == 0:
+            thread_id = str(uuid.uuid4())
+        await run_chat_turn(f"question {i}", thread_id)
+        if i % report_every == 0:
+            stats = get_memory_stats()
+            print(f"{i:>8}{rss_mb():>10.1f}{stats.get('threads', '-'):>10}{stats.get('approx_bytes', '-'):>14}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", default="bounded", help="CHAT_MEMORY_BACKEND to soak")
+    parser.add_argument("--turns", type=int, default=20000)
+    parser.add_argument("--turns-per-thread", type=int, default=3)
+    parser.add_argument("--report-every", type=int, default=1000)
+    parser.add_argument("--max-threads", type=int, default=500)
+    args = parser.parse_args()
+
+    # Settings are read at import time, so they must be in place first
+    os.environ["CHAT_MEMORY_BACKEND"] = args.backend
+    os.environ["CHAT_MEMORY_MAX_THREADS"] = str(args.max_threads)
+
+    import agent.index
+    from benchmarks.fake_llm import ScriptedChatModel
+
+    reply = "<div className=\"mt-10\">" + "<p>Ballin Wear hoodie, sizes S-XL.</p>" * 40 + "</div>"
+    agent.index.get_model = lambda: ScriptedChatModel(responder=lambda messages: AIMessage(content=reply))
+    agent.index.initialize_agent()
+
+    print(f"{'turns':>8}{'rss_mb':>10}{'threads':>10}{'approx_bytes':>14}")
+    asyncio.run(soak(args.turns, args.turns_per_thread, args.report_every))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+import resource
+import statistics
+import time
+
+def approx_tokens(text: str) -> int:
+    """Rough Gemini token count: about four characters per token."""
+    return (len(text) + 3) // 4
+
+def time_calls(fn, repeat: int = 20) -> float:
+    """Median wall time of `fn()` in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+def percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+def rss_mb() -> float:
+    """Current resident set size, falling back to the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return peak_rss_mb()
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
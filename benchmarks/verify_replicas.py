@@ -0,0 +1,113 @@
+"""
+Verify read-replica routing with SQLite files standing in for the primary and two replicas.
+
+The replicas are copies of the seeded primary; rows inserted into the primary
+afterwards play the part of replication lag. Checks that catalog and order
+reads go to the replicas, that recent or missing orders are read from the
+primary, that a broken replica is taken out of rotation with reads falling
+back, and that least-busy selection avoids a replica that is in use.
+
+    python -m benchmarks.verify_replicas
+"""
+import os
+import shutil
+import sys
+import tempfile
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert, text
+
+def count_statements(engines):
+    """name -> number of SELECTs run on that engine."""
+    counts = Counter()
+    for name, engine in engines.items():
+        def count(conn, cursor, statement, parameters, context, executemany, name=name):
+            if statement.lstrip().upper().startswith("SELECT"):
+                counts[name] += 1
+        event.listen(engine, "before_cursor_execute", count)
+    return counts
+
+def check(label, ok):
+    print(f"{'OK' if ok else 'FAIL':<6}{label}")
+    return ok
+
+def insert_order(engine, order_date):
+    """Write an order to the primary only, like a checkout the replicas have not seen yet."""
+    from models.Order import Order, OrderStatus, PaymentMethod
+    order_id = str(uuid.uuid4())
+    with engine.begin() as conn:
+        conn.execute(insert(Order), [{
+            "order_id": order_id, "customer_id": 1, "status": OrderStatus.Pending,
+            "payment_method": PaymentMethod.COD,
+            "subtotal": 0.0, "shipping_fee": 0.0, "total": 0.0, "order_date": order_date,
+        }])
+    return order_id
+
+def main():
+    workdir = tempfile.mkdtemp()
+    try:
+        primary = os.path.join(workdir, "primary.sqlite3")
+        replicas = [os.path.join(workdir, f"replica{i}.sqlite3") for i in (1, 2)]
+        os.environ["DATABASE_URL"] = f"sqlite:///{primary}"
+        os.environ["DB_REPLICA_URLS"] = ",".join(f"sqlite:///{path}" for path in replicas)
+        os.environ["DB_REPLICA_STRATEGY"] = "round_robin"
+
+        from benchmarks.seed import seed_database
+        seed_database(os.environ["DATABASE_URL"], products=200, orders=500).dispose()
+        for path in replicas:
+            shutil.copy(primary, path)
+
+        from agent.catalog import catalog_cache
+        from agent.orders import invalidate_order
+        from agent.tools import get_order_details, search_products
+        from config.db import engine
+        from config.replicas import ReplicaRouter, replica_router
+        counts = count_statements({"primary": engine, **{r.name: r.engine for r in replica_router.replicas}})
+
+        ok = True
+        catalog_cache.get_products()
+        search_products.func(query="hoodie")
+        ok &= check(f"catalog reads on replicas {dict(counts)}", counts["primary"] == 0 and counts["replica1"] > 0)
+
+        with engine.connect() as conn:
+            old_ids = [r[0] for r in conn.execute(text(
+                "SELECT order_id FROM orders WHERE order_date < :cutoff LIMIT 4"
+            ), {"cutoff": datetime.utcnow() - timedelta(days=2)})]
+        counts.clear()
+        for order_id in old_ids:
+            ok &= check(f"old order {order_id[:8]} found", "No order found" not in get_order_details.func(order_id))
+        ok &= check(f"old orders spread over replicas, not primary {dict(counts)}",
+                    counts["primary"] == 0 and counts["replica1"] > 0 and counts["replica2"] > 0)
+
+        recent = insert_order(engine, datetime.utcnow())
+        lagging = insert_order(engine, datetime.utcnow() - timedelta(days=3))
+        counts.clear()
+        ok &= check("recent order (not on replicas) found via primary",
+                    "No order found" not in get_order_details.func(recent) and counts["primary"] > 0)
+        counts.clear()
+        ok &= check("older order missing on replica found via primary",
+                    "No order found" not in get_order_details.func(lagging) and counts["primary"] > 0)
+        ok &= check("unknown order reported missing", "No order found" in get_order_details.func(str(uuid.uuid4())))
+
+        broken = ReplicaRouter([f"sqlite:///{replicas[0]}", f"sqlite:///{os.path.join(workdir, 'missing', 'x.sqlite3')}"],
+                               strategy="round_robin", retry_after=60)
+        results = []
+        for _ in range(4):
+            with broken.read_scope() as db:
+                results.append(db.execute(text("SELECT COUNT(*) FROM products")).scalar())
+        stats = broken.stats()["replicas"]
+        ok &= check(f"broken replica marked down, reads served {results}",
+                    all(results) and not stats[1]["healthy"] and stats[1]["failures"] == 1)
+
+        busy = ReplicaRouter([f"sqlite:///{path}" for path in replicas], strategy="least_busy")
+        with busy.replicas[0].engine.connect():
+            ok &= check("least_busy skips the replica in use", busy.pick() is busy.replicas[1])
+
+        invalidate_order()
+        sys.exit(0 if ok else 1)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Verify the top-sellers rollup against the reference aggregate on a seeded SQLite dataset.
+
+Builds the rollup, compares every filter, applies order changes (new
+deliveries, cancellations, brand new orders), refreshes incrementally and
+compares again. Also times the legacy four-way join, the reference query and
+the rollup read.
+
+    python -m benchmarks.verify_top_sellers --products 1000 --orders 50000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import desc, func, insert, select, update
+from sqlalchemy.orm import sessionmaker
+from benchmarks.seed import make_orders, seed_database
+from benchmarks.util import time_calls
+
+FILTERS = ["all", "thisMonth", "lastMonth", "thisYear"]
+
+def legacy_top_products(db):
+    """The pre-rollup query: the Variant outer join multiplies rows before SUM."""
+    from models.Order import Order
+    from models.OrderItem import OrderItem
+    from models.Product import Product
+    from models.Thumbnail import Thumbnail
+    from models.Variant import Variant
+    return (
+        db.query(OrderItem.product_id, Product, func.sum(OrderItem.quantity).label("total_sold"))
+        .join(Order, Order.order_id == OrderItem.order_id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .outerjoin(Variant, Variant.product_id == Product.id)
+        .outerjoin(Thumbnail, Thumbnail.product_id == Product.id)
+        .filter(Order.status.in_(["Delivered", "Received"]))
+        .filter(Product.status == "Available")
+        .group_by(OrderItem.product_id, Product.id)
+        .order_by(desc("total_sold"))
+        .limit(10)
+        .all()
+    )
+
+def compare(Session, rollup, now, label):
+    from agent.top_sellers import reference_top_products
+    ok = True
+    with Session() as db:
+        for f in FILTERS:
+            expected = [(r.id, int(r.total_sold)) for r in reference_top_products(db, f, 10, now)]
+            actual = [(r.id, int(r.total_sold)) for r in rollup.top_products(db, f, 10, now)]
+            match = expected == actual
+            ok &= match
+            print(f"{label:<12}{f:<12}{'OK' if match else 'MISMATCH'}")
+            if not match:
+                print(f"  expected {expected}\n  actual   {actual}")
+    return ok
+
+def mutate_orders(Session, rng, now):
+    """Deliver some pending orders, cancel some delivered ones, and add new orders."""
+    from models.Order import Order, OrderStatus
+    from models.OrderAddress import OrderAddress
+    from models.OrderItem import OrderItem
+    from models.Variant import Variant
+    with Session() as db:
+        pending = db.execute(select(Order.order_id).where(Order.status == OrderStatus.Pending).limit(200)).scalars().all()
+        delivered = db.execute(select(Order.order_id).where(Order.status == OrderStatus.Delivered).limit(100)).scalars().all()
+        db.execute(update(Order).where(Order.order_id.in_(pending)).values(status=OrderStatus.Delivered))
+        db.execute(update(Order).where(Order.order_id.in_(delivered)).values(status=OrderStatus.Cancelled))
+
+        variants = [dict(r._mapping) for r in db.execute(select(Variant.product_id, Variant.size, Variant.color, Variant.price))]
+        orders, items, addresses = make_orders(rng, 500, variants, 100, now)
+        for order in orders:
+            order["status"] = OrderStatus.Received
+            order["order_date"] = now - timedelta(days=rng.randint(0, 40))
+        db.execute(insert(Order), orders)
+        db.execute(insert(OrderItem), items)
+        db.execute(insert(OrderAddress), addresses)
+        db.commit()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=50000)
+    args = parser.parse_args()
+
+    from agent.top_sellers import SalesRollup, reference_top_products, MANILA
+    now_utc = datetime.utcnow()
+    now = datetime.now(MANILA)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = seed_database(f"sqlite:///{os.path.join(workdir, 'sales.sqlite3')}",
+                               products=args.products, orders=args.orders, now=now_utc)
+        Session = sessionmaker(bind=engine)
+        rollup = SalesRollup(refresh_interval=0, session_factory=Session)
+
+        with Session() as db:
+            build_ms = time_calls(lambda: rollup.refresh(db), repeat=1)
+        ok = compare(Session, rollup, now, "initial")
+
+        mutate_orders(Session, random.Random(7), now_utc)
+        with Session() as db:
+            result = {}
+            refresh_ms = time_calls(lambda: result.update(rollup.refresh(db)), repeat=1)
+        ok &= compare(Session, rollup, now, "incremental")
+
+        with Session() as db:
+            legacy = legacy_top_products(db)
+            reference = reference_top_products(db, "all", 10, now)
+            print(f"\nlegacy 'all' top seller total: {int(legacy[0].total_sold)} "
+                  f"(reference: {int(reference[0].total_sold)})")
+            print(f"rollup build: {build_ms:.1f} ms, incremental refresh {result}: {refresh_ms:.1f} ms")
+            print(f"legacy 'all' query: {time_calls(lambda: legacy_top_products(db), 3):.2f} ms")
+            for f in FILTERS:
+                print(f"{f:<10} reference {time_calls(lambda: reference_top_products(db, f, 10, now), 3):8.2f} ms"
+                      f"  rollup {time_calls(lambda: rollup.top_products(db, f, 10, now), 10):8.2f} ms")
+
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
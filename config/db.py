@@ -1,7 +1,11 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event, make_url, text
 from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import DisconnectionError, SQLAlchemyError
+from contextlib import contextmanager
+import contextvars
 import os
+import threading
+import time
 
 # Load environment variables
 DB_USER = os.getenv("DB_USER", "sgroot")
@@ -10,19 +14,65 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = int(os.getenv("DB_PORT", "3306"))
 DB_NAME = os.getenv("DB_NAME", "ballin_wear")
 
-# SQLAlchemy database URL
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-print(SQLALCHEMY_DATABASE_URL)
-
-# Create engine with SSL
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=180,
-    connect_args={
-        "ssl": {"ssl_ca": None, "check_hostname": True}  
+# SQLAlchemy database URL (DATABASE_URL overrides it, e.g. a local SQLite file for benchmarks)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Pool sizing: each worker holds up to DB_POOL_SIZE + DB_MAX_OVERFLOW connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "180"))
+# Liveness: ping only connections that sat idle in the pool longer than this
+# (seconds); DB_POOL_PRE_PING=1 pings on every checkout instead.
+DB_POOL_PING_IDLE = float(os.getenv("DB_POOL_PING_IDLE", "30"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0") == "1"
+
+def _on_checkin(dbapi_connection, connection_record):
+    connection_record.info["checked_in_at"] = time.monotonic()
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    # A connection used moments ago is almost certainly alive; only ones that sat
+    # idle (where MySQL or a proxy may have dropped them) pay for a round trip.
+    checked_in_at = connection_record.info.get("checked_in_at")
+    if DB_POOL_PRE_PING or checked_in_at is None or time.monotonic() - checked_in_at < DB_POOL_PING_IDLE:
+        return
+    try:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("SELECT 1")
+        cursor.close()
+    except Exception as e:
+        # The pool discards this connection and checks out a fresh one
+        raise DisconnectionError(str(e)) from e
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and (
+        parsed.database in (None, "", ":memory:") or parsed.query.get("mode") == "memory"
+    )
+
+def create_store_engine(url: str):
+    """Engine with the store's pool settings and idle liveness check (primary or replica)."""
+    # In-memory SQLite gets a single-connection pool that takes no sizing arguments
+    pool_args = {} if _is_memory_sqlite(url) else {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
     }
-)
+    store_engine = create_engine(
+        url,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        pool_recycle=DB_POOL_RECYCLE,
+        **pool_args,
+        connect_args={
+            "ssl": {"ssl_ca": None, "check_hostname": True}  
+        } if url.startswith("mysql") else {}
+    )
+    event.listen(store_engine, "checkin", _on_checkin)
+    event.listen(store_engine, "checkout", _on_checkout)
+    return store_engine
+
+# Create engine with SSL. Connections are opened lazily, on first use.
+engine = create_store_engine(SQLALCHEMY_DATABASE_URL)
 
 # Create session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -30,10 +80,63 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Base class for models
 Base = declarative_base()
 
-# Test connection
-try:
-    with engine.connect() as connection:
-        connection.execute(text("SELECT 1"))
-        print("✅ Connected to MySQL successfully!")
-except SQLAlchemyError as e:
-    print("❌ Failed to connect to the database:", e)
+class _TurnSession:
+    """One Session per database (primary, each replica) shared by every tool call of a chat turn."""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.sessions = {}
+        self.uses = 0
+
+_turn_session = contextvars.ContextVar("turn_session", default=None)
+
+@contextmanager
+def turn_session():
+    """
+    Scope a chat turn: session_scope() calls inside it share one Session. The
+    context is copied into tool threads, so tools running there share it too.
+    """
+    turn = _TurnSession()
+    reset = _turn_session.set(turn)
+    try:
+        yield turn
+    finally:
+        _turn_session.reset(reset)
+        for session in turn.sessions.values():
+            session.close()
+
+@contextmanager
+def session_scope(session_factory=None, key="primary"):
+    """
+    Session for one unit of work: the turn's shared Session inside turn_session(),
+    a new one otherwise. Tools of a turn take turns on the shared Session, and
+    each use ends its transaction so the connection goes back to the pool
+    instead of being held across LLM calls. `session_factory`/`key` select
+    another database, e.g. a read replica; the default is the primary.
+    """
+    session_factory = session_factory or SessionLocal
+    turn = _turn_session.get()
+    if turn is None:
+        with session_factory() as db:
+            yield db
+        return
+    with turn.lock:
+        session = turn.sessions.get(key)
+        if session is None:
+            session = turn.sessions[key] = session_factory()
+        turn.uses += 1
+        try:
+            yield session
+        finally:
+            session.rollback()
+
+def check_connection() -> bool:
+    """Open a pooled connection and run SELECT 1; called at startup, not at import."""
+    try:
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            print(f"✅ Connected to {engine.dialect.name} successfully!")
+            return True
+    except SQLAlchemyError as e:
+        print("❌ Failed to connect to the database:", e)
+        return False
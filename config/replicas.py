@@ -0,0 +1,132 @@
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy.exc import DBAPIError, DisconnectionError, TimeoutError as PoolTimeout
+from sqlalchemy.orm import sessionmaker
+from config.db import DB_PASSWORD, DB_USER, DB_NAME, create_store_engine, session_scope
+
+# Read replicas: full URLs in DB_REPLICA_URLS, or hosts ("host" or "host:port")
+# in DB_REPLICA_HOSTS that share the primary's credentials and database name.
+DB_REPLICA_URLS = [u.strip() for u in os.getenv("DB_REPLICA_URLS", "").split(",") if u.strip()]
+DB_REPLICA_HOSTS = [h.strip() for h in os.getenv("DB_REPLICA_HOSTS", "").split(",") if h.strip()]
+# "round_robin" or "least_busy" (fewest connections checked out)
+DB_REPLICA_STRATEGY = os.getenv("DB_REPLICA_STRATEGY", "round_robin")
+# A replica that failed is skipped for this many seconds
+DB_REPLICA_RETRY_AFTER = float(os.getenv("DB_REPLICA_RETRY_AFTER", "30"))
+
+# Errors that take a replica out of rotation: driver errors, a failed idle ping
+# on checkout, and a replica pool with no connection to hand out in time
+REPLICA_ERRORS = (DBAPIError, DisconnectionError, PoolTimeout)
+
+def replica_urls() -> list:
+    urls = list(DB_REPLICA_URLS)
+    for host in DB_REPLICA_HOSTS:
+        host, _, port = host.partition(":")
+        urls.append(f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{host}:{port or 3306}/{DB_NAME}")
+    return urls
+
+class Replica:
+    def __init__(self, name, engine):
+        self.name = name
+        self.engine = engine
+        self.session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        self.down_until = 0.0
+        self.reads = 0
+        self.failures = 0
+        self.last_error = None
+
+    def busy(self) -> int:
+        checkedout = getattr(self.engine.pool, "checkedout", None)
+        return checkedout() if checkedout else 0
+
+class ReplicaRouter:
+    """
+    Picks a read replica for read-only work and takes failed replicas out of
+    rotation for `retry_after` seconds. With no replicas configured (or none
+    healthy) reads go to the primary.
+    """
+
+    def __init__(self, urls, strategy=DB_REPLICA_STRATEGY, retry_after=DB_REPLICA_RETRY_AFTER,
+                 engine_factory=create_store_engine):
+        self.strategy = strategy
+        self.retry_after = retry_after
+        self.replicas = [Replica(f"replica{i}", engine_factory(url)) for i, url in enumerate(urls, 1)]
+        self._cycle = itertools.cycle(self.replicas) if self.replicas else None
+        self._lock = threading.Lock()
+        self.primary_reads = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.replicas)
+
+    def pick(self):
+        """A healthy replica, or None to read from the primary."""
+        now = time.monotonic()
+        with self._lock:
+            healthy = [r for r in self.replicas if r.down_until <= now]
+            if not healthy:
+                return None
+            if self.strategy == "least_busy":
+                return min(healthy, key=Replica.busy)
+            for _ in range(len(self.replicas)):
+                replica = next(self._cycle)
+                if replica.down_until <= now:
+                    return replica
+        return None
+
+    def mark_down(self, replica, error):
+        print(f"Read replica {replica.name} failed, using the primary for {self.retry_after:g}s:", str(error))
+        with self._lock:
+            replica.failures += 1
+            replica.last_error = str(error)
+            replica.down_until = time.monotonic() + self.retry_after
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "strategy": self.strategy,
+            "primary_reads": self.primary_reads,
+            "replicas": [
+                {"name": r.name, "healthy": r.down_until <= now, "reads": r.reads, "failures": r.failures,
+                 "in_use": r.busy(), "last_error": r.last_error}
+                for r in self.replicas
+            ],
+        }
+
+    @contextmanager
+    def read_scope(self, fresh=False):
+        """
+        Session for read-only work on a replica (shared per chat turn, like
+        session_scope). A replica that cannot hand out a connection is marked
+        down and the read goes to the primary; `fresh=True` always reads the
+        primary, for data the replicas may not have caught up with.
+        """
+        replica = None if fresh else self.pick()
+        if replica is not None:
+            with session_scope(replica.session_factory, replica.name) as db:
+                try:
+                    db.connection()  # checks out (and, if idle, pings) a replica connection
+                except REPLICA_ERRORS as e:
+                    self.mark_down(replica, e)
+                    db = None
+                if db is not None:
+                    with self._lock:
+                        replica.reads += 1
+                    try:
+                        yield db
+                    except REPLICA_ERRORS as e:
+                        self.mark_down(replica, e)
+                        raise
+                    return
+        with self._lock:
+            self.primary_reads += 1
+        with session_scope() as db:
+            yield db
+
+replica_router = ReplicaRouter(replica_urls())
+
+def read_scope(fresh=False):
+    """Session for read-only queries: a replica when configured, else the primary."""
+    return replica_router.read_scope(fresh)
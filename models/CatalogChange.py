@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Float, Integer, String
+from config.db import Base
+
+class CatalogChange(Base):
+    """One changed product, variant or thumbnail row; the chatbot's catalog change feed."""
+    __tablename__ = "chatbot_catalog_changes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    table_name = Column(String(32), nullable=False)  # products, variants or thumbnails
+    product_id = Column(Integer, nullable=False)
+    changed_at = Column(Float, nullable=False, index=True)  # epoch seconds
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, Integer
+from config.db import Base
+
+class ProductSalesMonthly(Base):
+    """Units sold per product per Asia/Manila calendar month, from Delivered/Received orders."""
+    __tablename__ = "chatbot_product_sales_monthly"
+
+    product_id = Column(Integer, primary_key=True, nullable=False)
+    period = Column(Integer, primary_key=True, nullable=False)  # year * 100 + month
+    total_sold = Column(Integer, nullable=False, default=0)
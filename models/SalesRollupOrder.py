@@ -0,0 +1,9 @@
+from sqlalchemy import Column, DateTime, String
+from config.db import Base
+
+class SalesRollupOrder(Base):
+    """Orders already counted in ProductSalesMonthly."""
+    __tablename__ = "chatbot_sales_rollup_orders"
+
+    order_id = Column(String(255), primary_key=True, nullable=False)
+    counted_at = Column(DateTime, nullable=False)
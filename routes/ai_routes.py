@@ -1,54 +1,216 @@
-import re
+import json
+import os
 import uuid
 from fastapi import APIRouter, Request
-from fastapi.responses import JSONResponse
-from agent.index import get_chat_bot_agent
+from fastapi.responses import JSONResponse, StreamingResponse
+from agent.admission import Overloaded, chat_admission
+from agent.batch import CHAT_BATCH_MAX_ITEMS, run_chat_batch
+from agent.cache import cache_stats
+from agent.index import get_memory_stats, get_model_stats, get_prompt_stats
+from agent.metrics import request_span
+from agent.runner import run_chat_turn, stream_chat_turn
+from agent.startup import wait_for_agent
 
 ai_router = APIRouter()
 
+# Return a per-request timing breakdown (Server-Timing header / stream "done" event)
+CHAT_TIMING_HEADER = os.getenv("CHAT_TIMING_HEADER", "0") == "1"
+
+async def _chat_body(request: Request):
+    """(message, thread_id) of a chat request, or a 400 response when the body is not valid."""
+    try:
+        body = await request.json()
+    except ValueError:
+        body = None
+    if not isinstance(body, dict):
+        return JSONResponse(content={"error": "Request body must be a JSON object."}, status_code=400)
+    message = body.get("message")
+    if not message or not isinstance(message, str):
+        return JSONResponse(content={"error": "Message is required."}, status_code=400)
+    thread_id = body.get("thread_id")
+    if thread_id is not None and (isinstance(thread_id, bool) or not isinstance(thread_id, (str, int))):
+        return JSONResponse(content={"error": "thread_id must be a string or an integer."}, status_code=400)
+    return message, str(thread_id) if thread_id not in (None, "") else str(uuid.uuid4())
+
+def _overloaded(e: Overloaded) -> JSONResponse:
+    """Fast 503 for a request turned away by admission control."""
+    return JSONResponse(
+        content={"error": "The assistant is busy. Please try again shortly."},
+        status_code=503,
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 @ai_router.post("/api/chat")
 async def chat(request: Request):
+    try:
+        parsed = await _chat_body(request)
+        if isinstance(parsed, JSONResponse):
+            return parsed
+        user_message, thread_id = parsed
+
+        if not await wait_for_agent():
+            return JSONResponse(
+                content={"error": "Chat agent is starting. Please try again shortly."},
+                status_code=503,
+                headers={"Retry-After": "5"}
+            )
+
+        with request_span("/api/chat") as timings:
+            response = await run_chat_turn(user_message, thread_id)
+
+        return JSONResponse(
+            content={"response": response, "success": True, "thread_id": thread_id},
+            headers={"Server-Timing": timings.server_timing()} if CHAT_TIMING_HEADER else None
+        )
+
+    except Overloaded as e:
+        return _overloaded(e)
+
+    except Exception as e:
+        print("Error in /api/chat:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
+
+@ai_router.post("/api/chat/batch")
+async def chat_batch(request: Request):
     try:
         body = await request.json()
-        thread_id = body.get("thread_id") or str(uuid.uuid4())
-        user_message = body.get("message")
+        items = body.get("items") if isinstance(body, dict) else body
 
-        if not user_message:
+        if not isinstance(items, list) or not items:
             return JSONResponse(
-                content={"error": "Message is required."},
+                content={"error": "A non-empty list of items is required."},
+                status_code=400
+            )
+        if len(items) > CHAT_BATCH_MAX_ITEMS:
+            return JSONResponse(
+                content={"error": f"At most {CHAT_BATCH_MAX_ITEMS} items per batch."},
                 status_code=400
             )
 
-        input_message = {"role": "user", "content": user_message}
-        config = {"configurable": {"thread_id": thread_id}}
-
-        agent = get_chat_bot_agent()
-        if agent is None:
+        if not await wait_for_agent():
             return JSONResponse(
-                content={"error": "Chat agent not initialized."},
-                status_code=500
+                content={"error": "Chat agent is starting. Please try again shortly."},
+                status_code=503,
+                headers={"Retry-After": "5"}
             )
 
-        result = ""
-        for step, metadata in agent.stream(
-            {"messages": [input_message]},
-            config=config,
-            stream_mode="messages"
-        ):
-            # Use .text property instead of deprecated .text() method
-            if metadata.get("langgraph_node") == "agent" and (text := step.text):
-                result += text
+        result = await run_chat_batch(items)
+        retry_after = [r["retry_after"] for r in result["results"] if "retry_after" in r]
+        if len(retry_after) == len(items):
+            # Nothing was answered: the whole batch is shed
+            return JSONResponse(content=result, status_code=503, headers={"Retry-After": str(max(retry_after))})
+        return JSONResponse(content=result)
+
+    except Exception as e:
+        print("Error in /api/chat/batch:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
+
+@ai_router.get("/api/chat/memory")
+async def chat_memory():
+    try:
+        return JSONResponse(content=get_memory_stats())
+    except Exception as e:
+        print("Error in /api/chat/memory:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
+
+@ai_router.get("/api/chat/prompt")
+async def chat_prompt():
+    try:
+        return JSONResponse(content=get_prompt_stats())
+    except Exception as e:
+        print("Error in /api/chat/prompt:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
+
+@ai_router.get("/api/chat/model")
+async def chat_model():
+    try:
+        return JSONResponse(content=get_model_stats())
+    except Exception as e:
+        print("Error in /api/chat/model:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
 
-        # Clean markdown-style code blocks
-        cleaned = re.sub(r"```[a-zA-Z]*\n?", "", result).replace("```", "")
+@ai_router.get("/api/chat/admission")
+async def chat_admission_stats():
+    try:
+        return JSONResponse(content=chat_admission.stats())
+    except Exception as e:
+        print("Error in /api/chat/admission:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
 
+@ai_router.get("/api/cache/stats")
+async def chat_cache_stats():
+    try:
+        return JSONResponse(content=cache_stats())
+    except Exception as e:
+        print("Error in /api/cache/stats:", str(e))
         return JSONResponse(
-            content={"response": cleaned.strip(), "success": True, "thread_id": thread_id}
+            content={"error": "Internal Server Error"},
+            status_code=500
         )
 
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event; data is JSON so HTML newlines survive."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@ai_router.post("/api/chat/stream")
+async def chat_stream(request: Request):
+    try:
+        parsed = await _chat_body(request)
+        if isinstance(parsed, JSONResponse):
+            return parsed
+        user_message, thread_id = parsed
+
+        if not await wait_for_agent():
+            return JSONResponse(
+                content={"error": "Chat agent is starting. Please try again shortly."},
+                status_code=503,
+                headers={"Retry-After": "5"}
+            )
     except Exception as e:
-        print("Error in /api/chat:", str(e))
+        print("Error in /api/chat/stream:", str(e))
         return JSONResponse(
             content={"error": "Internal Server Error"},
             status_code=500
-        )
\ No newline at end of file
+        )
+
+    async def events():
+        try:
+            with request_span("/api/chat/stream") as timings:
+                async for text in stream_chat_turn(user_message, thread_id):
+                    yield _sse("token", {"text": text})
+            done = {"success": True, "thread_id": thread_id}
+            if CHAT_TIMING_HEADER:
+                # Headers are already sent by the time the turn finishes
+                done["timings"] = timings.as_dict()
+            yield _sse("done", done)
+        except Overloaded as e:
+            # The 200 and its headers are already sent: the client retries on this event
+            yield _sse("error", {"error": "The assistant is busy. Please try again shortly.",
+                                 "retry_after": e.retry_after, "thread_id": thread_id})
+        except Exception as e:
+            print("Error in /api/chat/stream:", str(e))
+            yield _sse("error", {"error": "Internal Server Error", "thread_id": thread_id})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,13 @@
+import hmac
+import os
+from fastapi import Request
+
+# Shared secret the store backend sends on its change notifications.
+# When unset, the endpoints reject every request.
+CHATBOT_ADMIN_TOKEN = os.getenv("CHATBOT_ADMIN_TOKEN")
+
+def is_authorized_admin(request: Request) -> bool:
+    if not CHATBOT_ADMIN_TOKEN:
+        return False
+    token = request.headers.get("X-Admin-Token", "")
+    return hmac.compare_digest(token.encode(), CHATBOT_ADMIN_TOKEN.encode())
@@ -0,0 +1,65 @@
+import asyncio
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from agent.catalog import catalog_cache, invalidate_catalog
+from agent.catalog_feed import TRACKED_TABLES, catalog_feed
+from agent.response_cache import invalidate_responses
+from routes.auth import is_authorized_admin
+
+catalog_router = APIRouter()
+
+@catalog_router.post("/api/catalog/invalidate")
+async def catalog_invalidate(request: Request):
+    try:
+        if not is_authorized_admin(request):
+            return JSONResponse(content={"error": "Unauthorized"}, status_code=401)
+        invalidate_catalog()
+        invalidate_responses()
+        return JSONResponse(content={"success": True})
+    except Exception as e:
+        print("Error in /api/catalog/invalidate:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
+
+@catalog_router.post("/api/catalog/changes")
+async def catalog_changes(request: Request):
+    """
+    Called by the store backend after it writes products, variants or thumbnails:
+    {"changes": [{"table": "variants", "product_id": 12}, ...]}. Every worker
+    re-reads just those products.
+    """
+    try:
+        if not is_authorized_admin(request):
+            return JSONResponse(content={"error": "Unauthorized"}, status_code=401)
+        body = await request.json()
+        changes = body.get("changes") if isinstance(body, dict) else None
+        if not isinstance(changes, list) or not all(
+            isinstance(c, dict) and c.get("table") in TRACKED_TABLES
+            and isinstance(c.get("product_id"), int) and not isinstance(c.get("product_id"), bool)
+            for c in changes
+        ):
+            return JSONResponse(
+                content={"error": "A list of changes with a table (products, variants or thumbnails) and a product_id is required."},
+                status_code=400
+            )
+        recorded = await asyncio.to_thread(catalog_feed.record, [(c["table"], c["product_id"]) for c in changes])
+        return JSONResponse(content={"success": True, "recorded": recorded})
+    except Exception as e:
+        print("Error in /api/catalog/changes:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
+
+@catalog_router.get("/api/catalog/stats")
+async def catalog_stats():
+    try:
+        return JSONResponse(content=dict(catalog_cache.stats(), feed=catalog_feed.stats()))
+    except Exception as e:
+        print("Error in /api/catalog/stats:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
@@ -0,0 +1,33 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse, PlainTextResponse
+from agent.metrics import pool_stats, render_metrics
+from config.db import engine
+from config.replicas import replica_router
+
+metrics_router = APIRouter()
+
+@metrics_router.get("/metrics")
+async def metrics():
+    try:
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+    except Exception as e:
+        print("Error in /metrics:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
+
+@metrics_router.get("/api/db/pool")
+async def db_pool_stats():
+    try:
+        stats = pool_stats(engine)
+        if replica_router.enabled:
+            stats["routing"] = replica_router.stats()
+            stats["replica_pools"] = {r.name: pool_stats(r.engine) for r in replica_router.replicas}
+        return JSONResponse(content=stats)
+    except Exception as e:
+        print("Error in /api/db/pool:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from agent.orders import invalidate_order
+from agent.response_cache import invalidate_responses
+from agent.tools import top_products_cache
+from agent.top_sellers import sales_rollup
+from routes.auth import is_authorized_admin
+
+order_router = APIRouter()
+
+@order_router.post("/api/orders/{order_id}/invalidate")
+async def order_invalidate(order_id: str, request: Request):
+    """Called by the store backend whenever an order's status changes."""
+    try:
+        if not is_authorized_admin(request):
+            return JSONResponse(content={"error": "Unauthorized"}, status_code=401)
+        invalidate_order(order_id)
+        # A delivery or cancellation also moves the top-sellers numbers, and the answers built from them
+        sales_rollup.invalidate()
+        top_products_cache.invalidate()
+        invalidate_responses()
+        return JSONResponse(content={"success": True})
+    except Exception as e:
+        print("Error in /api/orders/invalidate:", str(e))
+        return JSONResponse(
+            content={"error": "Internal Server Error"},
+            status_code=500
+        )
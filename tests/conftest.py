@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Tests never touch the shared tool cache file or a MySQL server
+os.environ.setdefault("TOOL_CACHE_PATH", "")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
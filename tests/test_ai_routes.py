@@ -0,0 +1,29 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routes.ai_routes import ai_router
+
+app = FastAPI()
+app.include_router(ai_router)
+client = TestClient(app)
+
+@pytest.mark.parametrize("path", ["/api/chat", "/api/chat/stream"])
+@pytest.mark.parametrize("body, error", [
+    ({"message": 5}, "Message is required."),
+    ({"message": ""}, "Message is required."),
+    ({}, "Message is required."),
+    ([], "Request body must be a JSON object."),
+    ("hello", "Request body must be a JSON object."),
+    ({"message": "hi", "thread_id": {"id": 1}}, "thread_id must be a string or an integer."),
+    ({"message": "hi", "thread_id": True}, "thread_id must be a string or an integer."),
+])
+def test_invalid_chat_body_is_a_400(path, body, error):
+    response = client.post(path, json=body)
+    assert response.status_code == 400
+    assert response.json() == {"error": error}
+
+@pytest.mark.parametrize("path", ["/api/chat", "/api/chat/stream"])
+def test_malformed_json_is_a_400(path):
+    response = client.post(path, content=b"{not json", headers={"Content-Type": "application/json"})
+    assert response.status_code == 400
+    assert response.json() == {"error": "Request body must be a JSON object."}
@@ -0,0 +1,22 @@
+import asyncio
+import agent.batch
+from agent.batch import run_chat_batch
+
+def test_thread_id_zero_is_kept(monkeypatch):
+    seen = []
+
+    async def fake_turn(message, thread_id, priority=None):
+        seen.append(thread_id)
+        return f"re: {message}"
+
+    monkeypatch.setattr(agent.batch, "run_chat_turn", fake_turn)
+    result = asyncio.run(run_chat_batch([
+        {"thread_id": 0, "message": "first"},
+        {"thread_id": 0, "message": "second"},
+        {"thread_id": "", "message": "third"},
+    ]))
+
+    assert [r["thread_id"] for r in result["results"][:2]] == ["0", "0"]
+    assert result["results"][2]["thread_id"] not in ("", "0")
+    assert result["stats"]["threads"] == 2
+    assert seen.count("0") == 2
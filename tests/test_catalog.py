@@ -0,0 +1,68 @@
+import importlib
+import time
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import create_engine, update
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import sessionmaker
+from agent.catalog import CatalogCache, _catalog_watermark, _row_checksum
+from config.db import Base
+from models.Product import Product
+from models.Thumbnail import Thumbnail
+from models.Variant import Variant
+
+# Registers every model, as in the app, so Product's relationships resolve
+importlib.import_module("agent.tools")
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'store.sqlite3'}")
+    Base.metadata.create_all(engine, tables=[Product.__table__, Variant.__table__, Thumbnail.__table__])
+    Session = sessionmaker(bind=engine)
+    with Session() as db:
+        db.add_all([
+            Product(id=1, product_name="Court Hoodie", description="", category="Hoodies", status="Available"),
+            Product(id=2, product_name="Street Shorts", description="", category="Shorts", status="Available"),
+            Variant(id=1, product_id=1, sku="CH-M", price=999.0, stock=5, size="M", color="Black"),
+            Variant(id=2, product_id=2, sku="SS-L", price=599.0, stock=3, size="L", color="Navy"),
+            Thumbnail(product_id=1, thumbnailUrl="https://img/1.png", thumbnailPublicId="p1"),
+        ])
+        db.commit()
+
+    @contextmanager
+    def scope():
+        with Session() as db:
+            yield db
+    return scope
+
+@pytest.mark.parametrize("change", [
+    update(Product).where(Product.id == 1).values(product_name="Court Hoodie v2"),
+    update(Product).where(Product.id == 2).values(category="Joggers"),
+    update(Variant).where(Variant.id == 1).values(size="XL"),
+    update(Variant).where(Variant.id == 2).values(color="Black"),
+    update(Thumbnail).where(Thumbnail.product_id == 1).values(thumbnailUrl="https://img/1b.png"),
+])
+def test_watermark_sees_text_edits(session_factory, change):
+    with session_factory() as db:
+        before = _catalog_watermark(db)
+        db.execute(change)
+        db.commit()
+        assert _catalog_watermark(db) != before
+
+def test_mysql_checksum_uses_crc32():
+    sql = str(_row_checksum("mysql", Product.id, Product.product_name).compile(dialect=mysql.dialect()))
+    assert sql.startswith("crc32(concat_ws(")
+
+def test_max_age_reload_reads_the_database(session_factory):
+    catalog = CatalogCache(check_interval=0, max_age=3600, session_factory=session_factory)
+    assert catalog.get_product(1)["product_name"] == "Court Hoodie"
+    with session_factory() as db:
+        # An edit the watermark cannot see: same length, same row
+        db.execute(update(Product).where(Product.id == 1).values(product_name="Court Hoodiz"))
+        db.commit()
+    catalog.max_age = 0
+    catalog.get_product(1)  # starts the background refresh
+    deadline = time.monotonic() + 5
+    while catalog.reloads < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert catalog.get_product(1)["product_name"] == "Court Hoodiz"
@@ -0,0 +1,33 @@
+import pytest
+from agent.faq import get_faq_index
+
+@pytest.mark.parametrize("message, question", [
+    ("What payment methods do you accept?", "What payment methods do you accept?"),
+    ("Do you ship to Mindanao?", "Do you offer shipping outside Luzon (Visayas/Mindanao or international)?"),
+    ("Do you deliver to Cebu?", "Do you offer shipping outside Luzon (Visayas/Mindanao or international)?"),
+    ("How long does shipping take?", "How long does shipping take?"),
+    ("What is your refund policy?", "Can I return or exchange an item?"),
+    ("How do I create an account?", "How do I create an account?"),
+    ("Is my payment info safe?", "Is my payment information safe?"),
+])
+def test_policy_questions_match(message, question):
+    match = get_faq_index().match(message)
+    assert match is not None
+    assert match.entry.question == question
+
+@pytest.mark.parametrize("message", [
+    "where is my package?",
+    "where is my parcel?",
+    "where is your store?",
+    "when will my parcel arrive?",
+    "has my package been delivered?",
+    "why was my payment rejected?",
+    "my payment failed",
+    "my card was declined",
+    "can I use my friend's voucher?",
+    "Where is my order?",
+    "Show me black hoodies",
+    "Thanks!",
+])
+def test_other_questions_go_to_agent(message):
+    assert get_faq_index().match(message) is None
@@ -0,0 +1,62 @@
+import operator
+from typing import Annotated, TypedDict
+from langgraph.graph import END, START, StateGraph
+from agent.memory import BoundedMemorySaver
+
+class State(TypedDict):
+    steps: Annotated[list, operator.add]
+
+def _graph(saver):
+    builder = StateGraph(State)
+    builder.add_node("step", lambda state: {"steps": ["step"]})
+    builder.add_edge(START, "step")
+    builder.add_edge("step", END)
+    return builder.compile(checkpointer=saver)
+
+def _config(thread_id, **extra):
+    return {"configurable": {"thread_id": thread_id, **extra}}
+
+def test_unknown_thread_is_not_tracked():
+    saver = BoundedMemorySaver()
+    assert saver.get_tuple(_config("missing")) is None
+    assert saver.stats()["threads"] == 0
+    assert not saver.writes
+
+def test_get_tuple_of_latest_checkpoint():
+    saver = BoundedMemorySaver()
+    graph = _graph(saver)
+    graph.invoke({"steps": []}, _config("t"))
+    result = saver.get_tuple(_config("t"))
+    assert result is not None
+    assert result.checkpoint["channel_values"]["steps"] == ["step"]
+
+def test_time_travel_without_checkpoint_ns():
+    saver = BoundedMemorySaver(max_checkpoints=10)
+    graph = _graph(saver)
+    graph.invoke({"steps": []}, _config("t"))
+    graph.invoke({"steps": []}, _config("t"))
+    history = list(graph.get_state_history(_config("t")))
+    earlier = next(s for s in history if s.values.get("steps") == ["step"] and not s.next)
+    config = _config("t", checkpoint_id=earlier.config["configurable"]["checkpoint_id"])
+
+    assert graph.get_state(config).values["steps"] == ["step"]
+    # Replaying from the earlier checkpoint forks the thread from there
+    assert graph.invoke(None, config)["steps"] == ["step"]
+    assert graph.invoke({"steps": []}, config)["steps"] == ["step", "step"]
+
+def test_old_checkpoints_are_pruned():
+    saver = BoundedMemorySaver(max_checkpoints=2)
+    graph = _graph(saver)
+    for _ in range(3):
+        graph.invoke({"steps": []}, _config("t"))
+    assert saver.stats()["checkpoints"] == 2
+    assert saver.pruned_checkpoints > 0
+    assert len(graph.get_state(_config("t")).values["steps"]) == 3
+
+def test_delete_thread_drops_writes_of_lookups():
+    saver = BoundedMemorySaver()
+    graph = _graph(saver)
+    graph.invoke({"steps": []}, _config("t"))
+    graph.get_state(_config("t"))
+    saver.delete_thread("t")
+    assert not saver.storage and not saver.writes and not saver.blobs
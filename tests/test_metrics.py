@@ -0,0 +1,16 @@
+from collections import Counter
+from sqlalchemy import create_engine
+from agent.metrics import instrument_engine, render_metrics
+
+def test_pool_gauges_render_each_family_once(tmp_path):
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.sqlite3'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.sqlite3'}")
+    instrument_engine(primary, pool="test-primary")
+    instrument_engine(replica, pool="test-replica1")
+
+    lines = render_metrics().splitlines()
+    headers = Counter(line for line in lines if line.startswith("# "))
+    assert all(count == 1 for count in headers.values())
+    assert 'chatbot_db_pool_size{pool="test-primary"} 5' in lines
+    assert 'chatbot_db_pool_size{pool="test-replica1"} 5' in lines
+    assert 'chatbot_db_pool_timeouts_total{pool="test-replica1"} 0' in lines
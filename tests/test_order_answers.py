@@ -0,0 +1,47 @@
+from langchain_core.messages import AIMessage, HumanMessage
+from agent.order_answers import OrderQuestion, parse_order_question
+
+ORDER_ID = "3f2b8c1e-9a4d-4e6f-8b7a-1c2d3e4f5a6b"
+OTHER_ID = "aaaaaaaa-bbbb-cccc-dddd-eeeeeeeeeeee"
+
+def _exchange(question, answer):
+    return [HumanMessage(content=question), AIMessage(content=answer)]
+
+def test_order_id_in_message():
+    assert parse_order_question(f"what's the status of order {ORDER_ID}?") == OrderQuestion(ORDER_ID, "status")
+
+def test_last_id_in_message_wins():
+    assert parse_order_question(f"total for {OTHER_ID}, no, {ORDER_ID}").order_id == ORDER_ID
+
+def test_follow_up_reuses_order_of_previous_turn():
+    history = _exchange(f"where is my order {ORDER_ID}?", "<p><strong>Status:</strong> Shipped</p>")
+    assert parse_order_question("how much is it?", history) == OrderQuestion(ORDER_ID, "total")
+
+def test_chain_of_follow_ups():
+    history = (_exchange(f"where is my order {ORDER_ID}?", "Shipped")
+               + _exchange("what's the status?", "<p><strong>Status:</strong> Shipped</p>"))
+    assert parse_order_question("and the total?", history) == OrderQuestion(ORDER_ID, "total")
+
+def test_follow_up_after_unrelated_turns():
+    history = (_exchange(f"where is my order {ORDER_ID}?", "Shipped")
+               + _exchange("what's the status?", "<p><strong>Status:</strong> Shipped</p>")
+               + _exchange("show me hoodies", "Here are our hoodies")
+               + _exchange("what payment methods do you accept?", "GCash and cards"))
+    assert parse_order_question("how much is it?", history) is None
+
+def test_message_saying_order_reuses_last_id():
+    history = (_exchange(f"where is my order {ORDER_ID}?", "Shipped")
+               + _exchange("show me hoodies", "Here are our hoodies"))
+    assert parse_order_question("what's the total of my order?", history) == OrderQuestion(ORDER_ID, "total")
+
+def test_follow_up_with_other_words_is_not_an_order_question():
+    history = _exchange(f"where is my order {ORDER_ID}?", "Shipped")
+    assert parse_order_question("how much is the black hoodie?", history) is None
+
+def test_no_known_order():
+    assert parse_order_question("what's the status?") is None
+    assert parse_order_question("what's my order status?", _exchange("hi", "Hello!")) is None
+
+def test_several_fields_or_actions_go_to_agent():
+    assert parse_order_question(f"status and total of {ORDER_ID}?") == OrderQuestion(ORDER_ID, None)
+    assert parse_order_question(f"change the address of order {ORDER_ID}") == OrderQuestion(ORDER_ID, None)
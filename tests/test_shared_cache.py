@@ -0,0 +1,100 @@
+import threading
+import pytest
+from agent.shared_cache import SharedStore, TieredCache
+
+def test_store_is_opened_on_first_use(tmp_path):
+    path = tmp_path / "cache" / "tool-cache.sqlite3"
+    store = SharedStore(str(path))
+    assert not path.parent.exists()
+    assert store.get("missing") is None
+    assert path.exists() and store.enabled
+
+def test_values_round_trip_through_the_store(tmp_path):
+    store = SharedStore(str(tmp_path / "tool-cache.sqlite3"))
+    cache = TieredCache("test_round_trip", store=store)
+    value = {1: ["a", 2.5], "nested": {"ok": True}}
+    assert cache.get_or_load("k", lambda: value) == value
+    other = TieredCache("test_round_trip", store=store)
+    assert other.get_or_load("k", lambda: None) == value
+    assert other.stats()["shared_hits"] == 1
+
+class SlowLoader:
+    """A loader that blocks until released, returning the current version of the source."""
+
+    def __init__(self, source):
+        self.source = source
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        value = self.source["value"]
+        self.started.set()
+        assert self.release.wait(5)
+        return value
+
+def _load_in_thread(cache, key, loader):
+    result = {}
+    thread = threading.Thread(target=lambda: result.setdefault("value", cache.get_or_load(key, loader)))
+    thread.start()
+    assert loader.started.wait(5)
+    return thread, result
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_load_running_during_invalidate_is_not_stored(tmp_path, shared):
+    store = SharedStore(str(tmp_path / "tool-cache.sqlite3") if shared else "")
+    cache = TieredCache(f"test_race_{shared}", store=store)
+    source = {"value": "old"}
+    slow = SlowLoader(source)
+    thread, result = _load_in_thread(cache, "k", slow)
+
+    source["value"] = "new"
+    cache.invalidate("k")
+    slow.release.set()
+    thread.join()
+
+    assert result["value"] == "old"
+    assert cache.get_or_load("k", lambda: source["value"]) == "new"
+    assert not store.enabled or store.get(cache._full_key("k"))[0] == "new"
+
+def test_invalidate_in_another_process_during_load(tmp_path):
+    path = str(tmp_path / "tool-cache.sqlite3")
+    loading = TieredCache("test_race_processes", store=SharedStore(path))
+    other = TieredCache("test_race_processes", store=SharedStore(path))
+    source = {"value": "old"}
+    slow = SlowLoader(source)
+    thread, result = _load_in_thread(loading, "k", slow)
+
+    source["value"] = "new"
+    other.invalidate("k")
+    slow.release.set()
+    thread.join()
+
+    assert result["value"] == "old"
+    assert other.get_or_load("k", lambda: source["value"]) == "new"
+    assert loading.get_or_load("k", lambda: source["value"]) == "new"
+
+def test_callers_after_invalidate_do_not_wait_for_the_stale_load():
+    cache = TieredCache("test_race_coalesce", store=SharedStore(""))
+    source = {"value": "old"}
+    slow = SlowLoader(source)
+    thread, result = _load_in_thread(cache, "k", slow)
+
+    source["value"] = "new"
+    cache.invalidate("k")
+    assert cache.get_or_load("k", lambda: source["value"]) == "new"
+    slow.release.set()
+    thread.join()
+
+    assert result["value"] == "old"
+    assert cache.get_or_load("k", lambda: "unused") == "new"
+
+def test_invalidate_without_key_retires_every_entry(tmp_path):
+    path = str(tmp_path / "tool-cache.sqlite3")
+    cache = TieredCache("test_generation", store=SharedStore(path))
+    other = TieredCache("test_generation", store=SharedStore(path))
+    assert cache.get_or_load("k", lambda: 1) == 1
+    other.invalidate()
+    cache._generation_checked = float("-inf")
+    assert cache.get_or_load("k", lambda: 2) == 2